@@ -2,7 +2,12 @@
 from PyQt6.QtWidgets import QWidget, QLabel
 from PyQt6.QtGui import QPixmap, QImage, QPainter
 from PyQt6.QtCore import Qt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
+
+IMAGE_CACHE_SIZE = 4        # 預先處理好的圖片最多留幾張
 
 class ImageWindow(QWidget):
     def __init__(self):
@@ -17,28 +22,69 @@ class ImageWindow(QWidget):
         self.label.setGeometry(0, 0, 551, 248)
         self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.label.setStyleSheet("background-color: transparent;")
+        # 預先處理好的圖片：path → ((mtime, size), QImage)；QImage 可在背景執行緒產生，QPixmap 不行
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-preload")
         self.show()
 
+    def preload(self, path: str):
+        """在背景執行緒先讀檔、裁切與加透明度，之後 set_image 只需轉成 QPixmap。可從任何執行緒呼叫。"""
+        if path:
+            self._pool.submit(self._cached, path)
+
     def set_image(self, path: str):
-        if not os.path.exists(path):
+        if not path or not os.path.exists(path):
+            self.label.clear()
+            return
+
+        img = self._cached(path)
+        if img is None:
             self.label.clear()
             return
+        self.label.setPixmap(QPixmap.fromImage(img))
+
+    def _cached(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._cache_lock:
+            hit = self._cache.get(path)
+            if hit is not None and hit[0] == stamp:
+                self._cache.move_to_end(path)
+                return hit[1]
+        img = self._render(path)
+        if img is None:
+            return None
+        with self._cache_lock:
+            self._cache[path] = (stamp, img)
+            while len(self._cache) > IMAGE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return img
 
+    @staticmethod
+    def _render(path: str):
         img = QImage(path)
+        if img.isNull():
+            return None
         w, h = img.width(), img.height()
 
-        if w <= 551 and h <= 248:
+        if (w, h) == (551, 248):
+            # news_parser 預先縮好的顯示用圖片，直接使用
+            pass
+        elif w <= 551 and h <= 248:
             # 圖片太小就縮放顯示
-            pixmap = QPixmap.fromImage(img).scaled(551, 248, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            img = img.scaled(551, 248, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
         else:
             # 中央裁切
             x = max((w - 551) // 2, 0)
             y = max((h - 248) // 2, 0)
-            cropped = img.copy(x, y, min(551, w), min(248, h))
-            #pixmap = QPixmap.fromImage(cropped)
+            img = img.copy(x, y, min(551, w), min(248, h))
 
-        # ⬇️ 將圖片畫進一個新的 QPixmap，並調整透明度
-        result = QPixmap(img.size())
+        # ⬇️ 將圖片畫進一個新的 QImage，並調整透明度
+        result = QImage(img.size(), QImage.Format.Format_ARGB32_Premultiplied)
         result.fill(Qt.GlobalColor.transparent)
 
         painter = QPainter(result)
@@ -46,4 +92,4 @@ class ImageWindow(QWidget):
         painter.drawImage(0, 0, img)
         painter.end()
 
-        self.label.setPixmap(result)
+        return result
@@ -0,0 +1,72 @@
+# article_index.py
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable
+
+INDEX_PATH = "news_index.json"
+
+
+def content_hash(title: str, pub_time: str, content_text: str) -> str:
+    """以標題、時間與內文計算文章指紋，用來判斷文章是否有變動。"""
+    h = hashlib.sha1()
+    for part in (title, pub_time, content_text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ArticleIndex:
+    """
+    以文章網址為 key 的持久化索引，記錄上一輪的：
+    - etag / last_modified：發送條件式請求用
+    - hash：內文指紋
+    - news_idx / image / image_url / content：未變動時直接沿用
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._records = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"文章索引讀取失敗，改為完整重新爬取：{e}")
+                self._records = {}
+
+    def get(self, url: str) -> Dict[str, Any] | None:
+        with self._lock:
+            rec = self._records.get(url)
+            return dict(rec) if rec else None
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """回傳 If-None-Match / If-Modified-Since 標頭（若有紀錄）。"""
+        rec = self.get(url)
+        headers = {}
+        if rec:
+            if rec.get("etag"):
+                headers["If-None-Match"] = rec["etag"]
+            if rec.get("last_modified"):
+                headers["If-Modified-Since"] = rec["last_modified"]
+        return headers
+
+    def update(self, url: str, **fields) -> None:
+        with self._lock:
+            self._records.setdefault(url, {}).update(fields)
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """只保留這一輪列表頁上仍存在的文章。"""
+        keep = set(keep)
+        with self._lock:
+            self._records = {u: r for u, r in self._records.items() if u in keep}
+
+    def save(self) -> None:
+        """先寫暫存檔再 os.replace，避免中途中斷留下壞掉的索引。"""
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
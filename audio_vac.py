@@ -1,93 +1,1039 @@
-import sounddevice as sd, soundfile as sf, threading
+import soundfile as sf, threading, queue, os, glob, json, time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, NamedTuple, Optional, Tuple
 
-# 初始化當前的音訊串流為 None
-current_stream = None
-# 初始化一個鎖，用於同步對音訊串流的訪問
-stream_lock = threading.Lock()
+import numpy as np
 
-def stop_playback():
+from percentiles import percentile
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):       # 沒有 PortAudio 的機器（CI / 基準測試）只能用無頭 sink
+    sd = None
+
+ENGINE_SAMPLERATE = 48000   # 所有音檔載入時就轉成這個取樣率，串流整場只開一次
+ENGINE_CHANNELS = 2         # VAC 一律以雙聲道輸出
+ENGINE_BLOCKSIZE = 0        # 0 = 交給 PortAudio 決定
+ENGINE_LATENCY = "low"
+OPEN_RETRY_MIN = 1.0        # 裝置開不起來後，至少隔這麼多秒才再列舉 / 開啟，之後每次失敗加倍
+OPEN_RETRY_MAX = 30.0
+PCM_CACHE_BYTES = 256 * 1024 * 1024     # 解碼後 PCM 的記憶體上限
+PRELOAD_WORKERS = 2
+HOST_PREFERENCE = ("Windows WASAPI", "MME", "DirectSound")
+HEADLESS_BLOCKSIZE = 480    # 無頭 sink 每次 callback 的 frame 數（48 kHz 下 10 ms）
+GAP_WINDOW = 2.0            # 同一聲道兩段間隔超過這個秒數視為閒置，不算進 inter_clip_gap
+
+
+# ────────── 量測 ──────────
+# 直方圖的桶（毫秒）；最後一桶收超過 5 秒的
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+HISTOGRAM_RECENT = 1000     # 百分位只看最近這麼多筆
+
+
+class Histogram:
+    """秒為單位記錄，輸出時換成毫秒：count / sum / min / max / 分桶 / 最近的百分位。"""
+
+    def __init__(self, buckets_ms=HISTOGRAM_BUCKETS_MS, recent: int = HISTOGRAM_RECENT):
+        self.bounds = tuple(b / 1000 for b in buckets_ms)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.recent: Deque[float] = deque(maxlen=recent)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.recent.append(seconds)
+        for n, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                self.buckets[n] += 1
+                return
+        self.buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        ordered = sorted(self.recent)
+        ms = lambda v: round(v * 1000, 3) if v is not None else None
+        labels = [f"<={b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "min_ms": ms(self.min),
+            "max_ms": ms(self.max),
+            "p50_ms": ms(percentile(ordered, 50)),
+            "p95_ms": ms(percentile(ordered, 95)),
+            "p99_ms": ms(percentile(ordered, 99)),
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class AudioMetrics:
+    """
+    audio_vac 的計數器與直方圖（執行緒安全）：
+    - queue_wait：submit → 第一個 sample 被混進輸出
+    - first_sample_latency：play_wav_to_device 被呼叫 → 第一個 sample 到達裝置 (DAC)
+    - decode：PCM 快取未命中時的解碼 + 轉格式時間
+    - clip_duration：每段音檔長度
+    - inter_clip_gap：同一聲道前一段最後一個 sample 到下一段第一個 sample 的空白
+    - callback：串流 callback 本身的處理時間
+    - 計數：underruns、clips_submitted / finished / flushed、cache_hits / misses …
     """
-            停止當前正在播放的音檔並釋放相關資源。
-            """
-    global current_stream, stream_lock  # 宣告要使用全域變數
-    with stream_lock:
-        if current_stream and current_stream.active:
-            print("手動停止播放並釋放資源...")
-            current_stream.stop()  # 停止串流
-            current_stream.close()  # 關閉串流，釋放音訊裝置
-            current_stream = None  # 清除對串流的引用
-            sd.stop()
-        else:
-            print("目前沒有音檔正在播放。")
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
 
-def list_devices():
-    for i, d in enumerate(sd.query_devices()):
-        if d['max_output_channels'] > 0:
-            host = sd.query_hostapis(d['hostapi'])['name']
-            print(f"{i:2d}: {d['name']}  [{host}]")
-
-def _resolve_device(name_or_id, host_preference=("Windows WASAPI", "MME", "DirectSound")):
-    """把 'Line 1 ...' 或 (name, host) 轉成唯一 device index"""
-    if isinstance(name_or_id, int):
-        return name_or_id                    # 已是索引
-    if isinstance(name_or_id, tuple):
-        # 明確 (name, host) 二元組
-        name, host = name_or_id
-        for i, d in enumerate(sd.query_devices()):
-            if d['name'] == name and sd.query_hostapis(d['hostapi'])['name'] == host:
-                return i
-        raise ValueError(f"沒有找到裝置 {name} @ {host}")
-    # 字串 → 找到第一個符合 host_preference
-    matches = [ (i, sd.query_hostapis(d['hostapi'])['name'])
-                for i, d in enumerate(sd.query_devices())
-                if d['name'] == name_or_id and d['max_output_channels']>0 ]
-    for pref in host_preference:
-        for idx, host in matches:
-            if host == pref:
-                return idx
-    if matches:
-        return matches[0][0]                 # 退而取第一個
-    raise ValueError(f"找不到裝置 {name_or_id}")
-
-def play_wav_to_device(wav_path, device_name, on_done=lambda:None):
-
-    data, fs = sf.read(wav_path, dtype='float32')
+    def inc(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "since": self.started,
+                "uptime": round(time.time() - self.started, 3),
+                "counters": dict(self.counters),
+                "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+            }
+
+    def dump(self, path: str) -> None:
+        """寫成 JSON（先寫暫存檔再 rename）。"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+metrics = AudioMetrics()
+
+
+def _fit_channels(data, channels: int = ENGINE_CHANNELS):
+    """轉成 (frames, channels) 的連續 float32；mono 複製到每個聲道，多的聲道捨棄。"""
     if data.ndim == 1:
-        data = data[:, None].repeat(2, axis=1)
-
-    dev_idx = _resolve_device(device_name)
-
-    # def _worker():
-    #     sd.play(data, fs, device=dev_idx, blocking=True)
-    #     on_done()
-    def _worker():
-        global current_stream, stream_lock  # 宣告要使用全域變數
-        with stream_lock:
-            # 如果有舊的串流存在且仍在播放，先停止並關閉它
-            if current_stream and current_stream.active:
-                print("停止之前的播放並釋放資源...")
-                current_stream.stop()
-                current_stream.close()
-                # 這裡不需要清除 current_stream，因為稍後會賦予新的串流
-            # 創建新的音訊輸出串流
+        data = data[:, None]
+    if data.shape[1] == 1 and channels != 1:
+        data = np.repeat(data, channels, axis=1)
+    elif data.shape[1] != channels:
+        data = data[:, :channels]
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+def _resample(data, src_rate: int, dst_rate: int):
+    """線性內插重取樣，所有聲道一次算完。來源多半是 16k/22k/24k 的 TTS，只會往上取樣。"""
+    if src_rate == dst_rate or len(data) == 0:
+        return data
+    frames = max(int(round(len(data) * dst_rate / src_rate)), 1)
+    pos = np.arange(frames, dtype=np.float64) * (src_rate / dst_rate)
+    i0 = np.minimum(pos.astype(np.int64), len(data) - 1)
+    i1 = np.minimum(i0 + 1, len(data) - 1)
+    frac = (pos - i0).astype(np.float32)[:, None]
+    return data[i0] * (1.0 - frac) + data[i1] * frac
+
+
+def to_engine_format(data, samplerate: int, channels: int = ENGINE_CHANNELS,
+                     engine_rate: int = ENGINE_SAMPLERATE):
+    """轉成引擎格式：(frames, channels) float32 @ engine_rate。先降聲道數再重取樣，少算一點。"""
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.shape[1] > channels:
+        data = data[:, :channels]
+    data = _resample(np.asarray(data, dtype=np.float32), samplerate, engine_rate)
+    return _fit_channels(data, channels)
+
+
+class PCMCache:
+    """
+    解碼後的 PCM 快取（已轉成引擎格式），以 bytes 計算上限、LRU 淘汰。
+    - 以 (mtime, size) 判斷檔案是否被覆寫（新聞音檔每輪更新都會重寫同一個檔名）
+    - pin() 的檔案不會被淘汰（互動 / 打招呼這類一直重播的音檔）
+    - preload() 在背景執行緒先解碼，播放時就不用碰硬碟
+    """
+
+    def __init__(self, max_bytes: int = PCM_CACHE_BYTES, workers: int = PRELOAD_WORKERS):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], np.ndarray, int]]" = OrderedDict()
+        self._pinned = set()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pcm-preload")
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ────────── Public API ──────────
+    def get(self, path: str) -> Tuple[np.ndarray, int]:
+        """回傳 (data, ENGINE_SAMPLERATE)；data 是共用的，呼叫端不可修改。"""
+        key = os.path.abspath(path)
+        stamp = self._stamp(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc("cache_hits")
+                return entry[1], entry[2]
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = Future()
+                owner = True
+            else:
+                owner = False
+            self.misses += 1
+        metrics.inc("cache_misses")
+        if not owner:
+            return pending.result()         # 已有人在解碼同一個檔案：等它
+        try:
+            t0 = time.perf_counter()
+            data, fs = self._decode(key)
+            metrics.observe("decode", time.perf_counter() - t0)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self._store(key, stamp, data, fs)
+            self._loading.pop(key, None)
+        pending.set_result((data, fs))
+        return data, fs
+
+    def peek(self, path: str) -> Optional[Tuple[np.ndarray, int]]:
+        """已在快取且檔案沒變才回傳 (data, samplerate)，否則 None；不解碼、不算命中率。"""
+        key = os.path.abspath(path)
+        try:
+            stamp = self._stamp(key)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                return entry[1], entry[2]
+        return None
+
+    def preload(self, paths: Iterable[str]) -> None:
+        """背景解碼；檔案不存在或解碼失敗就略過（真正播放時才報錯）。"""
+        for path in paths:
+            if path:
+                self._pool.submit(self._preload_one, path)
+
+    def pin(self, paths: Iterable[str]) -> None:
+        """常駐：載入並標記為不可淘汰。"""
+        for path in paths:
+            key = os.path.abspath(path)
+            with self._lock:
+                self._pinned.add(key)
+            self.preload([path])
+
+    def unpin(self, paths: Iterable[str]) -> None:
+        with self._lock:
+            for path in paths:
+                self._pinned.discard(os.path.abspath(path))
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "pinned": len(self._pinned),
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    # ────────── Internal ──────────
+    @staticmethod
+    def _stamp(key: str) -> Tuple[int, int]:
+        st = os.stat(key)
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def _decode(key: str) -> Tuple[np.ndarray, int]:
+        data, fs = sf.read(key, dtype='float32', always_2d=True)
+        data = to_engine_format(data, fs)
+        data.flags.writeable = False
+        return data, ENGINE_SAMPLERATE
+
+    def _preload_one(self, path: str) -> None:
+        try:
+            self.get(path)
+        except Exception:
+            pass
+
+    def _store(self, key: str, stamp, data: np.ndarray, fs: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1].nbytes
+        self._entries[key] = (stamp, data, fs)
+        self.bytes += data.nbytes
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self.bytes <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            _, data, _ = self._entries.pop(key)
+            self.bytes -= data.nbytes
+            self.evictions += 1
+
+
+class _Clip:
+    __slots__ = ("data", "pos", "on_done", "name", "requested", "queued", "started", "marks")
+
+    def __init__(self, data, on_done: Optional[Callable[[], None]], name: str, requested: Optional[float] = None,
+                 marks: Iterable[Tuple[int, Callable[[], None]]] = ()):
+        self.data = data
+        self.pos = 0                # 已送出的 frame 數
+        self.marks = deque(sorted(marks, key=lambda m: m[0]))    # (frame, callback)：播到這裡時呼叫
+        self.on_done = on_done
+        self.name = name
+        self.queued = time.perf_counter()
+        self.requested = requested or self.queued     # 呼叫 play_wav_to_device 的時間（含讀檔）
+        self.started = False
+
+
+class MixerChannel:
+    """
+    混音器的一個聲道（news / reaction / music …），各自有播放佇列與音量。
+    - priority：較高優先的聲道有聲音時，較低的會被 duck
+    - duck："pause" = 淡出後停在原位置、之後從同一個 sample 繼續；數字 = 壓低到這個音量繼續播
+    """
+
+    def __init__(self, name: str, priority: int = 0, gain: float = 1.0, duck="pause"):
+        self.name = name
+        self.priority = priority
+        self.gain = gain
+        self.duck = duck
+        self.clips: Deque[_Clip] = deque()
+        self.level = 1.0            # 目前 duck 造成的倍率（0~1），逐 sample 漸變
+        self.paused = False         # 完全淡出、停住
+        self._pause_at = None       # 開始淡出時的位置，暫停後退回這裡，不漏掉淡出那一段
+        self.last_end = None        # 上一段最後一個 sample 到達裝置的時間（量 inter_clip_gap）
+
+    @property
+    def active(self) -> bool:
+        return bool(self.clips) and not self.paused
+
+    def render(self, frames: int, target: float, step: float, pause: bool, finished: list, started: list,
+               reached: list):
+        """
+        產生 frames 個 frame（已乘上 gain 與 ramp）；沒聲音回傳 None。
+        播完的段落以 (聲道, clip, 結束的 frame 位置) 加進 finished，開始播的以 (聲道, clip, 位置) 加進 started，
+        播放位置經過的 mark 把 callback 加進 reached；淡出準備暫停時先不觸發（暫停會退回原位置），
+        暫停期間位置不動，mark 也跟著停。
+        """
+        if not self.clips:
+            # 空著的聲道直接套用目前狀態：被 duck 期間送進來的段落會先等著
+            self.level, self.paused, self._pause_at = target, pause, None
+            return None
+        if self.paused:
+            if pause:
+                return None
+            self.paused = False     # 從暫停的位置淡入
+        if pause and self._pause_at is None:
+            clip = self.clips[0]
+            self._pause_at = (clip, clip.pos)
+        elif not pause:
+            self._pause_at = None
+
+        width = self.clips[0].data.shape[1]
+        buf = np.zeros((frames, width), dtype=np.float32)
+        filled = 0
+        while filled < frames and self.clips:
+            clip = self.clips[0]
+            if not clip.started:
+                clip.started = True
+                started.append((self, clip, filled))
+            n = min(frames - filled, len(clip.data) - clip.pos)
+            buf[filled:filled + n] = clip.data[clip.pos:clip.pos + n]
+            clip.pos += n
+            filled += n
+            while clip.marks and (clip.pos >= len(clip.data) or not pause and clip.marks[0][0] < clip.pos):
+                reached.append(clip.marks.popleft()[1])
+            if clip.pos >= len(clip.data):
+                finished.append((self, self.clips.popleft(), filled))
+
+        # ramp：每個 frame 往 target 走 step
+        if self.level == target:
+            ramp = None
+        else:
+            direction = 1.0 if target > self.level else -1.0
+            ramp = self.level + direction * step * np.arange(1, frames + 1, dtype=np.float32)
+            ramp = np.clip(ramp, min(self.level, target), max(self.level, target))
+            self.level = float(ramp[-1])
+        if ramp is None:
+            if self.level != 1.0 or self.gain != 1.0:
+                buf *= self.level * self.gain
+        else:
+            buf *= (ramp * self.gain)[:, None]
+
+        if pause and self.level <= 0.0:
+            # 淡出完成：退回開始淡出的位置，恢復時從這裡淡入
+            clip, pos = self._pause_at
+            if self.clips and self.clips[0] is clip:
+                clip.pos = pos
+            self._pause_at = None
+            self.paused = True
+        return buf
+
+
+# 預設聲道：新聞被互動打斷時暫停、之後接著播；背景音樂在新聞 / 互動時壓低
+DEFAULT_CHANNELS = (
+    ("music", 0, 0.6, 0.25),
+    ("news", 1, 1.0, "pause"),
+    ("reaction", 2, 1.0, None),
+)
+DUCK_RAMP_SECONDS = 0.02
+
+
+# ────────── 輸出端（sink） ──────────
+class _TimeInfo(NamedTuple):
+    """無頭 sink 傳給 callback 的時間資訊，欄位與 sounddevice 相同（以 sink 的時鐘計）。"""
+    currentTime: float
+    outputBufferDacTime: float
+
+
+class AudioSink(ABC):
+    """
+    AudioEngine 的輸出端：open() 之後由 sink 反覆呼叫 callback(outdata, frames, time_info, status)。
+    - realtime=True：依實際時間送出（含靜音），行為與音效卡相同
+    - realtime=False：盡快跑完；引擎沒東西播時不產生靜音，直接等下一段
+    子類別必須實作 is_open / open / close。
+    """
+
+    realtime = True
+
+    @property
+    @abstractmethod
+    def is_open(self) -> bool:
+        ...
+
+    @abstractmethod
+    def open(self, samplerate: int, channels: int, callback, idle: Callable[[], bool]) -> None:
+        ...
+
+    def wake(self) -> None:
+        """有新段落進佇列（給不即時的 sink 用）。"""
+
+    def time(self) -> float:
+        """sink 的時鐘（秒）。"""
+        return time.perf_counter()
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class SoundDeviceSink(AudioSink):
+    """
+    真正的音效卡 / VAC：裝置經 devices 解析，開串流失敗時重新列舉裝置再試一次。
+    仍然失敗（裝置被拔掉等）就退避：OPEN_RETRY_MIN 秒內不再嘗試，之後每次失敗加倍到 OPEN_RETRY_MAX，
+    期間 open() 直接丟 RuntimeError，不會每段音檔都重新列舉裝置。
+    """
+
+    def __init__(self, device, blocksize: int = ENGINE_BLOCKSIZE, latency=ENGINE_LATENCY):
+        self.device = device
+        self.blocksize = blocksize
+        self.latency = latency
+        self._stream = None
+        self._retry_at = 0.0            # time.monotonic() 到這之前不再嘗試開啟
+        self._retry_delay = OPEN_RETRY_MIN
+
+    @property
+    def is_open(self) -> bool:
+        return self._stream is not None
+
+    def open(self, samplerate: int, channels: int, callback, idle: Callable[[], bool]) -> None:
+        if sd is None:
+            raise RuntimeError("sounddevice / PortAudio 無法使用，請改用無頭 sink（AUDIO_SINK=null）")
+        wait = self._retry_at - time.monotonic()
+        if wait > 0:
+            raise RuntimeError(f"音訊裝置 {self.device!r} 剛開啟失敗，{wait:.1f} 秒後再試")
+        try:
             try:
-                # 使用 sd.OutputStream 來更精細地控制音訊輸出
-                stream = sd.OutputStream(
-                    samplerate=fs,
-                    channels=data.shape[1],  # 聲道數 (1 或 2)
-                    dtype=data.dtype,
-                    device=dev_idx
-                )
-                current_stream = stream  # 將新的串流賦值給全域變數
-                stream.start()  # 啟動串流
-
-                # 將音訊數據寫入串流
-                stream.write(data)
-                sd.play(data, fs, device=dev_idx, blocking=True)
+                self._open_stream(devices.resolve(self.device), samplerate, channels, callback)
             except Exception as e:
-                print(f"播放音檔時發生錯誤: {e}")
-            finally:
-                on_done()  # 播放完成或發生錯誤後執行回調函數
+                print(f"開啟音訊裝置失敗，重新列舉裝置後再試: {e}")
+                devices.refresh(rescan=not any_stream_open())
+                self._open_stream(devices.resolve(self.device), samplerate, channels, callback)
+        except Exception:
+            self._retry_at = time.monotonic() + self._retry_delay
+            self._retry_delay = min(self._retry_delay * 2, OPEN_RETRY_MAX)
+            raise
+        self._retry_at = 0.0
+        self._retry_delay = OPEN_RETRY_MIN
+
+    def _open_stream(self, dev_idx: int, samplerate: int, channels: int, callback) -> None:
+        """開啟並啟動串流；start() 成功才算開啟，失敗時關掉這個串流。"""
+        stream = sd.OutputStream(
+            samplerate=samplerate,
+            channels=channels,
+            dtype="float32",
+            device=dev_idx,
+            blocksize=self.blocksize,
+            latency=self.latency,
+            callback=callback,
+        )
+        try:
+            stream.start()
+        except Exception:
+            stream.close()
+            raise
+        self._stream = stream
+
+    def time(self) -> float:
+        return self._stream.time if self._stream is not None else 0.0
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class _HeadlessSink(AudioSink):
+    """以執行緒代替音效卡驅動 callback；子類別實作 _write() 決定輸出去哪。"""
+
+    def __init__(self, realtime: bool = True, blocksize: int = HEADLESS_BLOCKSIZE):
+        self.realtime = realtime
+        self.blocksize = blocksize
+        self.samplerate = None
+        self.channels = None
+        self.frames = 0             # 已輸出的 frame 數；無頭 sink 的時鐘就是 frames / samplerate
+        self._thread = None
+        self._running = False
+        self._wake = threading.Event()
+
+    @property
+    def is_open(self) -> bool:
+        return self._thread is not None
+
+    def open(self, samplerate: int, channels: int, callback, idle: Callable[[], bool]) -> None:
+        self.samplerate, self.channels = samplerate, channels
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(callback, idle), daemon=True,
+                                        name=type(self).__name__)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def time(self) -> float:
+        return self.frames / self.samplerate if self.samplerate else 0.0
+
+    def close(self) -> None:
+        self._running = False
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _run(self, callback, idle) -> None:
+        buf = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        start = time.perf_counter()
+        while self._running:
+            if not self.realtime:
+                self._wake.clear()
+                if idle():
+                    self._wake.wait(0.05)
+                    continue
+            now = self.time()
+            callback(buf, self.blocksize, _TimeInfo(now, now), None)
+            self._write(buf)
+            self.frames += self.blocksize
+            if self.realtime:
+                delay = start + self.frames / self.samplerate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def _write(self, block) -> None:
+        pass
+
+
+class NullSink(_HeadlessSink):
+    """丟掉所有輸出，只留時鐘（量排程 / 延遲用）。"""
+
+
+class MemorySink(_HeadlessSink):
+    """把輸出收在記憶體，基準測試可以直接比對內容與 sample 位置。"""
+
+    def __init__(self, realtime: bool = False, blocksize: int = HEADLESS_BLOCKSIZE):
+        super().__init__(realtime, blocksize)
+        self._blocks = []
+        self._blocks_lock = threading.Lock()
+
+    @property
+    def data(self):
+        """(frames, channels) float32；尚未輸出時為空陣列。"""
+        with self._blocks_lock:
+            if not self._blocks:
+                return np.zeros((0, self.channels or ENGINE_CHANNELS), dtype=np.float32)
+            return np.concatenate(self._blocks)
+
+    def clear(self) -> None:
+        with self._blocks_lock:
+            self._blocks.clear()
+
+    def _write(self, block) -> None:
+        with self._blocks_lock:
+            self._blocks.append(block.copy())
+
+
+class WavSink(_HeadlessSink):
+    """把輸出錄成 WAV 檔（16-bit PCM）。"""
+
+    def __init__(self, path: str, realtime: bool = True, blocksize: int = HEADLESS_BLOCKSIZE):
+        super().__init__(realtime, blocksize)
+        self.path = path
+        self._file = None
+
+    def open(self, samplerate: int, channels: int, callback, idle: Callable[[], bool]) -> None:
+        self._file = sf.SoundFile(self.path, "w", samplerate=samplerate, channels=channels, subtype="PCM_16")
+        super().open(samplerate, channels, callback, idle)
+
+    def close(self) -> None:
+        super().close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, block) -> None:
+        self._file.write(block)
+
+
+class AudioEngine:
+    """
+    長駐的輸出引擎：裝置以固定格式（samplerate / channels）只開一次，
+    由串流 callback 把各 MixerChannel 的佇列混在一起輸出。
+    - submit()：把音檔排進某個聲道的佇列，前後兩段之間不會有空白；格式不同的資料會先轉換
+      （從 pcm_cache 來的已是引擎格式，不用再轉、也不會複製）
+    - 高優先的聲道有聲音時，低優先的聲道依其 duck 設定淡出暫停或壓低音量（DUCK_RAMP_SECONDS 的漸變）
+    - stop() / flush()：清空某個聲道（或全部）的佇列，不會阻塞
+    - on_done 在獨立的執行緒呼叫，不佔用音訊執行緒；被清掉的段落也會呼叫
+      （排程器靠它接下一句 / 結束腳本）
+    沒有東西播時串流照樣開著，送出靜音。輸出端由 sink 決定（預設為 device 的 SoundDeviceSink）。
+    """
+
+    def __init__(self, device=None, samplerate: int = ENGINE_SAMPLERATE, channels: int = ENGINE_CHANNELS,
+                 blocksize: int = ENGINE_BLOCKSIZE, latency=ENGINE_LATENCY, mixer=DEFAULT_CHANNELS,
+                 ramp_seconds: float = DUCK_RAMP_SECONDS, metrics: Optional[AudioMetrics] = None,
+                 sink: Optional[AudioSink] = None):
+        self.device = device
+        self.sink = sink or SoundDeviceSink(device, blocksize, latency)
+        self.metrics = metrics or globals()["metrics"]
+        self.samplerate = samplerate
+        self.channels = channels
+        self._ramp_step = 1.0 / max(ramp_seconds * samplerate, 1.0)
+        self.mixer: Dict[str, MixerChannel] = {}
+        for name, priority, gain, duck in mixer:
+            self.mixer[name] = MixerChannel(name, priority, gain, duck)
+        self._lock = threading.Lock()
+        self._open_pending = False
+        # 完成通知與開串流都交給這條執行緒處理
+        self._events: "queue.Queue" = queue.Queue()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True, name="AudioEngineDispatch")
+        self._dispatcher.start()
+
+    # ────────── Public API ──────────
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return any(ch.clips for ch in self.mixer.values())
+
+    def channel_busy(self, channel: str) -> bool:
+        with self._lock:
+            return bool(self.mixer[channel].clips)
+
+    def set_gain(self, channel: str, gain: float) -> None:
+        with self._lock:
+            self.mixer[channel].gain = gain
+
+    def submit(self, data, samplerate: int, on_done: Optional[Callable[[], None]] = None, name: str = "",
+               channel: str = "news", requested: Optional[float] = None,
+               marks: Iterable[Tuple[float, Callable[[], None]]] = ()) -> None:
+        """
+        data 為 (frames, channels)；排到該聲道佇列最後面。已是引擎格式時不會複製。
+        requested：呼叫端開始處理的 time.perf_counter()，用來量 first_sample_latency。
+        marks：[(秒, callback)]，以這段實際送出的位置計（被 duck 暫停時不前進），在 dispatcher 執行緒呼叫；
+        段落被 flush 掉時，還沒到的 mark 不會呼叫。
+        """
+        if channel not in self.mixer:
+            raise ValueError(f"沒有這個聲道：{channel}")
+        data = to_engine_format(data, samplerate, self.channels, self.samplerate)
+        self.metrics.inc("clips_submitted")
+        self.metrics.observe("clip_duration", len(data) / self.samplerate)
+        last = max(len(data) - 1, 0)
+        frames = [(min(max(int(sec * self.samplerate), 0), last), fn) for sec, fn in marks]
+        with self._lock:
+            self.mixer[channel].clips.append(_Clip(data, on_done, name, requested, frames))
+        if self.sink.is_open:
+            self.sink.wake()
+        else:
+            self._request_open()
+
+    def flush(self, channel: Optional[str] = None) -> int:
+        """清掉某個聲道（None = 全部）正在播與排隊中的段落；回傳被清掉的數量。"""
+        with self._lock:
+            targets = [self.mixer[channel]] if channel else list(self.mixer.values())
+            dropped = []
+            for ch in targets:
+                dropped.extend(ch.clips)
+                ch.clips.clear()
+        if dropped:
+            self.metrics.inc("clips_flushed", len(dropped))
+        for clip in dropped:
+            self._events.put(("done", clip))
+        return len(dropped)
+
+    stop = flush
+
+    def close(self) -> None:
+        self.flush()
+        self._events.put(("close", None))
+        self._dispatcher.join(timeout=2)
+
+    # ────────── Internal ──────────
+    def _request_open(self) -> None:
+        with self._lock:
+            if self._open_pending:
+                return
+            self._open_pending = True
+        self._events.put(("open", None))
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        """PortAudio 音訊執行緒：只做混音，不做 I/O、不呼叫使用者的 callback。"""
+        now = time.perf_counter()
+        finished = []
+        started = []
+        reached = []
+        mixed = None
+        with self._lock:
+            # 有聲音的聲道中最高的優先度；比它低的聲道都要 duck
+            top = max((ch.priority for ch in self.mixer.values() if ch.active), default=None)
+            for ch in self.mixer.values():
+                ducked = top is not None and ch.priority < top and ch.duck is not None
+                pause = ducked and ch.duck == "pause"
+                target = 0.0 if pause else (float(ch.duck) if ducked else 1.0)
+                buf = ch.render(frames, target, self._ramp_step, pause, finished, started, reached)
+                if buf is None:
+                    continue
+                if mixed is None:
+                    mixed = buf
+                else:
+                    mixed += buf
+        if mixed is None:
+            outdata[:] = 0
+        else:
+            np.clip(mixed, -1.0, 1.0, out=outdata)
+        for fn in reached:
+            self._events.put_nowait(("mark", fn))
+        for _, clip, _ in finished:
+            self._events.put_nowait(("done", clip))
+        self._record(now, frames, time_info, status, started, finished)
+
+    def _record(self, now: float, frames: int, time_info, status, started, finished) -> None:
+        """callback 的量測：把 frame 位置換算成 sample 到達裝置的時間（perf_counter 時基）。"""
+        m = self.metrics
+        if status is not None and getattr(status, "output_underflow", False):
+            m.inc("underruns")
+        dac = now
+        if time_info is not None:
+            try:
+                delay = time_info.outputBufferDacTime - time_info.currentTime
+                if 0 <= delay < 1:
+                    dac = now + delay
+            except AttributeError:
+                pass
+        for ch, clip, offset in started:
+            at = dac + offset / self.samplerate
+            m.observe("queue_wait", now - clip.queued)
+            m.observe("first_sample_latency", at - clip.requested)
+            if ch.last_end is not None:
+                gap = at - ch.last_end
+                if gap <= GAP_WINDOW:
+                    m.observe("inter_clip_gap", max(gap, 0.0))
+                    m.observe(f"inter_clip_gap.{ch.name}", max(gap, 0.0))
+                else:
+                    m.inc("idle_periods")
+        for ch, clip, offset in finished:
+            ch.last_end = dac + offset / self.samplerate
+            m.inc("clips_finished")
+        m.observe("callback", time.perf_counter() - now)
+
+    def _open(self) -> None:
+        self.sink.open(self.samplerate, self.channels, self._callback, idle=lambda: not self.busy)
+
+    def _dispatch(self) -> None:
+        while True:
+            kind, arg = self._events.get()
+            if kind == "mark":
+                try:
+                    arg()
+                except Exception as e:
+                    print(f"播放位置 callback 發生錯誤: {e}")
+            elif kind == "done":
+                if arg.on_done:
+                    try:
+                        arg.on_done()
+                    except Exception as e:
+                        print(f"播放完成 callback 發生錯誤 ({arg.name}): {e}")
+            elif kind == "open":
+                with self._lock:
+                    self._open_pending = False
+                if self.sink.is_open:
+                    continue
+                try:
+                    self._open()
+                except Exception as e:
+                    print(f"開啟音訊裝置時發生錯誤: {e}")
+                    self.flush()
+            elif kind == "close":
+                self.sink.close()
+                return
+
+
+pcm_cache = PCMCache()
+
+
+def preload(paths: Iterable[str]) -> None:
+    """先在背景把音檔解碼進 pcm_cache。"""
+    pcm_cache.preload(paths)
+
+
+def pin(paths: Iterable[str]) -> None:
+    """常駐在 pcm_cache，不會被淘汰。"""
+    pcm_cache.pin(paths)
+
+
+def pin_dir(directory: str, pattern: str = "*.wav") -> int:
+    """把整個資料夾的音檔常駐；回傳檔案數。"""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    pin(paths)
+    return len(paths)
+
+
+class DeviceRegistry:
+    """
+    輸出裝置列表只列舉一次並快取；name / (name, host) → index 的結果也快取。
+    - refresh()：重新列舉（開串流失敗時會自動呼叫）；rescan=True 會重啟 PortAudio，
+      才看得到新插上的裝置，所以只在沒有任何串流開著時使用
+    - 名稱找不到完全相同的，會退而比對開頭（MME 會把裝置名稱截到 31 個字）
+    """
+
+    def __init__(self, host_preference=HOST_PREFERENCE):
+        self.host_preference = tuple(host_preference)
+        self._lock = threading.Lock()
+        self._devices = None            # [(index, name, host, max_output_channels)]
+        self._resolved: Dict[object, int] = {}
+
+    def configure(self, host_preference=None) -> None:
+        if host_preference:
+            with self._lock:
+                self.host_preference = tuple(host_preference)
+                self._resolved.clear()
+
+    def refresh(self, rescan: bool = False) -> None:
+        with self._lock:
+            if rescan and sd is not None:
+                try:
+                    sd._terminate()
+                    sd._initialize()
+                except Exception as e:
+                    print(f"重新初始化 PortAudio 失敗: {e}")
+            self._devices = None
+            self._resolved.clear()
+
+    def outputs(self):
+        """[(index, name, host)]，只含有輸出聲道的裝置。"""
+        with self._lock:
+            return [(i, name, host) for i, name, host, out in self._enumerate() if out > 0]
+
+    def resolve(self, name_or_id) -> int:
+        """把 'Line 1 ...' 或 (name, host) 轉成唯一 device index"""
+        if isinstance(name_or_id, int):
+            return name_or_id                    # 已是索引
+        with self._lock:
+            idx = self._resolved.get(name_or_id)
+            if idx is None:
+                idx = self._resolved[name_or_id] = self._lookup(name_or_id)
+            return idx
+
+    def _enumerate(self):
+        if sd is None:
+            return []
+        if self._devices is None:
+            hosts = [h['name'] for h in sd.query_hostapis()]
+            self._devices = [(i, d['name'], hosts[d['hostapi']], d['max_output_channels'])
+                             for i, d in enumerate(sd.query_devices())]
+        return self._devices
+
+    def _lookup(self, name_or_id) -> int:
+        devices = [d for d in self._enumerate() if d[3] > 0]
+        if isinstance(name_or_id, tuple):
+            # 明確 (name, host) 二元組
+            name, host = name_or_id
+            for i, dev_name, dev_host, _ in devices:
+                if dev_name == name and dev_host == host:
+                    return i
+            raise ValueError(f"沒有找到裝置 {name} @ {host}")
+        # 字串 → 找到第一個符合 host_preference
+        matches = [(i, host) for i, dev_name, host, _ in devices if dev_name == name_or_id]
+        if not matches:
+            matches = [(i, host) for i, dev_name, host, _ in devices
+                       if dev_name.startswith(name_or_id) or name_or_id.startswith(dev_name)]
+        for pref in self.host_preference:
+            for idx, host in matches:
+                if host == pref:
+                    return idx
+        if matches:
+            return matches[0][0]                 # 退而取第一個
+        raise ValueError(f"找不到裝置 {name_or_id}")
+
+
+devices = DeviceRegistry()
+
+
+def device_from_config(name: Optional[str], host_preference: Optional[str] = None):
+    """
+    設定檔 / 環境變數 → play_wav_to_device 用的裝置：
+    純數字當 index，其餘當裝置名稱；host_preference 為逗號分隔的 host API 順序。
+    """
+    if host_preference:
+        devices.configure([h.strip() for h in host_preference.split(",") if h.strip()])
+    if name is None or not name.strip():
+        raise ValueError("沒有設定輸出裝置")
+    name = name.strip()
+    return int(name) if name.isdigit() else name
+
+
+# 新引擎用的 sink：device → AudioSink；預設接真正的裝置
+_sink_factory: Callable[[object], AudioSink] = SoundDeviceSink
+
+
+def use_sink(factory: Callable[[object], AudioSink]) -> None:
+    """之後建立的引擎都改用 factory(device) 產生的 sink（要在第一次播放前呼叫）。"""
+    global _sink_factory
+    _sink_factory = factory
+
+
+def sink_from_config(spec: Optional[str]) -> Callable[[object], AudioSink]:
+    """
+    AUDIO_SINK 設定 → sink factory：
+        sounddevice（預設） / null / memory / wav:輸出檔.wav
+    後面加 :fast 表示不即時、盡快跑完，例如 null:fast、wav:out.wav:fast。
+    """
+    parts = [p for p in (spec or "sounddevice").strip().split(":") if p]
+    kind = parts[0].lower() if parts else "sounddevice"
+    fast = "fast" in parts[1:]
+    args = [p for p in parts[1:] if p != "fast"]
+    if kind == "sounddevice":
+        return SoundDeviceSink
+    if kind == "null":
+        return lambda device: NullSink(realtime=not fast)
+    if kind == "memory":
+        return lambda device: MemorySink(realtime=not fast)
+    if kind == "wav":
+        path = args[0] if args else "broadcast.wav"
+        return lambda device: WavSink(path, realtime=not fast)
+    raise ValueError(f"不認得的 AUDIO_SINK：{spec}")
+
+
+# 每個裝置設定一個引擎（以設定值為 key，播放時不用列舉裝置）
+_engines: Dict[object, AudioEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(device_name) -> AudioEngine:
+    with _engines_lock:
+        engine = _engines.get(device_name)
+        if engine is None:
+            engine = _engines[device_name] = AudioEngine(device_name, sink=_sink_factory(device_name))
+        return engine
+
+
+def any_stream_open() -> bool:
+    with _engines_lock:
+        return any(isinstance(engine.sink, SoundDeviceSink) and engine.sink.is_open for engine in _engines.values())
+
+
+def stop_playback(channel=None):
+    """
+            停止當前正在播放的音檔（清空所有引擎某個聲道或全部的佇列），不會等待裝置。
+            """
+    with _engines_lock:
+        engines = list(_engines.values())
+    dropped = sum(engine.flush(channel) for engine in engines)
+    if dropped:
+        print("手動停止播放...")
+    else:
+        print("目前沒有音檔正在播放。")
+
+
+def list_devices():
+    if sd is None:
+        print("sounddevice / PortAudio 無法使用，沒有可列出的裝置")
+        return
+    for i, name, host in devices.outputs():
+        print(f"{i:2d}: {name}  [{host}]")
+
+def _resolve_device(name_or_id, host_preference=None):
+    """把 'Line 1 ...' 或 (name, host) 轉成唯一 device index（走 devices 的快取）"""
+    devices.configure(host_preference)
+    return devices.resolve(name_or_id)
+
+def load_wav(wav_path) -> Optional[Tuple[np.ndarray, int]]:
+    """經 pcm_cache 讀檔（沒快取時在呼叫端執行緒解碼）；讀不到回傳 None。"""
+    try:
+        return pcm_cache.get(wav_path)
+    except Exception as e:
+        print(f"播放音檔時發生錯誤: {e}")
+        metrics.inc("load_errors")
+        return None
+
+
+def play_pcm_to_device(pcm, device_name, on_done=None, channel="news", marks=(), name="", requested=None):
+    """把 load_wav 的結果排進裝置某個混音聲道的佇列，立即返回（不碰硬碟）。"""
+    data, fs = pcm
+    get_engine(device_name).submit(data, fs, on_done=on_done, name=name, channel=channel,
+                                    requested=requested, marks=marks)
+
+
+def play_wav_to_device(wav_path, device_name, on_done=lambda:None, channel="news", marks=()):
+    """
+    讀檔後排進裝置某個混音聲道的佇列，立即返回；播完（或被 stop_playback 清掉）後呼叫 on_done。
+    讀不到檔時直接呼叫 on_done，marks 不會呼叫。
+    marks：[(秒, callback)]，播到該位置時呼叫（見 AudioEngine.submit）。
+    """
+    requested = time.perf_counter()
+    pcm = load_wav(wav_path)
+    if pcm is None:
+        if on_done:
+            on_done()
+        return
+    play_pcm_to_device(pcm, device_name, on_done=on_done, channel=channel, marks=marks,
+                       name=str(wav_path), requested=requested)
+
 
-    threading.Thread(target=_worker, daemon=True).start()
\ No newline at end of file
+def dump_metrics(path: str = "audio_metrics.json") -> Dict[str, object]:
+    """把目前的播放量測寫成 JSON 並回傳內容。"""
+    metrics.dump(path)
+    return metrics.snapshot()
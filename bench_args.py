@@ -0,0 +1,11 @@
+# bench_args.py
+"""基準測試腳本共用的 argparse 型別。"""
+import argparse
+
+
+def positive_int(text: str) -> int:
+    """--repeat 這類次數：必須 >= 1，否則 argparse 直接報錯。"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"必須 >= 1：{text}")
+    return value
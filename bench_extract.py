@@ -0,0 +1,156 @@
+# bench_extract.py
+"""
+擷取後端基準測試：以錄製好的 UDN 頁面（record_udn.py）比較各後端的
+每秒頁數與峰值記憶體，並檢查所有後端的輸出是否完全相同。
+
+    python bench_extract.py                       # 所有可用後端
+    python bench_extract.py --backends bs4 selectolax --repeat 10
+
+每個後端在獨立的子程序中執行，峰值記憶體才不會互相影響：
+- py_peak：tracemalloc 記錄的 Python 物件峰值
+- rss：子程序最大常駐記憶體的增量（只在有 resource 模組的平台上）
+"""
+import argparse
+import multiprocessing as mp
+import queue
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from extractors import available_backends, get_backend
+from record_udn import RECORD_DIR
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+
+def _maxrss_bytes() -> int:
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024     # macOS 為 bytes，Linux / BSD 為 KB
+
+
+def _bench_backend(name: str, listings: List[str], articles: List[str], repeat: int, out) -> None:
+    """子程序：跑 repeat 輪並回傳耗時、記憶體與第一輪的輸出。"""
+    backend = get_backend(name)
+    backend.parse_article(articles[0] if articles else "<html></html>")     # 暖身（lazy import 等）
+    rss_before = _maxrss_bytes()
+
+    outputs = {"listing": [backend.parse_listing(h) for h in listings],
+               "article": [backend.parse_article(h) for h in articles]}
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for h in listings:
+            backend.parse_listing(h)
+    t_listing = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for h in articles:
+            backend.parse_article(h)
+    t_article = time.perf_counter() - t0
+    rss = max(_maxrss_bytes() - rss_before, 0)
+
+    # tracemalloc 會拖慢解析，另外跑一輪只量記憶體
+    tracemalloc.start()
+    for h in listings:
+        backend.parse_listing(h)
+    for h in articles:
+        backend.parse_article(h)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    out.put({
+        "name": name,
+        "listing_pps": len(listings) * repeat / t_listing if t_listing else 0.0,
+        "article_pps": len(articles) * repeat / t_article if t_article else 0.0,
+        "py_peak": py_peak,
+        "rss": rss,
+        "outputs": outputs,
+    })
+
+
+def _diff(ref: Dict, other: Dict, files: Dict[str, List[str]]) -> List[str]:
+    problems = []
+    for kind in ("listing", "article"):
+        for fname, a, b in zip(files[kind], ref[kind], other[kind]):
+            if a != b:
+                problems.append(f"{fname}: {a!r:.80} != {b!r:.80}")
+    return problems
+
+
+def _collect(proc, out, timeout: float, poll: float = 1.0) -> Optional[dict]:
+    """等子程序的結果；子程序先結束（crash）或超過 timeout 秒回傳 None。"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return out.get(timeout=poll)
+        except queue.Empty:
+            if proc.exitcode is not None:
+                break
+    try:
+        return out.get(timeout=poll)        # 剛好在結束前送出的結果
+    except queue.Empty:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="擷取後端基準測試")
+    parser.add_argument("--pages", type=Path, default=RECORD_DIR, help="record_udn.py 的輸出目錄")
+    parser.add_argument("--backends", nargs="*", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=600, help="每個後端最多等幾秒")
+    args = parser.parse_args()
+
+    listing_files = sorted(args.pages.glob("listing*.html"))
+    article_files = sorted(args.pages.glob("article*.html"))
+    if not listing_files and not article_files:
+        print(f"{args.pages} 沒有錄製的頁面，請先執行 python record_udn.py")
+        return
+    listings = [p.read_text(encoding="utf-8", errors="replace") for p in listing_files]
+    articles = [p.read_text(encoding="utf-8", errors="replace") for p in article_files]
+    files = {"listing": [p.name for p in listing_files], "article": [p.name for p in article_files]}
+
+    names = args.backends or available_backends()
+    print(f"{len(listings)} 個列表頁、{len(articles)} 篇文章，重複 {args.repeat} 次")
+    print(f"{'backend':<12} {'listing/s':>10} {'article/s':>10} {'py_peak':>10} {'rss':>10}")
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for name in names:
+        out = ctx.Queue()
+        proc = ctx.Process(target=_bench_backend, args=(name, listings, articles, args.repeat, out))
+        proc.start()
+        res = _collect(proc, out, args.timeout)
+        if res is None:
+            if proc.is_alive():
+                proc.terminate()
+                print(f"{name:<12} ✗ 超過 {args.timeout:g} 秒沒有結果，已中止")
+            else:
+                print(f"{name:<12} ✗ 子程序異常結束（exitcode {proc.exitcode}）")
+            proc.join()
+            continue
+        proc.join()
+        results.append(res)
+        print(f"{name:<12} {res['listing_pps']:>10.1f} {res['article_pps']:>10.1f} "
+              f"{res['py_peak'] / 1e6:>8.1f}MB {res['rss'] / 1e6:>8.1f}MB")
+
+    if not results:
+        return
+    ref = results[0]
+    for res in results[1:]:
+        problems = _diff(ref["outputs"], res["outputs"], files)
+        if problems:
+            print(f"✗ {res['name']} 與 {ref['name']} 的輸出有 {len(problems)} 處不同：")
+            for line in problems[:10]:
+                print(f"    {line}")
+        else:
+            print(f"✓ {res['name']} 與 {ref['name']} 輸出完全相同")
+
+
+if __name__ == "__main__":
+    main()
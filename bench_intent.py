@@ -0,0 +1,164 @@
+# bench_intent.py
+"""
+本機意圖分類（intent.py）基準測試：以 LLM 的標籤為準，量測快速路徑的精確度與速度。
+
+標註好的聊天紀錄為 bench_data/chat_labels.jsonl，每行 {"message": ..., "label": <LLM 標籤>}。
+可以用 --label-with-llm 把一行一則的聊天紀錄送給 LLM 標註（走 llm_client，LLM_BASE_URL 可指到假 server）：
+
+    python bench_intent.py --label-with-llm chat.txt
+    python bench_intent.py --threshold 0.8 --json bench_intent.json
+
+報告：
+- 各信心門檻下：走快速路徑的比例（省下的 LLM 請求）與其精確度（本機標籤 == LLM 標籤）
+- 指定門檻下各標籤的 precision / recall，以及最常見的錯誤與例句
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from bench_args import positive_int
+from intent import FAST_PATH_CONFIDENCE, KEYWORDS, intents
+from llm_client import LLMClient, MicroBatcher
+
+LOG_PATH = Path("bench_data/chat_labels.jsonl")
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def label_with_llm(source: Path, out: Path) -> int:
+    """把 source（一行一則訊息）送給 LLM 分類，寫成 jsonl，回傳則數。"""
+    messages = [line.strip() for line in source.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    async def run() -> List[Tuple[str, str]]:
+        client = LLMClient()
+        batcher = MicroBatcher(client)
+        try:
+            return await asyncio.gather(*(batcher.classify(m) for m in messages))
+        finally:
+            await batcher.close()
+            await client.close()
+
+    results = asyncio.run(run())
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        for message, (label, _) in zip(messages, results):
+            f.write(json.dumps({"message": message, "label": label}, ensure_ascii=False) + "\n")
+    return len(messages)
+
+
+def load_log(path: Path) -> List[Tuple[str, str]]:
+    rows = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            item = json.loads(line)
+            rows.append((item["message"], item["label"]))
+    return rows
+
+
+def sweep(predictions: List[Tuple[str, float]], truth: List[str]) -> List[Dict[str, float]]:
+    rows = []
+    for threshold in THRESHOLDS:
+        fast = [(p, t) for (p, conf), t in zip(predictions, truth) if conf >= threshold]
+        correct = sum(p == t for p, t in fast)
+        rows.append({
+            "threshold": threshold,
+            "fast_path": len(fast) / len(truth),
+            "precision": correct / len(fast) if fast else None,
+        })
+    return rows
+
+
+def per_label(predictions: List[Tuple[str, float]], truth: List[str], threshold: float) -> Dict[str, dict]:
+    fast_by_label = Counter()
+    correct_by_label = Counter()
+    truth_count = Counter(truth)
+    for (label, conf), t in zip(predictions, truth):
+        if conf >= threshold:
+            fast_by_label[label] += 1
+            correct_by_label[label] += label == t
+    result = {}
+    for label in KEYWORDS:
+        fast = fast_by_label[label]
+        result[label] = {
+            "llm": truth_count[label],
+            "fast": fast,
+            "precision": correct_by_label[label] / fast if fast else None,
+            "recall": correct_by_label[label] / truth_count[label] if truth_count[label] else None,
+        }
+    return result
+
+
+def _fmt(value) -> str:
+    return f"{value:.3f}" if value is not None else "-"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本機意圖分類基準測試（以 LLM 標籤為準）")
+    parser.add_argument("--log", type=Path, default=LOG_PATH, help="標註好的 jsonl")
+    parser.add_argument("--label-with-llm", type=Path, help="把一行一則的聊天紀錄送給 LLM 標註後結束")
+    parser.add_argument("--threshold", type=float, default=FAST_PATH_CONFIDENCE)
+    parser.add_argument("--repeat", type=positive_int, default=20, help="重複分類幾輪取平均（>= 1）")
+    parser.add_argument("--examples", type=int, default=3, help="每種錯誤列出幾句例句")
+    parser.add_argument("--json", type=str, default=None, help="把結果寫成 JSON")
+    args = parser.parse_args()
+
+    if args.label_with_llm:
+        n = label_with_llm(args.label_with_llm, args.log)
+        print(f"已標註 {n} 則訊息到 {args.log}")
+        return
+    if not args.log.exists():
+        print(f"{args.log} 不存在，請先執行 python bench_intent.py --label-with-llm <聊天紀錄>")
+        return
+
+    rows = load_log(args.log)
+    if not rows:
+        print(f"{args.log} 沒有標註好的訊息，請先執行 python bench_intent.py --label-with-llm <聊天紀錄>")
+        return
+    messages = [m for m, _ in rows]
+    truth = [t for _, t in rows]
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        predictions = [intents.classify(m) for m in messages]
+    elapsed = time.perf_counter() - t0
+    us_per_message = elapsed / args.repeat / len(messages) * 1e6
+    print(f"{len(messages)} 則訊息，本機分類平均 {us_per_message:.1f} µs/則")
+
+    print(f"{'門檻':>6} {'快速路徑':>8} {'精確度':>8}")
+    table = sweep(predictions, truth)
+    for row in table:
+        print(f"{row['threshold']:>6.2f} {row['fast_path']:>8.1%} {_fmt(row['precision']):>8}")
+
+    labels = per_label(predictions, truth, args.threshold)
+    print(f"\n門檻 {args.threshold}：")
+    print(f"{'label':<10} {'LLM':>6} {'本機':>6} {'precision':>10} {'recall':>8}")
+    for label, row in labels.items():
+        print(f"{label:<10} {row['llm']:>6} {row['fast']:>6} {_fmt(row['precision']):>10} {_fmt(row['recall']):>8}")
+
+    mistakes = defaultdict(list)
+    for message, (label, conf), t in zip(messages, predictions, truth):
+        if conf >= args.threshold and label != t:
+            mistakes[(label, t)].append(message)
+    if mistakes:
+        print("\n最常見的錯誤（本機 → LLM）：")
+        for (label, t), examples in sorted(mistakes.items(), key=lambda kv: -len(kv[1]))[:10]:
+            print(f"  {label} → {t}：{len(examples)} 則，例如 {examples[:args.examples]}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "messages": len(messages),
+                "us_per_message": us_per_message,
+                "threshold": args.threshold,
+                "sweep": table,
+                "labels": labels,
+                "mistakes": {f"{label}->{t}": len(v) for (label, t), v in mistakes.items()},
+            }, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# bench_refresh.py
+"""
+離線端到端更新基準測試：不連 udn.com 也不連 TTS 主機。
+
+1. fake_udn_server 提供 record_udn.py 錄下的頁面與圖片（可加延遲）
+2. fake_tts_server 以相同框架回傳罐頭 WAV（可加延遲）
+3. 在暫存目錄中執行 news_parser.refresh，預設連跑兩輪（第二輪測增量 / 快取）
+
+    python record_udn.py                          # 先錄一次
+    python bench_refresh.py --tts-latency 0.3 --runs 2
+    python bench_refresh.py --json result.json    # 輸出結果供比較
+    python bench_refresh.py --hedge --tts-slow-rate 0.05 --no-cache    # 量 hedging 對長尾的效果
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from article_index import ArticleIndex
+from fake_tts_server import FakeTTSServer
+from fake_udn_server import FakeUDNServer
+from news_parser import MAX_WORKERS, TTS_MAX_PER_PORT, TTSClient, refresh
+from record_udn import RECORD_DIR
+from tts_cache import TTSCache
+
+
+def _run_once(tts_client, udn, tts, args):
+    before = (udn.requests, udn.not_modified, udn.bytes_out, tts.requests, tts.bytes_in, tts.bytes_out)
+    cache_before = tts_client.cache.stats() if tts_client.cache else None
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    t0 = time.perf_counter()
+    with quiet:
+        report = refresh(
+            tts_client,
+            index=ArticleIndex() if not args.no_index else None,
+            max_per_port=args.max_per_port,
+            list_url=udn.list_url,
+            base_url=udn.origin,
+            backend=args.backend,
+            max_workers=args.workers,
+        )
+    wall = time.perf_counter() - t0
+
+    crawl = {}
+    for news in report["fetched"]:
+        for stage, seconds in news["timings"].items():
+            crawl[stage] = crawl.get(stage, 0.0) + seconds
+    tts_stats = report["tts"] or {}
+    cache = None
+    if cache_before:
+        after = tts_client.cache.stats()
+        cache = {"hits": after["hits"] - cache_before["hits"], "misses": after["misses"] - cache_before["misses"]}
+    return {
+        "wall": wall,
+        "articles": len(report["articles"]),
+        "carried": sum(1 for news in report["fetched"] if news["carried"]),
+        "stages": report["stages"],
+        "crawl_busy": crawl,
+        "http": {
+            "requests": udn.requests - before[0],
+            "not_modified": udn.not_modified - before[1],
+            "bytes_out": udn.bytes_out - before[2],
+        },
+        "tts": {
+            "requests": tts.requests - before[3],
+            "bytes_in": tts.bytes_in - before[4],
+            "bytes_out": tts.bytes_out - before[5],
+            "sentences": tts_stats.get("count", 0),
+            "p50": tts_stats.get("p50", 0.0),
+            "p95": tts_stats.get("p95", 0.0),
+            "cache": cache,
+        },
+    }
+
+
+def _print(n: int, r: dict) -> None:
+    s = r["stages"]
+    first = s["first_publish"]
+    print(f"── 第 {n} 輪：{r['wall']:.2f}s，{r['articles']} 篇（沿用 {r['carried']}）")
+    print(f"   首篇發佈 {first:.2f}s" if first is not None else "   首篇發佈 -")
+    print(f"   等待爬蟲 {s['crawl_wait']:.2f}s  TTS {s['tts']:.2f}s  發佈 {s['publish']:.3f}s")
+    busy = "  ".join(f"{k} {v:.2f}s" for k, v in r["crawl_busy"].items())
+    print(f"   爬蟲累計（各執行緒加總）：{busy or '-'}")
+    h, t = r["http"], r["tts"]
+    print(f"   HTTP {h['requests']} 次（304：{h['not_modified']}），{h['bytes_out'] / 1024:.0f} KB")
+    print(f"   TTS {t['requests']} 次 / {t['sentences']} 句，送出 {t['bytes_in'] / 1024:.0f} KB、"
+          f"收到 {t['bytes_out'] / 1024:.0f} KB，p50 {t['p50']:.3f}s p95 {t['p95']:.3f}s")
+    if t["cache"]:
+        print(f"   TTS 快取：命中 {t['cache']['hits']} / 未命中 {t['cache']['misses']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="離線端到端更新基準測試")
+    parser.add_argument("--pages", type=Path, default=RECORD_DIR)
+    parser.add_argument("--workdir", type=Path, help="預設為新的暫存目錄")
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    parser.add_argument("--tts-slow-rate", type=float, default=0.0, help="TTS 以此機率改用 --tts-slow-latency（長尾）")
+    parser.add_argument("--tts-slow-latency", type=float, default=2.0)
+    parser.add_argument("--wav", type=Path, help="TTS 一律回傳這個 WAV 檔")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--max-per-port", type=int, default=TTS_MAX_PER_PORT)
+    parser.add_argument("--backend", default=None, help="extractors 的擷取後端")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 TTS 快取")
+    parser.add_argument("--hedge", action="store_true", help="TTSClient 開啟 hedging")
+    parser.add_argument("--no-index", action="store_true", help="不使用文章索引（每輪完整重爬）")
+    parser.add_argument("--json", type=Path, help="把結果寫成 JSON")
+    parser.add_argument("--verbose", action="store_true", help="顯示 news_parser 的輸出")
+    args = parser.parse_args()
+
+    if not (args.pages / "manifest.json").exists():
+        print(f"{args.pages} 沒有錄製的頁面，請先執行 python record_udn.py")
+        return
+    pages = args.pages.resolve()
+    wav = args.wav.read_bytes() if args.wav else None
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="bench_refresh_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    cwd = os.getcwd()
+
+    results = []
+    with FakeUDNServer(pages, latency=args.http_latency) as udn, \
+            FakeTTSServer(latency=args.tts_latency, wav_bytes=wav, slow_rate=args.tts_slow_rate,
+                          slow_latency=args.tts_slow_latency) as tts:
+        os.chdir(workdir)
+        try:
+            cache = None if args.no_cache else TTSCache()
+            tts_client = TTSClient("127.0.0.1", "bench", ports=tts.ports, cache=cache, hedge=args.hedge)
+            print(f"工作目錄 {workdir}，HTTP 延遲 {args.http_latency}s，TTS 延遲 {args.tts_latency}s")
+            try:
+                for n in range(1, args.runs + 1):
+                    result = _run_once(tts_client, udn, tts, args)
+                    results.append(result)
+                    _print(n, result)
+            finally:
+                tts_client.close()
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        args.json.write_text(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "runs": results},
+                                        ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+# bench_scheduler.py
+"""
+SubtitleScheduler 基準 / 壓力測試：虛擬時鐘 + 假音訊 + 假 UI，不需要音效卡與 Qt。
+
+量測每句的排程開銷、記憶體峰值、enqueue → 第一句字幕的時間，並檢查：
+- 每句剛好播一次、依序播（沒有遺漏、重複、亂序）
+- clear_queue 之後，被清掉的腳本不會再播任何一句
+- 換句或取消後，上一句的分段字幕不會再出現
+- 同一時間只有一個音檔在播；結束時排程器閒置、畫面已清空
+
+    python bench_scheduler.py
+    python bench_scheduler.py --scripts 5000 --steps 12 --json bench_scheduler.json
+    python bench_scheduler.py --scenarios churn --cycles 1000
+
+情境：
+- bulk：一次排入大量腳本（音檔 0.5 ~ 3 秒，部分長句會分段）
+- short：大量極短音檔（0 ~ 5 ms），主要量狀態機本身
+- priority：隨時間排入不同優先度 / ttl 的腳本（插播、接續、過期）
+- churn：另一個執行緒快速 enqueue / clear_queue（模擬 twitch_bot）
+- idle：閒置時排入單一腳本，量 enqueue 到第一句字幕的實際耗時
+
+除 churn（真的多執行緒）外，同一個 --seed 的結果（耗時除外）完全相同。
+記憶體峰值另外跑一次（tracemalloc 會拖慢速度），包含本程式的紀錄。
+"""
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from functools import lru_cache, partial
+from typing import Dict, List, Optional
+
+from percentiles import percentile
+from scheduler import Priority, SubtitleScheduler
+from subtitle_timing import TIMELINE_CACHE_SIZE, Cue, chunk_text, timeline
+
+SCENARIOS = ("bulk", "short", "priority", "churn", "idle")
+
+_TAG_RE = re.compile(r"〔(\d+)-(\d+)〕")
+
+
+class VirtualClock:
+    """虛擬時間；call_later 排進 heap，step() 直接跳到下一個事件執行，不真的等待。"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.samples: List[float] = []          # 每個事件 callback 的實際耗時（秒）
+
+    def __call__(self) -> float:
+        return self.now
+
+    def call_later(self, delay: float, fn) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (self.now + max(delay, 0.0), next(self._seq), fn))
+            self._cond.notify()
+
+    @property
+    def idle(self) -> bool:
+        with self._cond:
+            return not self._heap
+
+    def step(self, wait: float = 0.0) -> bool:
+        """執行最早的一個事件；沒有事件時最多等 wait 秒（等其他執行緒排進來）。"""
+        with self._cond:
+            if not self._heap and wait:
+                self._cond.wait(wait)
+            if not self._heap:
+                return False
+            when, _, fn = heapq.heappop(self._heap)
+            self.now = max(self.now, when)
+        t0 = time.perf_counter()
+        fn()
+        self.samples.append(time.perf_counter() - t0)
+        return True
+
+
+class FakeAudio:
+    """
+    假的 news 聲道：play 在虛擬時間 duration 秒後呼叫 on_done，marks 在各自的秒數呼叫；
+    stop 立即移除、稍後回 on_done，還沒到的 marks 不再呼叫。
+    """
+
+    def __init__(self, bench: "Bench", durations: Dict[str, float]):
+        self.bench = bench
+        self.clock = bench.clock
+        self.durations = durations
+        self.playing: Dict[int, tuple] = {}     # handle → (wav, on_done)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.overlaps = 0
+        self.preloads = 0
+
+    def load(self, wav: str) -> Optional[str]:
+        return wav if wav in self.durations else None
+
+    def play(self, wav: str, on_done, marks=()) -> None:
+        with self._lock:
+            if self.playing:
+                self.overlaps += 1
+            handle = next(self._seq)
+            self.playing[handle] = (wav, on_done)
+        self.bench.record(self.bench.wav_keys[wav])
+        for at, fn in marks:
+            self.clock.call_later(min(at, self.durations[wav]), partial(self._mark, handle, fn))
+        self.clock.call_later(self.durations[wav], partial(self._finish, handle))
+
+    def _mark(self, handle: int, fn) -> None:
+        with self._lock:
+            playing = handle in self.playing
+        if playing:
+            fn()
+
+    def _finish(self, handle: int) -> None:
+        with self._lock:
+            item = self.playing.pop(handle, None)
+        if item is not None:
+            item[1]()
+
+    def preload(self, wav: str) -> None:
+        self.preloads += 1
+
+    def estimate_bytes(self, wav: str) -> int:
+        return int(self.durations.get(wav, 0.0) * 48000) * 2 * 4
+
+    def stop(self) -> None:
+        with self._lock:
+            flushed = list(self.playing.values())
+            self.playing.clear()
+        for _, on_done in flushed:
+            self.clock.call_later(0.0, on_done)
+
+    def is_playing(self, wav: str) -> bool:
+        with self._lock:
+            return any(w == wav for w, _ in self.playing.values())
+
+
+class FakeTimer:
+    """與 SubtitleTimer 相同的切段與依字數分配，長度取自假音檔表，不碰檔案。"""
+
+    def __init__(self, durations: Dict[str, float], max_chars: int):
+        self.durations = durations
+        self.max_chars = max_chars
+        self.cues = lru_cache(maxsize=TIMELINE_CACHE_SIZE)(self._cues)
+
+    def _cues(self, text: str, wav: Optional[str]):
+        if not wav:
+            return [Cue(0.0, 0.0, text)]
+        return timeline(chunk_text(text, self.max_chars) or [text], self.durations.get(wav, 0.0))
+
+
+class Bench:
+    """一次情境的狀態：排程器、假元件與所有紀錄。"""
+
+    def __init__(self, args):
+        self.args = args
+        self.clock = VirtualClock()
+        self.scripts: List[list] = []
+        self.durations: Dict[str, float] = {}
+        self.wav_keys: Dict[str, tuple] = {}
+        self.first_chunk: Dict[tuple, str] = {}
+        self.complete: Dict[int, bool] = {}         # sid → 是否必須整份播完（否則只要求是開頭的連續幾句）
+        self.priority: Dict[int, int] = {}
+        self.enqueued: Dict[int, tuple] = {}        # sid → (虛擬時間, perf_counter, 當時是否閒置)
+        self.first_seen: Dict[int, tuple] = {}      # sid → 第一句字幕的 (虛擬時間, perf_counter)
+        self.cancelled: Dict[int, int] = {}         # sid → 被 clear_queue 時 events 的長度
+        self.events: List[tuple] = []               # 依序開始播的 (sid, step)
+        self.enqueue_samples: List[float] = []
+        self.stale = 0
+        self.texts = 0
+        self.last_text = None
+        self.last_title = None
+        self._lock = threading.Lock()
+
+        self.audio = FakeAudio(self, self.durations)
+        self.timer = FakeTimer(self.durations, args.max_chars)
+        self.sched = SubtitleScheduler(
+            device_id=None,
+            set_text=self.set_text,
+            set_title=self.set_title,
+            set_image=lambda path: None,
+            resolve_image=lambda idx: f"images/news{idx}_image.jpg",
+            dispatch=lambda fn, arg: fn(arg),
+            audio=self.audio,
+            clock=self.clock,
+            prefetch_image=lambda path: None,
+            timer=self.timer,
+        )
+
+    # ────────── 腳本 ──────────
+    def make_scripts(self, rng: random.Random, n: int, clip: tuple, text_only: float = 0.2,
+                     long_rate: float = 0.2) -> List[int]:
+        """產生 n 份腳本；每句都帶〔sid-step〕標記，分段後每段也都帶著，用來比對。"""
+        sids = []
+        for _ in range(n):
+            sid = len(self.scripts)
+            script = []
+            for step in range(self.args.steps):
+                reps = rng.randint(3, 6) if rng.random() < long_rate else 1
+                text = f"〔{sid}-{step}〕甲乙丙丁，" * reps
+                wav = None
+                if rng.random() >= text_only:
+                    wav = f"s{sid}_{step}.wav"
+                    self.durations[wav] = rng.uniform(*clip)
+                    self.wav_keys[wav] = (sid, step)
+                self.first_chunk[(sid, step)] = (chunk_text(text, self.args.max_chars) or [text])[0]
+                script.append((text, wav))
+            self.scripts.append(script)
+            self.complete[sid] = True
+            sids.append(sid)
+        return sids
+
+    def enqueue(self, sid: int, priority: int = Priority.NEWS, ttl: Optional[float] = None) -> None:
+        self.priority[sid] = priority
+        if ttl is not None:
+            self.complete[sid] = False          # 被插播後才過期的腳本會只播一部分
+        self.enqueued[sid] = (self.clock.now, time.perf_counter(), not self.sched.busy)
+        t0 = time.perf_counter()
+        self.sched.enqueue(f"news {sid}", self.scripts[sid], sid, priority=priority, ttl=ttl)
+        self.enqueue_samples.append(time.perf_counter() - t0)
+
+    def clear(self, priority: Optional[int] = None) -> None:
+        t0 = time.perf_counter()
+        self.sched.clear_queue(priority)
+        self.enqueue_samples.append(time.perf_counter() - t0)
+        with self._lock:
+            mark = len(self.events)
+            for sid in self.enqueued:
+                if priority is None or self.priority[sid] == priority:
+                    self.cancelled.setdefault(sid, mark)
+                    self.complete[sid] = False
+
+    # ────────── 假 UI ──────────
+    def record(self, key: tuple) -> None:
+        with self._lock:
+            self.events.append(key)
+        if key[1] == 0 and key[0] not in self.first_seen:
+            self.first_seen[key[0]] = (self.clock.now, time.perf_counter())
+
+    def set_title(self, title: str) -> None:
+        self.last_title = title
+
+    def set_text(self, text: str) -> None:
+        self.texts += 1
+        self.last_text = text
+        m = _TAG_RE.search(text)
+        if m is None:
+            return
+        key = (int(m[1]), int(m[2]))
+        wav = self.scripts[key[0]][key[1]][1]
+        if wav is None:
+            self.record(key)            # 沒有音檔的句子以字幕為準
+        elif text != self.first_chunk[key] and not self.audio.is_playing(wav):
+            self.stale += 1             # 這句的音檔已經不在播了，分段字幕還跑出來
+
+    # ────────── 執行與檢查 ──────────
+    def drain(self, thread: Optional[threading.Thread] = None, timeout: float = 120.0) -> bool:
+        """跑完所有虛擬事件（有 thread 時等它結束）；超過 timeout 秒（實際時間）視為卡住。"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            alive = thread is not None and thread.is_alive()
+            if self.clock.step(wait=0.001 if alive else 0.0) or alive:
+                continue
+            if not self.clock.step():       # 執行緒結束前可能剛排進事件
+                return True
+        return False
+
+    def report(self, name: str, wall: float, finished: bool) -> dict:
+        played = defaultdict(list)
+        after_clear = 0
+        for n, (sid, step) in enumerate(self.events):
+            played[sid].append(step)
+            if n >= self.cancelled.get(sid, len(self.events)):
+                after_clear += 1
+        lost = duplicated = out_of_order = 0
+        for sid in self.enqueued:
+            steps = played.get(sid, [])
+            duplicated += len(steps) - len(set(steps))
+            if steps != sorted(steps):
+                out_of_order += 1
+            expected = len(self.scripts[sid]) if self.complete[sid] else (max(steps) + 1 if steps else 0)
+            lost += expected - len(set(s for s in steps if s < expected))
+
+        overhead = self.clock.samples + self.enqueue_samples
+        total_steps = len(self.events)
+        waits = [self.first_seen[sid][0] - t for sid, (t, _, _) in self.enqueued.items() if sid in self.first_seen]
+        idle_wall = [self.first_seen[sid][1] - p for sid, (_, p, idle) in self.enqueued.items()
+                     if idle and sid in self.first_seen]
+        problems = {
+            "lost": lost, "duplicated": duplicated, "out_of_order": out_of_order,
+            "after_clear": after_clear, "stale_cues": self.stale, "overlaps": self.audio.overlaps,
+            "stalled": int(not finished), "not_idle": int(self.sched.busy or not self.clock.idle),
+            "screen_not_cleared": int(self.last_text not in (None, "") or self.last_title not in (None, "")),
+        }
+        return {
+            "scenario": name,
+            "scripts": len(self.enqueued),
+            "steps": total_steps,
+            "events": len(self.clock.samples),
+            "texts": self.texts,
+            "preloads": self.audio.preloads,
+            "virtual_seconds": self.clock.now,
+            "wall_seconds": wall,
+            "us_per_step": sum(overhead) / total_steps * 1e6 if total_steps else 0.0,
+            "call_p50_us": percentile(sorted(overhead), 50) * 1e6,
+            "call_p99_us": percentile(sorted(overhead), 99) * 1e6,
+            "call_max_us": max(overhead, default=0.0) * 1e6,
+            "first_subtitle_wait_p50": percentile(sorted(waits), 50),
+            "first_subtitle_wait_p99": percentile(sorted(waits), 99),
+            "first_subtitle_idle_us_p50": percentile(sorted(idle_wall), 50) * 1e6,
+            "first_subtitle_idle_us_p99": percentile(sorted(idle_wall), 99) * 1e6,
+            "stats": {k: v for k, v in self.sched.stats.items() if k != "first_subtitle_latency"},
+            "problems": problems,
+            "ok": not any(problems.values()),
+        }
+
+# ────────── 情境 ──────────
+def scenario_bulk(bench: Bench, rng: random.Random, args) -> Optional[threading.Thread]:
+    sids = bench.make_scripts(rng, args.scripts, clip=(0.5, 3.0))
+    for sid in sids:
+        bench.enqueue(sid)
+    return None
+
+
+def scenario_short(bench: Bench, rng: random.Random, args) -> Optional[threading.Thread]:
+    sids = bench.make_scripts(rng, args.scripts, clip=(0.0, 0.005), long_rate=0.05)
+    for sid in sids:
+        bench.enqueue(sid)
+    return None
+
+
+def scenario_priority(bench: Bench, rng: random.Random, args) -> Optional[threading.Thread]:
+    """腳本在虛擬時間中陸續抵達；快訊與聊天插話會插播一般新聞，部分帶 ttl。"""
+    sids = bench.make_scripts(rng, args.scripts, clip=(0.2, 2.0))
+    at = 0.0
+    for sid in sids:
+        at += rng.expovariate(1.0)
+        priority = rng.choices(list(Priority), weights=(1, 3, 6))[0]
+        ttl = rng.uniform(1.0, 60.0) if rng.random() < 0.3 else None
+        bench.clock.call_later(at, partial(bench.enqueue, sid, priority, ttl))
+    return None
+
+
+def scenario_churn(bench: Bench, rng: random.Random, args) -> Optional[threading.Thread]:
+    """另一個執行緒（實際時間）反覆 enqueue / clear_queue，主執行緒推進虛擬時鐘。"""
+    per_cycle = 20
+    pool = iter(bench.make_scripts(rng, args.cycles * per_cycle + per_cycle, clip=(0.001, 0.05)))
+    plan = []
+    for _ in range(args.cycles):
+        batch = [(next(pool), rng.choice(list(Priority))) for _ in range(rng.randint(1, per_cycle))]
+        plan.append((batch, rng.random() * 0.002, rng.choice([None, *Priority])))
+    final = [(sid, rng.choice(list(Priority))) for sid in pool]
+
+    def bot():
+        for batch, pause, target in plan:
+            for sid, priority in batch:
+                bench.enqueue(sid, priority)
+            time.sleep(pause)
+            bench.clear(target)
+        for sid, priority in final:         # 最後一批不清，必須完整播完
+            bench.enqueue(sid, priority)
+
+    thread = threading.Thread(target=bot, daemon=True, name="BenchBot")
+    thread.start()
+    return thread
+
+
+def scenario_idle(bench: Bench, rng: random.Random, args) -> Optional[threading.Thread]:
+    """每次都等排程器閒置才排入下一份。"""
+    for sid in bench.make_scripts(rng, min(args.scripts, 500), clip=(0.2, 1.0)):
+        bench.enqueue(sid)
+        bench.drain()
+    return None
+
+
+_RUNNERS = {
+    "bulk": scenario_bulk,
+    "short": scenario_short,
+    "priority": scenario_priority,
+    "churn": scenario_churn,
+    "idle": scenario_idle,
+}
+
+
+def run(name: str, args, trace: bool = False) -> dict:
+    rng = random.Random(f"{args.seed}:{name}")
+    bench = Bench(args)
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        if trace:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        thread = _RUNNERS[name](bench, rng, args)
+        finished = bench.drain(thread, timeout=args.timeout)
+        wall = time.perf_counter() - t0
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    result = bench.report(name, wall, finished)
+    result["py_peak"] = peak
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SubtitleScheduler 基準 / 壓力測試（虛擬時鐘）")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--scripts", type=int, default=2000, help="每個情境的腳本數")
+    parser.add_argument("--steps", type=int, default=8, help="每份腳本的句數")
+    parser.add_argument("--cycles", type=int, default=300, help="churn 的 enqueue / clear_queue 次數")
+    parser.add_argument("--max-chars", type=int, default=28, help="字幕每段字數上限")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="單一情境的實際時間上限（秒）")
+    parser.add_argument("--no-memory", action="store_true", help="不另外跑 tracemalloc")
+    parser.add_argument("--json", type=str, default=None, help="把結果寫成 JSON")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<9} {'scripts':>7} {'steps':>7} {'µs/step':>8} {'p99 µs':>8} "
+          f"{'wait p50':>9} {'idle µs':>8} {'py_peak':>9}  檢查")
+    results = []
+    for name in args.scenarios:
+        res = run(name, args)
+        if not args.no_memory:
+            res["py_peak"] = run(name, args, trace=True)["py_peak"]
+        results.append(res)
+        bad = {k: v for k, v in res["problems"].items() if v}
+        verdict = "✓" if res["ok"] else "✗ " + ", ".join(f"{k}={v}" for k, v in bad.items())
+        print(f"{name:<9} {res['scripts']:>7} {res['steps']:>7} {res['us_per_step']:>8.1f} "
+              f"{res['call_p99_us']:>8.1f} {res['first_subtitle_wait_p50']:>8.1f}s "
+              f"{res['first_subtitle_idle_us_p50']:>8.1f} {res['py_peak'] / 1e6:>7.1f}MB  {verdict}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.json}")
+    if not all(res["ok"] for res in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
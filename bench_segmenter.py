@@ -0,0 +1,109 @@
+# bench_segmenter.py
+"""
+分句器基準測試：舊的逐字分句 vs segmenter.segment。
+
+語料為 bench_data/articles/*.txt（一篇一檔，段落以換行分隔）。
+可以用 --save-from 產生語料：
+- record_udn.py 的錄製目錄：以 extractors 解析文章頁，保留原本的段落（建議）
+- news.json / news.jsonl：只剩合併後的段落，一段一行（原本的段落邊界已經不在了）
+
+    python bench_segmenter.py --save-from bench_data/udn
+    python bench_segmenter.py --save-from news.jsonl
+    python bench_segmenter.py --max-chars 40 --repeat 50
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from bench_args import positive_int
+from extractors import get_backend
+from segmenter import MAX_CHARS, MIN_CHARS, segment
+
+CORPUS_DIR = Path("bench_data/articles")
+
+
+def legacy_split(content_text: str) -> List[str]:
+    """原本 crawl_udn_news 內的逐字分句，作為比較基準。"""
+    sentences = []
+    current = ""
+    i = 0
+    while i < len(content_text):
+        current += content_text[i]
+        if content_text[i] in "。！？,，":
+            if i + 1 < len(content_text) and content_text[i] == "。" and content_text[i + 1] == "」":
+                current += "」"
+                i += 1
+            sentences.append(current.strip())
+            current = ""
+        i += 1
+    if current.strip():
+        sentences.append(current.strip())
+    return sentences
+
+
+def save_corpus(source: Path, corpus_dir: Path) -> int:
+    """把錄製的文章頁或 news.json / news.jsonl 的內容存成語料檔（段落以換行分隔），回傳篇數。"""
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    if source.is_dir():
+        backend = get_backend()
+        pages = sorted(source.glob("article*.html"))
+        for page in pages:
+            parts = backend.parse_article(page.read_text(encoding="utf-8", errors="replace"))
+            (corpus_dir / f"{page.stem}.txt").write_text("\n".join(parts.paragraphs), encoding="utf-8")
+        return len(pages)
+
+    text = source.read_text(encoding="utf-8")
+    if source.suffix == ".jsonl":
+        articles = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        articles = json.loads(text)
+    for art in articles:
+        sentences = [s for _, s in sorted(art["content"].items(), key=lambda kv: int(kv[0]))]
+        (corpus_dir / f"news{art['news_idx']}.txt").write_text("\n".join(sentences), encoding="utf-8")
+    return len(articles)
+
+
+def _run(name: str, split: Callable[[str], List[str]], texts: List[str], repeat: int) -> None:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        chunks = [split(t) for t in texts]
+    elapsed = time.perf_counter() - t0
+
+    total_chars = sum(len(t) for t in texts) * repeat
+    lengths = [len(c) for article in chunks for c in article]
+    short = sum(1 for n in lengths if n < MIN_CHARS)
+    print(f"{name:<10} {len(lengths):>7} {statistics.mean(lengths):>7.1f} {max(lengths):>5} "
+          f"{short:>7} {total_chars / elapsed / 1e6:>9.2f} {elapsed / repeat / len(texts) * 1e6:>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="分句器基準測試")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR)
+    parser.add_argument("--save-from", type=Path, help="由錄製目錄或 news.json / news.jsonl 產生語料後結束")
+    parser.add_argument("--max-chars", type=int, default=MAX_CHARS)
+    parser.add_argument("--min-chars", type=int, default=MIN_CHARS)
+    parser.add_argument("--repeat", type=positive_int, default=20, help="重複幾輪取平均（>= 1）")
+    args = parser.parse_args()
+
+    if args.save_from:
+        n = save_corpus(args.save_from, args.corpus)
+        print(f"已存 {n} 篇語料到 {args.corpus}")
+        return
+
+    texts = [p.read_text(encoding="utf-8") for p in sorted(args.corpus.glob("*.txt"))]
+    texts = [t for t in texts if t.strip()]
+    if not texts:
+        print(f"{args.corpus} 沒有語料，請先用 --save-from news.json 產生")
+        return
+
+    print(f"語料 {len(texts)} 篇，{sum(len(t) for t in texts)} 字，重複 {args.repeat} 次")
+    print(f"{'splitter':<10} {'chunks':>7} {'avg':>7} {'max':>5} {'<min':>7} {'Mchar/s':>9} {'us/art':>9}")
+    _run("legacy", legacy_split, texts, args.repeat)
+    _run("segment", lambda t: segment(t, args.max_chars, args.min_chars), texts, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# extractors.py
+"""
+UDN 頁面擷取後端：把「列表頁 → (標題, 連結)」與「內文頁 → (時間, 封面, 段落)」
+從 crawl 流程中抽出，讓不同 HTML parser 可以互換。
+
+    backend = get_backend("selectolax")
+    items = backend.parse_listing(html)
+    parts = backend.parse_article(html)
+
+所有後端的輸出必須完全相同，bench_extract.py 會逐頁比對。
+"""
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, NamedTuple
+
+LISTING_LIMIT = 20
+DEFAULT_BACKEND = os.getenv("NEWS_PARSER_BACKEND", "bs4")
+
+# 內文中的廣告 / 推薦區塊
+_AD_STYLE_RE = re.compile(r'position: relative;.*background-color:#fff')
+_SKIP_TEXT_TAGS = ("script", "style")
+
+
+class ListingItem(NamedTuple):
+    title: str
+    link: str | None            # 原始 href，可能是相對路徑
+
+
+class ArticleParts(NamedTuple):
+    time: str | None            # <time> 的原始文字
+    image_url: str | None       # 封面圖片網址
+    paragraphs: List[str]       # 已去除空白、插圖與廣告的段落
+
+
+class ExtractionBackend(ABC):
+    """擷取後端介面；子類別必須實作 parse_listing / parse_article。"""
+    name = ""
+
+    @abstractmethod
+    def parse_listing(self, html: str) -> List[ListingItem]:
+        ...
+
+    @abstractmethod
+    def parse_article(self, html: str) -> ArticleParts:
+        ...
+
+
+# ────────── BeautifulSoup ──────────
+class SoupBackend(ExtractionBackend):
+    """原本的 BeautifulSoup 擷取邏輯；parser 可選 html.parser 或 lxml。"""
+
+    def __init__(self, parser: str = "html.parser"):
+        from bs4 import BeautifulSoup
+        self._soup = lambda html: BeautifulSoup(html, parser)
+        self.name = "bs4" if parser == "html.parser" else f"bs4-{parser}"
+
+    def parse_listing(self, html: str) -> List[ListingItem]:
+        items = []
+        for item in self._soup(html).select('.story-list__news')[:LISTING_LIMIT]:
+            title_tag = item.select_one('.story-list__text h2 a')
+            title = title_tag.get_text(strip=True) if title_tag else '無標題'
+            link = title_tag['href'] if title_tag and 'href' in title_tag.attrs else None
+            items.append(ListingItem(title, link))
+        return items
+
+    def parse_article(self, html: str) -> ArticleParts:
+        soup = self._soup(html)
+
+        time_tag = soup.select_one('.article-content__subinfo time')
+        pub_time = time_tag.get_text(strip=True) if time_tag else None
+
+        # 移除內文插圖
+        for figure in soup.select('.article-content__editor figure'):
+            figure.decompose()
+
+        cover_image = soup.select_one('figure.article-content__cover img')
+        image_url = cover_image['src'] if cover_image and 'src' in cover_image.attrs else None
+
+        # 移除封面圖片的 figcaption
+        cover_figcaption = soup.select_one('figure.article-content__cover figcaption')
+        if cover_figcaption:
+            cover_figcaption.decompose()
+
+        paragraphs = []
+        for p in soup.select('.article-content__paragraph .article-content__editor p'):
+            if p.find_parent('div', style=_AD_STYLE_RE):
+                continue
+            text = p.get_text(strip=True)
+            if text:
+                paragraphs.append(text)
+        return ArticleParts(pub_time, image_url, paragraphs)
+
+
+# ────────── lxml (XPath) ──────────
+def _cls(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class LxmlBackend(ExtractionBackend):
+    """lxml.html + 預先編譯的 XPath，不經過 BeautifulSoup 的樹。"""
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        self._parse = lxml.html.document_fromstring
+        x = etree.XPath
+        self._news = x(f"//*[{_cls('story-list__news')}]")
+        self._title = x(f".//*[{_cls('story-list__text')}]//h2//a")
+        self._time = x(f"//*[{_cls('article-content__subinfo')}]//time")
+        self._figures = x(f"//*[{_cls('article-content__editor')}]//figure")
+        self._cover_img = x(f"//figure[{_cls('article-content__cover')}]//img")
+        self._cover_caption = x(f"//figure[{_cls('article-content__cover')}]//figcaption")
+        self._paragraphs = x(f"//*[{_cls('article-content__paragraph')}]//*[{_cls('article-content__editor')}]//p")
+
+    @staticmethod
+    def _text(el) -> str:
+        """等同 bs4 的 get_text(strip=True)：略過註解與 script / style。"""
+        parts = []
+
+        def walk(node):
+            if node.text and node.tag not in _SKIP_TEXT_TAGS:
+                parts.append(node.text)
+            for child in node:
+                if isinstance(child.tag, str) and child.tag not in _SKIP_TEXT_TAGS:
+                    walk(child)
+                if child.tail:
+                    parts.append(child.tail)
+
+        walk(el)
+        return "".join(s.strip() for s in parts)
+
+    def parse_listing(self, html: str) -> List[ListingItem]:
+        items = []
+        for item in self._news(self._parse(html))[:LISTING_LIMIT]:
+            found = self._title(item)
+            title_tag = found[0] if found else None
+            title = self._text(title_tag) if title_tag is not None else '無標題'
+            link = title_tag.get('href') if title_tag is not None else None
+            items.append(ListingItem(title, link))
+        return items
+
+    def parse_article(self, html: str) -> ArticleParts:
+        doc = self._parse(html)
+
+        found = self._time(doc)
+        pub_time = self._text(found[0]) if found else None
+
+        for figure in self._figures(doc):
+            figure.drop_tree()
+
+        found = self._cover_img(doc)
+        image_url = found[0].get('src') if found else None
+
+        found = self._cover_caption(doc)
+        if found:
+            found[0].drop_tree()
+
+        paragraphs = []
+        for p in self._paragraphs(doc):
+            if any(_AD_STYLE_RE.search(div.get('style') or '') for div in p.iterancestors('div')):
+                continue
+            text = self._text(p)
+            if text:
+                paragraphs.append(text)
+        return ArticleParts(pub_time, image_url, paragraphs)
+
+
+# ────────── selectolax (lexbor) ──────────
+class SelectolaxBackend(ExtractionBackend):
+    """selectolax 的 lexbor parser：C 實作的 HTML5 parser 與 CSS selector。"""
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parse = LexborHTMLParser
+
+    @staticmethod
+    def _text(node) -> str:
+        for junk in node.css(", ".join(_SKIP_TEXT_TAGS)):
+            junk.decompose()
+        return node.text(deep=True, separator='', strip=True)
+
+    @staticmethod
+    def _in_ad_block(node) -> bool:
+        parent = node.parent
+        while parent is not None:
+            if parent.tag == 'div' and _AD_STYLE_RE.search(parent.attributes.get('style') or ''):
+                return True
+            parent = parent.parent
+        return False
+
+    def parse_listing(self, html: str) -> List[ListingItem]:
+        items = []
+        for item in self._parse(html).css('.story-list__news')[:LISTING_LIMIT]:
+            title_tag = item.css_first('.story-list__text h2 a')
+            title = self._text(title_tag) if title_tag is not None else '無標題'
+            link = title_tag.attributes.get('href') if title_tag is not None else None
+            items.append(ListingItem(title, link))
+        return items
+
+    def parse_article(self, html: str) -> ArticleParts:
+        tree = self._parse(html)
+
+        time_tag = tree.css_first('.article-content__subinfo time')
+        pub_time = self._text(time_tag) if time_tag is not None else None
+
+        for figure in tree.css('.article-content__editor figure'):
+            figure.decompose()
+
+        cover_image = tree.css_first('figure.article-content__cover img')
+        image_url = cover_image.attributes.get('src') if cover_image is not None else None
+
+        cover_figcaption = tree.css_first('figure.article-content__cover figcaption')
+        if cover_figcaption is not None:
+            cover_figcaption.decompose()
+
+        paragraphs = []
+        for p in tree.css('.article-content__paragraph .article-content__editor p'):
+            if self._in_ad_block(p):
+                continue
+            text = self._text(p)
+            if text:
+                paragraphs.append(text)
+        return ArticleParts(pub_time, image_url, paragraphs)
+
+
+BACKENDS: Dict[str, Callable[[], ExtractionBackend]] = {
+    "bs4": SoupBackend,
+    "bs4-lxml": lambda: SoupBackend("lxml"),
+    "lxml": LxmlBackend,
+    "selectolax": SelectolaxBackend,
+}
+
+
+def get_backend(name: str | None = None) -> ExtractionBackend:
+    """依名稱建立後端；未指定時讀環境變數 NEWS_PARSER_BACKEND（預設 bs4）。"""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的擷取後端：{name}（可用：{', '.join(BACKENDS)}）")
+    return BACKENDS[name]()
+
+
+_local = threading.local()
+
+
+def thread_backend(name: str | None = None) -> ExtractionBackend:
+    """
+    每條執行緒各自一份後端實例（lxml 的 XPath 物件不保證可跨執行緒共用），
+    供 crawl 的 worker 重複使用。
+    """
+    name = name or DEFAULT_BACKEND
+    cache = getattr(_local, "backends", None)
+    if cache is None:
+        cache = _local.backends = {}
+    if name not in cache:
+        cache[name] = get_backend(name)
+    return cache[name]
+
+
+def available_backends() -> List[str]:
+    """回傳目前環境裝得起來的後端名稱。"""
+    names = []
+    for name, factory in BACKENDS.items():
+        try:
+            factory()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
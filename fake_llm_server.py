@@ -0,0 +1,156 @@
+# fake_llm_server.py
+"""
+本機假 LLM：OpenAI 相容的 POST /v1/chat/completions，用來在不連外的情況下測試 / 量測 llm_client。
+
+- 從 prompt 取出「觀眾說：「…」」的訊息，依 labels（訊息 → 標籤）或 responder 產生回應；
+  批次 prompt（llm_client.build_batch_prompt）回傳每則一個物件的 JSON 陣列
+- latency：每個請求的延遲秒數；error_rate：以此機率回 500；garbage_rate：以此機率回非 JSON 的內容
+- 統計請求數、錯誤數與最高同時連線數
+
+    python fake_llm_server.py --latency 0.5
+    LLM_BASE_URL=http://127.0.0.1:<port>/v1 python main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from llm_client import BATCH_MARKER
+
+_MESSAGE_RE = re.compile(r"觀眾說：「(.*)」", re.S)
+
+
+def extract_message(prompt: str) -> str:
+    m = _MESSAGE_RE.search(prompt)
+    return m.group(1) if m else prompt
+
+
+def extract_batch(prompt: str) -> Optional[List[dict]]:
+    """批次 prompt 裡 BATCH_MARKER 下一行的 [{"id", "message"}, …]；不是批次時回傳 None。"""
+    head, sep, rest = prompt.partition(BATCH_MARKER + "\n")
+    if not sep:
+        return None
+    return json.loads(rest.split("\n", 1)[0])
+
+
+class FakeLLMServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 labels: Optional[Dict[str, str]] = None, responder: Optional[Callable[[str], str]] = None,
+                 error_rate: float = 0.0, garbage_rate: float = 0.0):
+        self.latency = latency
+        self.labels = labels or {}
+        self.responder = responder or self.default_responder
+        self.error_rate = error_rate
+        self.garbage_rate = garbage_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.max_active = 0
+        self.received = []                  # 每個請求的 prompt
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self._httpd.server_address[1]}/v1"
+        self._thread = None
+
+    def default_responder(self, prompt: str) -> str:
+        batch = extract_batch(prompt)
+        if batch is not None:
+            return json.dumps([{"id": item["id"], "label": self.labels.get(item["message"], "none"),
+                                "reply": f"收到：{item['message']}"} for item in batch], ensure_ascii=False)
+        message = extract_message(prompt)
+        label = self.labels.get(message, "none")
+        return json.dumps({"label": label, "reply": f"收到：{message}"}, ensure_ascii=False)
+
+    def _make_handler(self):
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"       # keep-alive
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send(404, {"error": "not found"})
+                    return
+                with server.lock:
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    prompt = json.loads(body)["messages"][-1]["content"]
+                    with server.lock:
+                        server.requests += 1
+                        server.received.append(prompt)
+                    if server.error_rate and random.random() < server.error_rate:
+                        with server.lock:
+                            server.errors += 1
+                        self._send(500, {"error": "fake failure"})
+                        return
+                    if server.garbage_rate and random.random() < server.garbage_rate:
+                        content = "抱歉，我不太確定"
+                    else:
+                        content = server.responder(prompt)
+                    self._send(200, {
+                        "object": "chat.completion",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                    })
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+            def _send(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass                        # client 已逾時放棄
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="FakeLLMServer")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本機假 LLM server（OpenAI 相容）")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with FakeLLMServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                       garbage_rate=args.garbage_rate) as fake:
+        print(f"假 LLM 已啟動：LLM_BASE_URL={fake.base_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"共 {fake.requests} 個請求（錯誤 {fake.errors}），最高同時連線 {fake.max_active}")
@@ -0,0 +1,159 @@
+# fake_tts_server.py
+"""
+本機假 TTS server：實作與 140.116.245.157 相同的框架
+(4-byte big-endian 長度 + "token@@@text@@@model@@@language")，回傳罐頭 WAV。
+用來在不連外的情況下測試 / 量測 TTSClient。
+
+    python fake_tts_server.py --latency 0.3
+"""
+import argparse
+import io
+import random
+import socketserver
+import struct
+import threading
+import time
+import wave
+from typing import Dict, Iterable
+
+from news_parser import TTS_LANGUAGES
+
+
+def make_wav(seconds: float, rate: int = 16000) -> bytes:
+    """產生指定長度的靜音 16-bit mono WAV。"""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * int(seconds * rate))
+    return buf.getvalue()
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("client closed early")
+        data += chunk
+    return data
+
+
+class FakeTTSServer:
+    """
+    每個語言開一個 TCP port（預設由系統指派），統計請求數、位元組與最高同時連線數。
+
+    - latency：每個請求回應前的延遲秒數
+    - seconds_per_char：罐頭 WAV 的長度，依句子字數計算
+    - wav_bytes：指定時一律回傳這份內容
+    - truncate_rate：以此機率只回傳一半的 WAV（模擬中途斷線）
+    - slow_rate / slow_latency：以此機率改用較長的延遲（模擬長尾，測 hedging）
+    """
+
+    def __init__(self, languages: Iterable[str] = TTS_LANGUAGES, host: str = "127.0.0.1",
+                 latency: float = 0.0, seconds_per_char: float = 0.05, wav_bytes: bytes | None = None,
+                 base_port: int = 0, truncate_rate: float = 0.0, slow_rate: float = 0.0,
+                 slow_latency: float = 0.0):
+        self.host = host
+        self.latency = latency
+        self.truncate_rate = truncate_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.seconds_per_char = seconds_per_char
+        self.wav_bytes = wav_bytes
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.truncated = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.active: Dict[int, int] = {}
+        self.max_active: Dict[int, int] = {}
+        self.received = []                  # [(token, text, model, language)]
+
+        server = self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                port = self.server.server_address[1]
+                server._enter(port)
+                try:
+                    (size,) = struct.unpack(">I", _recv_exact(self.request, 4))
+                    payload = _recv_exact(self.request, size)
+                    fields = payload.decode("utf-8").split("@@@")
+                    slow = server.slow_rate and random.random() < server.slow_rate
+                    delay = server.slow_latency if slow else server.latency
+                    if delay:
+                        time.sleep(delay)
+                    body = server.wav_bytes or make_wav(len(fields[1]) * server.seconds_per_char)
+                    truncate = server.truncate_rate and random.random() < server.truncate_rate
+                    if truncate:
+                        body = body[:len(body) // 2]
+                    self.request.sendall(body)
+                    with server.lock:
+                        server.requests += 1
+                        server.truncated += bool(truncate)
+                        server.bytes_in += 4 + size
+                        server.bytes_out += len(body)
+                        server.received.append(tuple(fields))
+                finally:
+                    server._leave(port)
+
+        self._servers = {}
+        for n, language in enumerate(languages):
+            port = base_port + n if base_port else 0
+            srv = socketserver.ThreadingTCPServer((host, port), _Handler)
+            srv.daemon_threads = True
+            self._servers[language] = srv
+        self._threads = []
+
+    @property
+    def ports(self) -> Dict[str, int]:
+        """語言 → 實際 port，可直接傳給 TTSClient(ports=...)。"""
+        return {lang: srv.server_address[1] for lang, srv in self._servers.items()}
+
+    def _enter(self, port: int) -> None:
+        with self.lock:
+            self.active[port] = self.active.get(port, 0) + 1
+            self.max_active[port] = max(self.max_active.get(port, 0), self.active[port])
+
+    def _leave(self, port: int) -> None:
+        with self.lock:
+            self.active[port] -= 1
+
+    def start(self) -> "FakeTTSServer":
+        for srv in self._servers.values():
+            t = threading.Thread(target=srv.serve_forever, daemon=True, name="FakeTTSServer")
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        for srv in self._servers.values():
+            srv.shutdown()
+            srv.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本機假 TTS server")
+    parser.add_argument("--latency", type=float, default=0.2, help="每個請求的延遲秒數")
+    parser.add_argument("--base-port", type=int, default=0, help="0 = 由系統指派")
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with FakeTTSServer(latency=args.latency, base_port=args.base_port, truncate_rate=args.truncate_rate,
+                       slow_rate=args.slow_rate, slow_latency=args.slow_latency) as fake:
+        print(f"假 TTS server 已啟動：{fake.ports}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"共處理 {fake.requests} 個請求，最高同時連線 {fake.max_active}")
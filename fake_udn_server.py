@@ -0,0 +1,122 @@
+# fake_udn_server.py
+"""
+本機假 UDN：以 HTTP 提供 record_udn.py 錄下的列表頁、文章與圖片。
+
+- 依 manifest 以 path + query 對應檔案，忽略原本的主機
+- HTML 內所有 udn.com / uc.udn.com.tw 的絕對網址改寫成本機位址
+- 每個回應帶 ETag，支援 If-None-Match → 304（可測增量爬取）
+- 統計請求數、304 次數與傳送位元組
+
+    python fake_udn_server.py --latency 0.05
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+from record_udn import RECORD_DIR, url_key
+
+_UDN_URL_RE = re.compile(rb"(?:https?:)?//(?:[\w-]+\.)*udn\.com(?:\.tw)?")
+
+
+class FakeUDNServer:
+    def __init__(self, pages: Path = RECORD_DIR, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        manifest = json.loads((pages / "manifest.json").read_text(encoding="utf-8"))
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_out = 0
+        self.by_kind: Dict[str, int] = {}
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.origin = f"http://{host}:{self._httpd.server_address[1]}"
+        self.list_url = self.origin + url_key(manifest["list_url"])
+
+        # 預先載入並改寫所有檔案：{key: (body, content_type, etag)}
+        self._files = {}
+        for key, meta in manifest["files"].items():
+            body = (pages / meta["file"]).read_bytes()
+            ctype = meta.get("content_type") or "application/octet-stream"
+            if "html" in ctype:
+                body = _UDN_URL_RE.sub(self.origin.encode(), body)
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            self._files[key] = (body, ctype, etag)
+        self._thread = None
+
+    def _make_handler(self):
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"       # keep-alive
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                found = server._files.get(self.path)
+                if found is None:
+                    self.send_error(404)
+                    return
+                body, ctype, etag = found
+                kind = ctype.split(";")[0].split("/")[0]
+                with server.lock:
+                    server.requests += 1
+                    server.by_kind[kind] = server.by_kind.get(kind, 0) + 1
+                if self.headers.get("If-None-Match") == etag:
+                    with server.lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.bytes_out += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+    def start(self) -> "FakeUDNServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="FakeUDNServer")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本機假 UDN server")
+    parser.add_argument("--pages", type=Path, default=RECORD_DIR)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with FakeUDNServer(args.pages, port=args.port, latency=args.latency) as fake:
+        print(f"假 UDN 已啟動：{fake.list_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"共 {fake.requests} 個請求（304：{fake.not_modified}），{fake.bytes_out} bytes")
@@ -0,0 +1,126 @@
+# intent.py
+"""
+本機意圖分類（LLM 之前的快速路徑）：一次掃過訊息，同時比對所有標籤的關鍵字。
+
+- 關鍵字來自 twitch_bot 原本的規則（greet / song / age / introduce / stop / news /
+  nod / shake / happy / confuse / despise）
+- 以 Aho-Corasick 自動機比對，訊息長度 O(n)，與關鍵字數量無關
+- 重疊時取最左、最長的關鍵字：「你好」是 greet 而不是 nod 的「好」，「不同意」是 shake
+- 英文關鍵字要求字詞邊界（no 不會對到 know）
+- 信心 = 最高標籤佔所有命中字數的比例 × 關鍵字覆蓋整則訊息的程度；
+  「你好」「停」「新聞」這類短訊息接近 1，長句裡順帶提到一個字則偏低，交給 LLM
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "nod": ("點頭", "yes", "好", "同意", "贊成", "嗯", "點個頭"),
+    "shake": ("搖頭", "no", "不要", "不同意", "否定", "不行", "不准"),
+    "despise": ("鄙視", "看不起", "切", "哼", "嘖", "什麼鬼", "低級", "無言"),
+    "happy": ("開心", "快樂", "爽", "笑死", "喜歡", "好耶", "哈", "嗨起來"),
+    "confuse": ("困惑", "疑惑", "不懂", "？？", "為什麼", "問號", "不解", "confused", "what"),
+    "stop": ("停", "stop", "止", "休", "不要再報"),
+    "news": ("news", "新聞", "報導", "播報"),
+    "song": ("歌", "唱", "sing a song"),
+    "age": ("歲", "年紀", "多大", "how old are you", "age", "齡"),
+    "introduce": ("做什麼", "做甚麼", "介", "功能", "是誰", "what can you do", "introduce yourself", "about you"),
+    "greet": ("你好", "hello", "早安", "午安", "晚安", "hi", "hey", "哈囉", "安安", "您好"),
+}
+FILLER_CHARS = 2                # 關鍵字以外容許的字數（「主播你好」「停！」仍算完全命中）
+FAST_PATH_CONFIDENCE = 0.8      # 信心達到這個值就不問 LLM
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick：所有關鍵字建成一棵 trie 加失敗連結，一次掃描找出全部出現位置。"""
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]       # 狀態 → [(關鍵字長度, 標籤)]
+        for label, words in keywords.items():
+            for word in words:
+                self._add(word.casefold(), label)
+        self._link()
+
+    def _add(self, word: str, label: str) -> None:
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(word), label))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """產生 (start, end, 標籤)；text 應已 casefold。"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, label in out[state]:
+                yield i + 1 - length, i + 1, label
+
+
+class IntentClassifier:
+    def __init__(self, keywords: Dict[str, Iterable[str]] = KEYWORDS, filler_chars: int = FILLER_CHARS):
+        self.automaton = KeywordAutomaton(keywords)
+        self.order = {label: n for n, label in enumerate(keywords)}     # 同分時依原本規則的判斷順序
+        self.filler_chars = filler_chars
+
+    def spans(self, text: str) -> List[Tuple[int, int, str]]:
+        """最左、最長、不重疊的命中 [(start, end, 標籤)]。"""
+        text = text.casefold()
+        found = []
+        for start, end, label in self.automaton.matches(text):
+            if text[start].isascii() and (
+                    (start > 0 and _is_word_char(text[start - 1]))
+                    or (end < len(text) and _is_word_char(text[end]))):
+                continue                    # 英文關鍵字卡在單字中間
+            found.append((start, end, label))
+        found.sort(key=lambda m: (m[0], m[0] - m[1]))
+        spans = []
+        last = 0
+        for start, end, label in found:
+            if start >= last:
+                spans.append((start, end, label))
+                last = end
+        return spans
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """回傳 (標籤, 信心 0~1)；沒有任何關鍵字時為 ("none", 0.0)。"""
+        spans = self.spans(text)
+        if not spans:
+            return "none", 0.0
+        scores: Dict[str, int] = {}
+        for start, end, label in spans:
+            scores[label] = scores.get(label, 0) + end - start
+        label = min(scores, key=lambda k: (-scores[k], self.order[k]))
+        matched = sum(scores.values())
+        length = sum(1 for ch in text if not ch.isspace())
+        coverage = min(1.0, (matched + self.filler_chars) / length) if length else 0.0
+        return label, round(scores[label] / matched * coverage, 3)
+
+
+intents = IntentClassifier()
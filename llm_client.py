@@ -0,0 +1,357 @@
+# llm_client.py
+"""
+聊天室訊息分類：呼叫 OpenAI 相容的 chat/completions（預設 OpenRouter）。
+
+- 共用一個 aiohttp.ClientSession（連線池 + keep-alive），不再每則訊息重新連線
+- 每個請求都有連線 / 總時間的 timeout；同時進行的請求數以 semaphore 限制
+- 失敗、逾時或回應不是 JSON 時回傳 ("none", "")，呼叫端不必處理例外
+- MicroBatcher：把短時間內的多則訊息合成一個請求，回應為每則一個 {label, reply} 的 JSON 陣列
+- 本機測試可用 fake_llm_server.py，把 LLM_BASE_URL 指到它即可
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+import requests
+
+from percentiles import percentile
+
+LLM_BASE_URL = "https://openrouter.ai/api/v1"
+LLM_MODEL = "mistralai/mistral-7b-instruct:free"
+LLM_TIMEOUT = 15.0              # 單一請求的總時間上限（秒）
+LLM_CONNECT_TIMEOUT = 5.0
+LLM_CONCURRENCY = 4             # 同時進行的請求數上限（免費模型有速率限制）
+LLM_POOL_SIZE = 8               # 連線池大小
+LLM_BATCH_WINDOW = 0.3          # 第一則訊息進來後最多等幾秒湊成一批
+LLM_BATCH_MAX = 8               # 每批最多幾則；1 = 不批次
+METRICS_RECENT = 1000           # 百分位只看最近這麼多筆
+
+LABELS = ("greet", "song", "age", "introduce", "stop", "news",
+          "nod", "shake", "happy", "confuse", "despise", "none")
+
+_PERSONA = "你是一位女性實況主播主要在成大台灣台直播，"
+
+_TASKS = """1️⃣ 判斷一個最適合的「回應類型」標籤（只輸出一個標籤字串）  
+2️⃣ 用很生活化口語、像是老朋友打屁一般的口吻給出一句簡短回應（不要太長）
+
+標籤如下：
+- greet：打招呼
+- song：觀眾要聽你唱歌(注意你會的歌只有阿嘛的話一首)
+- age：問你幾歲(你24歲)
+- introduce：問你是誰 / 功能是什麼(你是日本來台灣留學的大學生，你叫阿芳)
+- stop：要你停止播報新聞
+- news：要求你播新聞
+- nod：肯定、同意、贊成、點頭
+- shake：否定、不同意、搖頭
+- happy：開心、讚嘆、喜歡、笑(如過那個人分享自己有趣的經驗和回憶或是他做到一件很棒的事情請開心)
+- confuse：好奇、沒聽過的(有人如果講任何學術的東西就請困惑)
+- despise：嘲諷、不屑、無語、鄙視、糗事(看到咖哩不拌的人請鄙視、不吃香菜也請鄙視)
+- none：當你覺得以上標籤都怎麼對到的時候
+"""
+
+PROMPT_TEMPLATE = _PERSONA + "請根據觀眾說的話，做兩件事：\n\n" + _TASKS + """
+觀眾說：「{message}」
+小心你的reply不要有特殊字元，不要用表情符號
+請用這個 JSON 格式回應（只需要這樣）：
+{{
+  "label": "<分類標籤>",
+  "reply": "<你想說的一句話>"
+}}"""
+
+BATCH_MARKER = "觀眾訊息（JSON 陣列，id 為編號）："
+
+BATCH_PROMPT_TEMPLATE = _PERSONA + "以下是聊天室的幾則訊息，請對每一則各做兩件事：\n\n" + _TASKS + """
+""" + BATCH_MARKER + """
+{messages}
+小心你的reply不要有特殊字元，不要用表情符號
+請用這個 JSON 陣列格式回應，每則訊息一個物件、依 id 順序（只需要這樣）：
+[
+  {{"id": <編號>, "label": "<分類標籤>", "reply": "<你想說的一句話>"}}
+]"""
+
+
+def build_prompt(message: str) -> str:
+    return PROMPT_TEMPLATE.format(message=message)
+
+
+def build_batch_prompt(messages: List[str]) -> str:
+    """訊息以 JSON 陣列（單行）放進 prompt，觀眾打的引號 / 換行不會打亂格式。"""
+    items = [{"id": n, "message": m} for n, m in enumerate(messages)]
+    return BATCH_PROMPT_TEMPLATE.format(messages=json.dumps(items, ensure_ascii=False))
+
+
+def _extract_json(content: str) -> Any:
+    """模型常把 JSON 包在 ```json … ``` 或前後加話；取第一個 { / [ 到最後一個 } / ]。"""
+    content = content.strip()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    starts = [i for i in (content.find("{"), content.find("[")) if i >= 0]
+    end = max(content.rfind("}"), content.rfind("]"))
+    if not starts or end < min(starts):
+        raise ValueError(f"回應裡沒有 JSON：{content[:80]!r}")
+    return json.loads(content[min(starts):end + 1])
+
+
+def parse_decision(decision: Any) -> Tuple[str, str]:
+    """{"label", "reply"} → (label, reply)；不認得的標籤當作 none。"""
+    if not isinstance(decision, dict):
+        raise ValueError(f"回應不是 JSON 物件：{decision!r}")
+    label = str(decision.get("label") or "none").strip().lower()
+    reply = str(decision.get("reply") or "").strip()
+    return (label if label in LABELS else "none"), reply
+
+
+def parse_batch(decisions: Any, n: int) -> List[Optional[Tuple[str, str]]]:
+    """
+    [{"id", "label", "reply"}, …] → 依 id 排好的 n 個 (label, reply)；
+    沒有 id 或 id 不對的依序補到還沒有結果的位置，缺的為 None。
+    """
+    if isinstance(decisions, dict):         # 有些模型會包一層 {"results": [...]}
+        decisions = next((v for v in decisions.values() if isinstance(v, list)), [decisions])
+    if not isinstance(decisions, list):
+        raise ValueError(f"回應不是 JSON 陣列：{decisions!r}")
+    results: List[Optional[Tuple[str, str]]] = [None] * n
+    leftovers = []
+    for item in decisions:
+        if not isinstance(item, dict):
+            continue
+        idx = item.get("id")
+        if isinstance(idx, str) and idx.isdigit():
+            idx = int(idx)
+        if isinstance(idx, int) and 0 <= idx < n and results[idx] is None:
+            results[idx] = parse_decision(item)
+        else:
+            leftovers.append(item)
+    free = iter([n for n, r in enumerate(results) if r is None])
+    for item, idx in zip(leftovers, free):
+        results[idx] = parse_decision(item)
+    return results
+
+
+def _headers(api_key: Optional[str]) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost",  # Optional for ranking
+        "X-Title": "VTuberBot",              # Optional for ranking
+    }
+
+
+class LLMClient:
+    """
+    async 分類 client；session 在第一次使用時於目前的 event loop 建立，結束時呼叫 close()。
+
+    - timeout / connect_timeout：秒
+    - concurrency：同時送出的請求數上限，其餘在 semaphore 排隊
+    - pool_size：連線池大小（aiohttp.TCPConnector limit）
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 model: Optional[str] = None, timeout: float = LLM_TIMEOUT,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, concurrency: int = LLM_CONCURRENCY,
+                 pool_size: int = LLM_POOL_SIZE):
+        self.api_key = api_key if api_key is not None else os.getenv("OPENROUTER_API_KEY")
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL") or LLM_BASE_URL).rstrip("/")
+        self.model = model or os.getenv("LLM_MODEL") or LLM_MODEL
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.pool_size = pool_size
+        self._sem = asyncio.Semaphore(concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats: Dict[str, Any] = {
+            "requests": 0, "errors": 0, "timeouts": 0,
+            "in_flight": 0, "max_in_flight": 0, "latency_total": 0.0,
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                  headers=_headers(self.api_key))
+        return self._session
+
+    async def complete(self, prompt: str) -> str:
+        """送出一個 user 訊息，回傳模型的文字；HTTP / 逾時錯誤直接往外丟。"""
+        payload = {"model": self.model, "messages": [{"role": "user", "content": prompt}]}
+        async with self._sem:
+            session = self._get_session()
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{self.base_url}/chat/completions", json=payload) as res:
+                    res.raise_for_status()
+                    result = await res.json(content_type=None)
+            finally:
+                self.stats["in_flight"] -= 1
+                self.stats["requests"] += 1
+                self.stats["latency_total"] += time.perf_counter() - start
+        return result["choices"][0]["message"]["content"]
+
+    async def _ask(self, prompt: str, parse: Callable[[Any], Any], fallback: Any) -> Any:
+        try:
+            content = await self.complete(prompt)
+            print("🧠 原始回應：", content)
+            return parse(_extract_json(content))
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            print("❌ 分類逾時")
+        except (aiohttp.ClientError, KeyError, IndexError, TypeError, ValueError) as e:
+            self.stats["errors"] += 1
+            print("❌ 分類失敗:", e)
+        return fallback
+
+    async def classify(self, message: str) -> Tuple[str, str]:
+        """回傳 (label, reply)；任何錯誤都回傳 ("none", "")。"""
+        return await self._ask(build_prompt(message), parse_decision, ("none", ""))
+
+    async def classify_batch(self, messages: List[str]) -> List[Tuple[str, str]]:
+        """一個請求分類多則訊息，依原順序回傳；整批失敗或回應缺漏的那幾則為 ("none", "")。"""
+        if len(messages) == 1:
+            return [await self.classify(messages[0])]
+        results = await self._ask(build_batch_prompt(messages), lambda d: parse_batch(d, len(messages)),
+                                  [None] * len(messages))
+        missing = sum(r is None for r in results)
+        if missing:
+            self.stats["missing"] = self.stats.get("missing", 0) + missing
+            print(f"⚠️ 批次回應少了 {missing}/{len(messages)} 則")
+        return [r or ("none", "") for r in results]
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class MicroBatcher:
+    """
+    把訊息湊成批次送給 client.classify_batch，再把結果分回每則訊息的呼叫者。
+
+    - 第一則訊息進來後最多等 window 秒，或湊滿 max_batch 則就送出；max_batch <= 1 時直接逐則分類
+    - 只在同一個 event loop 使用；snapshot() / dump() 可從其他執行緒呼叫
+    - 統計：批次數、每批則數分佈、平均填滿率、排隊等待（進來 → 送出）與整體延遲（進來 → 拿到結果）
+    """
+
+    def __init__(self, client: LLMClient, window: float = LLM_BATCH_WINDOW, max_batch: int = LLM_BATCH_MAX):
+        self.client = client
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.messages = 0
+        self.sizes: Dict[int, int] = {}
+        self.waits: Deque[float] = deque(maxlen=METRICS_RECENT)
+        self.latencies: Deque[float] = deque(maxlen=METRICS_RECENT)
+
+    async def classify(self, message: str) -> Tuple[str, str]:
+        start = time.perf_counter()
+        if self.max_batch == 1:
+            self._record_batch(1)
+            self.waits.append(0.0)
+            result = await self.client.classify(message)
+            self.latencies.append(time.perf_counter() - start)
+            return result
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, future, start))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _record_batch(self, size: int) -> None:
+        self.batches += 1
+        self.messages += size
+        self.sizes[size] = self.sizes.get(size, 0) + 1
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        sent = time.perf_counter()
+        self._record_batch(len(batch))
+        self.waits.extend(sent - start for _, _, start in batch)
+        results: List[Tuple[str, str]] = []
+        try:
+            results = list(await self.client.classify_batch([message for message, _, _ in batch]))
+        except Exception as e:
+            self.client.stats["errors"] += 1
+            print("❌ 批次分類失敗:", e)
+        finally:
+            # 不論成功、失敗或被取消，每個呼叫者都要拿到結果，否則 await classify() 會永遠卡住
+            if len(results) != len(batch):
+                if results:
+                    print(f"⚠️ 批次結果 {len(results)} 則，與送出的 {len(batch)} 則不符")
+                results = (results + [("none", "")] * len(batch))[:len(batch)]
+            done = time.perf_counter()
+            for (_, future, start), result in zip(batch, results):
+                self.latencies.append(done - start)
+                if not future.done():           # 呼叫者可能已被取消
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        """立刻送出還在等的訊息，並等所有批次完成。"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(list(self.waits))
+        latencies = sorted(list(self.latencies))
+        ms = lambda v: round(v * 1000, 3)
+        return {
+            "window_ms": ms(self.window),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "messages": self.messages,
+            "mean_batch": round(self.messages / self.batches, 3) if self.batches else None,
+            "fill": round(self.messages / (self.batches * self.max_batch), 3) if self.batches else None,
+            "sizes": dict(sorted(self.sizes.items())),
+            "wait_p50_ms": ms(percentile(waits, 50)),
+            "wait_p95_ms": ms(percentile(waits, 95)),
+            "latency_p50_ms": ms(percentile(latencies, 50)),
+            "latency_p95_ms": ms(percentile(latencies, 95)),
+            "latency_max_ms": ms(latencies[-1]) if latencies else None,
+            "client": dict(self.client.stats),
+        }
+
+    def dump(self, path: str) -> None:
+        """寫成 JSON（先寫暫存檔再 rename）。"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+def classify_sync(message: str, timeout: float = LLM_TIMEOUT) -> Tuple[str, str]:
+    """同步版本（會阻塞到回應為止，只給非 async 的程式碼用）；失敗時回傳 ("none", "")。"""
+    base_url = (os.getenv("LLM_BASE_URL") or LLM_BASE_URL).rstrip("/")
+    payload = {
+        "model": os.getenv("LLM_MODEL") or LLM_MODEL,
+        "messages": [{"role": "user", "content": build_prompt(message)}],
+    }
+    try:
+        res = requests.post(f"{base_url}/chat/completions", headers=_headers(os.getenv("OPENROUTER_API_KEY")),
+                            data=json.dumps(payload), timeout=(LLM_CONNECT_TIMEOUT, timeout))
+        res.raise_for_status()
+        content = res.json()["choices"][0]["message"]["content"]
+        print("🧠 原始回應：", content)
+        return parse_decision(_extract_json(content))
+    except (requests.RequestException, KeyError, IndexError, TypeError, ValueError) as e:
+        print("❌ 分類失敗:", e)
+        return "none", ""
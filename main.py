@@ -12,6 +12,7 @@ def _thread_excepthook(args):
 threading.excepthook = _thread_excepthook
 
 import json
+import os
 import sys, random
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore    import QTimer
@@ -22,36 +23,71 @@ from vts_client       import VTSClient
 from typing import List, Tuple, Dict, Any
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 from twitch_bot import Bot
+from news_store import NewsPool, NewsStore
+
+load_dotenv()
 
 # ---------- 可自訂池子 ----------
 Step   = Tuple[str, str | None]   # (字幕, wav or None)
 Script = List[Step]               # 整篇新聞
-NewsPool: List[Tuple[str, Script, int]] = []   # (標題, script)
+news_pool = NewsPool()                          # (標題, script, idx)；bot 執行緒讀快照
+NewsImages: Dict[int, str] = {}                 # idx → 顯示用圖片（預先縮好的優先）
 
-data: List[Dict[str, Any]] = json.loads(Path("news.json").read_text(encoding="utf-8"))
 
-for art in data:
+def _to_pool_item(art: Dict[str, Any]) -> Tuple[str, Script, int]:
     title = art["title"]
     idx   = art["news_idx"]                   # 1, 2, 3 …
 
-    # 依段號排序，組成 [(text, wav)]
+    # 依段號排序，組成 [(text, wav)]；TTS 失敗的段落沒有音檔，只顯示字幕
+    text_only = set(art.get("text_only", ()))
     script: Script = [
-        (text, f"audio/news{idx}_{para}.wav")
+        (text, None if para in text_only else f"audio/news{idx}_{para}.wav")
         for para, text in sorted(
             art["content"].items(), key=lambda kv: int(kv[0])
         )
     ]
-
-    NewsPool.append((title, script, idx))
-
-print(f"已載入 {len(NewsPool)} 篇新聞")
+    image_path = art.get("image_display") or art.get("image")
+    if image_path:
+        NewsImages[idx] = image_path
+    else:
+        NewsImages.pop(idx, None)
+    return title, script, idx
+
+
+# news_parser 更新中會逐篇寫入 news.jsonl；沒有的話退回完整的 news.json
+news_store = NewsStore()
+if Path(news_store.path).exists():
+    data: List[Dict[str, Any]] = news_store.load()
+else:
+    data = json.loads(Path("news.json").read_text(encoding="utf-8"))
+
+news_pool.replace(_to_pool_item(art) for art in data)
+print(f"已載入 {len(news_pool)} 篇新聞")
 HOTKEY_POOL = [f"My Animation {i}" for i in range(1, 11)]
 
+# 輸出裝置以名稱設定（.env），不用再手動對 list_devices() 的 index
+#   VAC_DEVICE=Line 1 (Virtual Audio Cable)
+#   VAC_HOSTAPI=Windows WASAPI,MME        # 選填，同名裝置的 host API 優先順序
+#   AUDIO_SINK=null                       # 選填，沒有音效卡時用：null / memory / wav:out.wav（加 :fast 不即時）
+audio_vac.use_sink(audio_vac.sink_from_config(os.getenv("AUDIO_SINK")))
 audio_vac.list_devices()
 
-VAC_ID   = 11               # list_devices() 查到的 index
-DEVICE_ID = VAC_ID
+# 互動 / 打招呼音檔一直重播：常駐在 PCM 快取
+audio_vac.pin_dir("interact_audio")
+audio_vac.pin_dir("greet_audio")
+
+VAC_DEVICE = audio_vac.device_from_config(
+    os.getenv("VAC_DEVICE", "Line 1 (Virtual Audio Cable)"),
+    os.getenv("VAC_HOSTAPI"),
+)
+try:
+    print(f"輸出裝置：{VAC_DEVICE!r} → index {audio_vac.devices.resolve(VAC_DEVICE)}")
+except ValueError as e:
+    print(f"⚠️  {e}")                      # 無頭 sink 不需要真的裝置
+DEVICE_ID = VAC_DEVICE
 
 # ---------- 啟動三大物件 ----------
 app  = QApplication(sys.argv)
@@ -63,10 +99,38 @@ sched = SubtitleScheduler(
     device_id=DEVICE_ID,
     set_text=win.set_text,
     set_title = banner.set_text,
-    set_image = image.set_image  # ✅ 新增圖片控制 callback
+    set_image = image.set_image,  # ✅ 新增圖片控制 callback
+    resolve_image = lambda idx: NewsImages.get(idx, f"images/news{idx}_image.jpg"),
+    prefetch_image = image.preload,
+    prefetch_steps = int(os.getenv("PREFETCH_STEPS", "3")),
 )
 
-bot = Bot(vts,sched,NewsPool,DEVICE_ID)
+# ---------- 新聞更新中：逐篇加入池子 ----------
+def poll_news_store():
+    reset, entries = news_store.poll()
+    if not reset and not entries:
+        return
+    # 新一輪更新：舊的 idx 音檔會被覆寫，從空的開始
+    items = [] if reset else list(news_pool.snapshot())
+    if entries:
+        # 同一個 idx 以最新的為準
+        fresh = {art["news_idx"] for art in entries}
+        items = [item for item in items if item[2] not in fresh]
+        items.extend(_to_pool_item(art) for art in entries)
+    news_pool.replace(items)              # 整份替換，bot 執行緒手上的快照不受影響
+    print(f"新聞池更新：目前 {len(news_pool)} 篇")
+
+store_timer = QTimer()
+store_timer.timeout.connect(poll_news_store)
+store_timer.start(2000)
+
+# ---------- 播放量測：每分鐘寫一次 audio_metrics.json ----------
+metrics_timer = QTimer()
+metrics_timer.timeout.connect(lambda: audio_vac.dump_metrics("audio_metrics.json"))
+metrics_timer.start(60 * 1000)
+
+bot = Bot(vts,sched,news_pool,DEVICE_ID)
+metrics_timer.timeout.connect(lambda: bot.classifier.dump("llm_metrics.json"))   # 批次填滿率與分類延遲
 # ✅ 建立 Twitch bot 執行緒
 bot_thread = threading.Thread(target=bot.run, name="TwitchBotThread", daemon=True)
 bot_thread.start()
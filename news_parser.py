@@ -1,197 +1,732 @@
 import json
 import os
-import re
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+import random
 import socket
 import struct
+import threading
+import time
 import urllib.request
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from article_index import ArticleIndex, content_hash
+from extractors import get_backend, thread_backend
+from news_store import NewsStore
+from percentiles import percentile
+from segmenter import segment
+from tts_cache import TTSCache, cache_key
+from wavinfo import validate_wav
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:             # 沒裝 Pillow 就不產生顯示用縮圖
+    Image = None
+
+# TTS 語言 → (預設 port, 預設 model)
+TTS_LANGUAGES = {
+    "hakka": (10010, "hedusi"),
+    "taiwanese": (10012, "M12"),
+    "chinese": (10015, "M60"),
+}
+TTS_MAX_PER_PORT = 4        # 每個語言 port 同時送出的請求上限
+TTS_CONNECT_TIMEOUT = 5     # 秒
+TTS_READ_TIMEOUT = 30       # 兩次 recv 之間最多等待的秒數
+TTS_RETRIES = 2             # 失敗後最多重試次數
+TTS_BACKOFF = 0.5           # 第一次重試前等待的秒數，之後加倍
+TTS_HEDGE_MIN_SAMPLES = 20  # 累積這麼多筆延遲後才開始 hedging
+# 等待超過近期延遲中位數的這個倍數才送 hedge。正常的句子延遲大致與句長成正比，
+# 長短句之間約差 2 倍；超過中位數 3 倍還沒回來的，多半是卡在慢的 worker / 排隊，
+# 重送一次才有機會比較快。用 p95 當門檻則不論有沒有長尾都固定 hedge 約 5%，
+# 而長尾越重 p95 本身越高、越晚才 hedge。
+TTS_HEDGE_MULTIPLE = 3.0
+TTS_HEDGE_PER_PORT = 1      # 每個 port 同時在跑的 hedge 上限；port 最多 TTS_MAX_PER_PORT + 這個數的連線
+
+
+class TTSJob(NamedTuple):
+    text: str
+    language: str
+    model: str
+    output_path: str
+
+
+class TTSResult(NamedTuple):
+    ok: bool
+    path: str
+    error: str | None = None
+    attempts: int = 0           # 實際送出的請求數（含 hedge）
+    latency: float = 0.0        # 秒
+    cached: bool = False
+    hedged: bool = False        # 是否送出過 hedge 請求
+
 
 # TTS API Client
 class TTSClient:
-    def __init__(self, host: str, token: str):
+    def __init__(self, host: str, token: str, ports: Dict[str, int] | None = None,
+                 cache: TTSCache | None = None, connect_timeout: float = TTS_CONNECT_TIMEOUT,
+                 read_timeout: float = TTS_READ_TIMEOUT, retries: int = TTS_RETRIES,
+                 backoff: float = TTS_BACKOFF, hedge: bool = False):
+        """
+        hedge=True 時，若某句等待超過近期延遲中位數的 TTS_HEDGE_MULTIPLE 倍仍未完成，
+        且該 port 還有 hedge 名額（TTS_HEDGE_PER_PORT），會再送一個相同的請求，取先成功的那一個。
+        用完呼叫 close() 收掉 hedge 用的執行緒。
+        """
         self.__host = host
         self.__token = token
+        self.cache = cache
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        # 可覆寫各語言的 port（例如指向本機的假 TTS server）
+        self.__ports = {lang: port for lang, (port, _) in TTS_LANGUAGES.items()}
+        self.__ports.update(ports or {})
+        self._latencies: Deque[float] = deque(maxlen=200)   # 近期成功請求本身的耗時（不含排隊與重試）
+        self._lock = threading.Lock()
+        self._hedge_pool: ThreadPoolExecutor | None = None
+        self._hedge_slots = {port: threading.BoundedSemaphore(TTS_HEDGE_PER_PORT)
+                             for port in set(self.__ports.values())}
 
-    def askForService(self, text: str, language: str, model: str, output_path: str):
-        if not text:
-            raise ValueError("Text must not be empty.")
+    def close(self) -> None:
+        """收掉 hedge 用的執行緒池（等進行中的請求結束）；之後再用會重新建立。"""
+        with self._lock:
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _resolve(self, language: str, model: str):
+        """回傳 (language, port, model)；不支援的語言丟 ValueError。"""
         language = language.lower()
-        if language == "hakka":
-            port = 10010
-            model = model or "hedusi"
-        elif language == "taiwanese":
-            port = 10012
-            model = model or "M12"
-        elif language == "chinese":
-            port = 10015
-            model = model or "M60"
-        else:
+        if language not in TTS_LANGUAGES:
             raise ValueError("Unsupported language")
+        return language, self.__ports[language], model or TTS_LANGUAGES[language][1]
+
+    def askForService(self, text: str, language: str, model: str, output_path: str) -> TTSResult:
+        """
+        合成單句並寫入 output_path。有快取時先查快取。
+        連線 / 讀取逾時或回應不是完整的 WAV 時會退避重試；
+        結果先寫入暫存檔、驗證後才 rename，失敗時不留下任何輸出檔。
+        """
+        if not text:
+            raise ValueError("Text must not be empty.")
+        language, port, model = self._resolve(language, model)
+
+        key = cache_key(text, language, model) if self.cache else None
+        if key and self.cache.materialize(key, output_path):
+            return TTSResult(True, output_path, cached=True)
+
+        result = self._request_with_retries(text, language, port, model, output_path)
+        if result.ok and key:
+            self.cache.store(key, output_path)
+        return result
+
+    def _request_with_retries(self, text: str, language: str, port: int, model: str,
+                              output_path: str) -> TTSResult:
+        t0 = time.perf_counter()
+        attempts = 0
+        hedged = False
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.8, 1.2))
+            try:
+                sent, used_hedge = self._attempt(text, language, port, model, output_path)
+                attempts += sent
+                hedged = hedged or used_hedge
+                latency = time.perf_counter() - t0
+                return TTSResult(True, output_path, attempts=attempts, latency=latency, hedged=hedged)
+            except (OSError, ValueError) as e:
+                attempts += getattr(e, "attempts", 1)
+                error = f"{type(e).__name__}: {e}"
+
+        print(f"TTS error for sentence '{text}': {error}")
+        if os.path.exists(output_path):
+            os.remove(output_path)      # 不留下上一輪、內容不符的舊音檔
+        return TTSResult(False, output_path, error, attempts, time.perf_counter() - t0, hedged=hedged)
+
+    def _hedge_after(self) -> float | None:
+        """hedge 的等待門檻：近期延遲中位數 × TTS_HEDGE_MULTIPLE；樣本不足時回傳 None。"""
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < TTS_HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._latencies)
+        return percentile(samples, 50) * TTS_HEDGE_MULTIPLE
+
+    def _attempt(self, text: str, language: str, port: int, model: str, output_path: str):
+        """送出一次請求（必要時加一個 hedge）；回傳 (請求數, 是否 hedge)，失敗丟例外。"""
+        threshold = self._hedge_after()
+        if threshold is None:
+            self._synthesize(text, language, port, model, output_path)
+            return 1, False
+
+        with self._lock:
+            if self._hedge_pool is None:
+                workers = len(self._hedge_slots) * (TTS_MAX_PER_PORT + TTS_HEDGE_PER_PORT)
+                self._hedge_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-hedge")
+            pool = self._hedge_pool
+        # 呼叫端的 max_per_port / port_limits 可能超過 pool 的大小，請求會先在 pool 排隊；
+        # hedge 的計時從請求真的開始送出才算，排隊時間不當成伺服器慢
+        running = threading.Event()
+
+        def _primary() -> None:
+            running.set()
+            self._synthesize(text, language, port, model, output_path)
+
+        primary = pool.submit(_primary)
+        primary.add_done_callback(lambda _: running.set())     # 沒開始就被取消也要放行
+        running.wait()
+        done, _ = wait([primary], timeout=threshold)
+        slot = self._hedge_slots.get(port)
+        if done or slot is None or not slot.acquire(blocking=False):
+            primary.result()            # 已完成，或這個 port 的 hedge 名額用完：只等原本的請求
+            return 1, False
 
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((self.__host, port))
-            msg = bytes(self.__token + "@@@" + text + "@@@" + model + "@@@" + language, "utf-8")
-            msg = struct.pack(">I", len(msg)) + msg
-            sock.sendall(msg)
-
-            with open(output_path, "wb") as f:
-                while True:
-                    data = sock.recv(8192)
-                    if not data:
-                        break
-                    f.write(data)
-        except Exception as e:
-            print(f"TTS error for sentence '{text}': {e}")
+            hedge = pool.submit(self._synthesize, text, language, port, model, output_path)
+        except BaseException:
+            slot.release()
+            raise
+        # 輸的那個請求在回傳後仍佔著連線，名額等兩個都結束才還
+        pending = [primary, hedge]
+        pending_lock = threading.Lock()
+
+        def _finished(future) -> None:
+            with pending_lock:
+                pending.remove(future)
+                last = not pending
+            if last:
+                slot.release()
+
+        for future in (primary, hedge):
+            future.add_done_callback(_finished)
+        error = None
+        for future in as_completed([primary, hedge]):
+            try:
+                future.result()
+                return 2, True          # 先成功的勝出；另一個完成後也只是換成同樣內容的檔案
+            except (OSError, ValueError) as e:
+                error = e
+        error.attempts = 2
+        raise error
+
+    def _synthesize(self, text: str, language: str, port: int, model: str, output_path: str) -> None:
+        """單一請求：寫入暫存檔 → 驗證 WAV → rename 到 output_path；失敗丟 OSError / ValueError。"""
+        tmp = f"{output_path}.{uuid.uuid4().hex[:8]}.part"
+        t0 = time.perf_counter()
+        try:
+            with socket.create_connection((self.__host, port), timeout=self.connect_timeout) as sock:
+                sock.settimeout(self.read_timeout)
+                msg = bytes(self.__token + "@@@" + text + "@@@" + model + "@@@" + language, "utf-8")
+                msg = struct.pack(">I", len(msg)) + msg
+                sock.sendall(msg)
+
+                with open(tmp, "wb") as f:
+                    while True:
+                        data = sock.recv(8192)
+                        if not data:
+                            break
+                        f.write(data)
+            validate_wav(tmp)
+            os.replace(tmp, output_path)
+            with self._lock:
+                self._latencies.append(time.perf_counter() - t0)
         finally:
-            sock.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
 
-# 爬蟲函式
-def crawl_udn_news():
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'}
-    url = 'https://udn.com/news/cate/2/7227'
+    def synthesize_batch(self, jobs: Iterable[TTSJob], max_per_port: int = TTS_MAX_PER_PORT,
+                         port_limits: Dict[int, int] | None = None) -> Dict[str, Any]:
+        """
+        同時合成多句；每個語言 port 最多 max_per_port 條連線（port_limits 可個別覆寫）。
+        輸出檔名由呼叫端的 output_path 決定，與完成順序無關。
+
+        回傳統計：count / ok / failed / wall / throughput(句/秒) 與延遲百分位 (秒)。
+        """
+        jobs = list(jobs)
+        port_limits = port_limits or {}
+        ports = {job: self._resolve(job.language, job.model)[1] for job in jobs}
+        semaphores = {port: threading.BoundedSemaphore(port_limits.get(port, max_per_port))
+                      for port in set(ports.values())}
+        latencies: List[float] = []
+        failed: List[TTSJob] = []
+        lock = threading.Lock()
+
+        def _run(job: TTSJob) -> None:
+            with semaphores[ports[job]]:
+                t0 = time.perf_counter()
+                result = self.askForService(job.text, job.language, job.model, job.output_path)
+                elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if not result.ok:
+                    failed.append(job)
+
+        t_start = time.perf_counter()
+        if jobs:
+            workers = sum(port_limits.get(port, max_per_port) for port in semaphores)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_run, jobs))
+        wall = time.perf_counter() - t_start
+
+        stats = _tts_stats(len(jobs), failed, wall, latencies)
+        stats["cache"] = self.cache.stats() if self.cache else None
+        return stats
+
+
+def _tts_stats(count: int, failed: List[TTSJob], wall: float, latencies: List[float]) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "count": count,
+        "ok": count - len(failed),
+        "failed": failed,
+        "wall": wall,
+        "throughput": count / wall if wall > 0 else 0.0,
+        "latencies": latencies,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
 
+
+def merge_tts_stats(stats_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """把多次 synthesize_batch 的統計合併成一份（快取計數取最後一次）。"""
+    merged = _tts_stats(
+        sum(s["count"] for s in stats_list),
+        [job for s in stats_list for job in s["failed"]],
+        sum(s["wall"] for s in stats_list),
+        [lat for s in stats_list for lat in s["latencies"]],
+    )
+    merged["cache"] = stats_list[-1]["cache"] if stats_list else None
+    return merged
+
+
+def print_tts_stats(stats: Dict[str, Any]) -> None:
+    print(f"TTS：{stats['ok']}/{stats['count']} 句成功，耗時 {stats['wall']:.1f}s，"
+          f"{stats['throughput']:.2f} 句/秒")
+    print(f"  延遲 p50={stats['p50']:.2f}s p90={stats['p90']:.2f}s "
+          f"p95={stats['p95']:.2f}s p99={stats['p99']:.2f}s")
+    for job in stats["failed"]:
+        print(f"  ✗ {job.output_path}: {job.text}")
+    if stats.get("cache"):
+        c = stats["cache"]
+        print(f"  快取：命中 {c['hits']} / 未命中 {c['misses']}，"
+              f"{c['entries']} 筆 {c['bytes'] / 1024 / 1024:.1f} MB")
+
+# 爬蟲設定
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'}
+BASE_URL = 'https://udn.com'
+LIST_URL = BASE_URL + '/news/cate/2/7227'
+REQUEST_TIMEOUT = (5, 15)   # (連線, 讀取) 秒
+MAX_WORKERS = 8             # 同時抓取的文章數上限
+DISPLAY_SIZE = (551, 248)   # ImageWindow 的固定大小
+
+
+def make_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """建立共用的 keep-alive session，連線池大小與 worker 數一致。"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _download_image(session: requests.Session, image_url: str, news_idx: int, title: str, timeout=REQUEST_TIMEOUT):
+    """下載封面圖片到 images/news{idx}_image.{ext}；失敗回傳 None。"""
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        news_items = soup.select('.story-list__news')[:20]
-        if not news_items:
-            print("找不到新聞。")
-            return []
-
-        results = []
-        os.makedirs("images", exist_ok=True)  # 創建 images 目錄
-
-        for news_idx, item in enumerate(news_items, 1):
-            # 提取標題
-            title_tag = item.select_one('.story-list__text h2 a')
-            title = title_tag.get_text(strip=True) if title_tag else '無標題'
-            link = title_tag['href'] if title_tag and 'href' in title_tag.attrs else None
-            if not link:
-                print(f"新聞 '{title}' 無有效連結，跳過內容爬取。")
-                continue
-            if not link.startswith('http'):
-                link = 'https://udn.com' + link
+        image_response = session.get(image_url, timeout=timeout)
+        image_response.raise_for_status()
+        image_extension = image_url.split('.')[-1].split('&')[0]  # 提取檔案副檔名
+        image_path = f"images/news{news_idx}_image.{image_extension}"
+        with open(image_path, 'wb') as f:
+            f.write(image_response.content)
+        return image_path
+    except requests.RequestException as e:
+        print(f"無法下載新聞 '{title}' 的封面圖片：{e}")
+        return None
 
-            try:
-                article_response = requests.get(link, headers=headers)
-                article_response.raise_for_status()
-                article_soup = BeautifulSoup(article_response.text, 'html.parser')
-
-                # 提取時間
-                time_tag = article_soup.select_one('.article-content__subinfo time')
-                time = time_tag.get_text(strip=True) if time_tag else '無時間'
-                try:
-                    time = datetime.strptime(time, '%Y-%m-%d %H:%M').strftime('%Y-%m-%d %H:%M')
-                except ValueError:
-                    time = '時間格式錯誤'
-
-                # 移除內文插圖
-                for figure in article_soup.select('.article-content__editor figure'):
-                    figure.decompose()
-
-                # 提取封面圖片並下載
-                cover_image = article_soup.select_one('figure.article-content__cover img')
-                image_url = cover_image['src'] if cover_image and 'src' in cover_image.attrs else None
-                if image_url:
-                    try:
-                        image_response = requests.get(image_url, headers=headers)
-                        image_response.raise_for_status()
-                        image_extension = image_url.split('.')[-1].split('&')[0]  # 提取檔案副檔名
-                        image_path = f"images/news{news_idx}_image.{image_extension}"
-                        with open(image_path, 'wb') as f:
-                            f.write(image_response.content)
-                    except requests.RequestException as e:
-                        print(f"無法下載新聞 '{title}' 的封面圖片：{e}")
-                        image_path = None
-                else:
-                    image_path = None
-
-                # 移除封面圖片的 figcaption
-                cover_figcaption = article_soup.select_one('figure.article-content__cover figcaption')
-                if cover_figcaption:
-                    cover_figcaption.decompose()
-
-                # 提取主要內容
-                content_paragraphs = article_soup.select('.article-content__paragraph .article-content__editor p')
-                content = []
-                for p in content_paragraphs:
-                    if p.find_parent('div', style=re.compile(r'position: relative;.*background-color:#fff')):
-                        continue
-                    text = p.get_text(strip=True)
-                    if text:
-                        content.append(text)
-
-                content_text = '\n'.join(content) if content else '無內文'
-
-                # 分句處理：以 。、！、？、， 或 。」 為結尾
-                sentences = []
-                current = ""
-                i = 0
-                while i < len(content_text):
-                    current += content_text[i]
-                    if content_text[i] in "。！？,，":
-                        if i + 1 < len(content_text) and content_text[i] == "。" and content_text[i + 1] == "」":
-                            current += "」"
-                            i += 1
-                        sentences.append(current.strip())
-                        current = ""
-                    i += 1
-                if current.strip():
-                    sentences.append(current.strip())
-
-                news_item = {
-                    'title': title,
-                    'time': time,
-                    'content': content_text,
-                    'verbatim': sentences,
-                    'image': image_path
-                }
-                results.append(news_item)
-
-            except requests.RequestException as e:
-                print(f"錯誤爬取內容：{e}")
-                continue
-
-        return results
+
+def display_image_path(news_idx: int) -> str:
+    return f"images/news{news_idx}_display.jpg"
+
+
+def _ensure_display_image(image_path: str | None, news_idx: int, reuse: bool = False) -> str | None:
+    """
+    由封面圖產生 551×248 的顯示用縮圖（等比放大 / 縮小後中央裁切），
+    讓 ImageWindow 只需載入一張小圖。reuse=True（索引記錄的縮圖屬於同一張原圖）時直接沿用。
+    """
+    if not image_path or Image is None:
+        return None
+    dst = display_image_path(news_idx)
+    try:
+        if reuse and os.path.exists(dst):
+            return dst
+        with Image.open(image_path) as img:
+            img.draft('RGB', DISPLAY_SIZE)      # JPEG 直接以較小的尺寸解碼
+            thumb = ImageOps.fit(img.convert('RGB'), DISPLAY_SIZE, Image.LANCZOS)
+        tmp = dst + '.tmp'
+        thumb.save(tmp, 'JPEG', quality=90)
+        os.replace(tmp, dst)
+        return dst
+    except OSError as e:
+        print(f"無法產生縮圖 {image_path}：{e}")
+        return None
+
+
+def _carried_item(session, prev, news_idx, link, title, timings, timeout=REQUEST_TIMEOUT, **validators):
+    """文章未變動：沿用索引中的內容與圖片，不再解析 / 合成。"""
+    image_path = prev.get('image')
+    if image_path and not os.path.exists(image_path):
+        image_path = None
+    if not image_path and prev.get('image_url'):
+        t0 = time.perf_counter()
+        image_path = _download_image(session, prev['image_url'], news_idx, title, timeout)
+        timings['image'] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    reuse = image_path == prev.get('image') and prev.get('image_display') == display_image_path(news_idx)
+    image_display = _ensure_display_image(image_path, news_idx, reuse)
+    timings['thumb'] = time.perf_counter() - t0
+    item = {
+        'news_idx': news_idx,
+        'url': link,
+        'title': prev.get('title', title),
+        'time': prev.get('time', '無時間'),
+        'content': prev.get('content', {}),
+        'image': image_path,
+        'image_display': image_display,
+        'image_url': prev.get('image_url'),
+        'etag': prev.get('etag'),
+        'last_modified': prev.get('last_modified'),
+        'hash': prev.get('hash'),
+        'carried': True,
+        'timings': timings,
+    }
+    item.update({k: v for k, v in validators.items() if v})
+    return item
+
+
+def _fetch_article(session: requests.Session, news_idx: int, title: str, link: str, timeout=REQUEST_TIMEOUT,
+                   index: ArticleIndex | None = None, backend: str | None = None):
+    """
+    抓取並解析單篇新聞；失敗回傳 None。news_idx 決定圖片檔名，backend 為擷取後端名稱。
+
+    有 index 時會送出條件式請求；304 或內文指紋相同時回傳 carried=True 的項目，
+    其 'content' 為上次輸出的 {句號: 句子}。
+    """
+    timings = {}
+    prev = index.get(link) if index else None
+    try:
+        t0 = time.perf_counter()
+        cond_headers = index.conditional_headers(link) if prev else {}
+        article_response = session.get(link, headers=cond_headers, timeout=timeout)
+        article_response.raise_for_status()
+        timings['fetch'] = time.perf_counter() - t0
+
+        if prev and article_response.status_code == 304:
+            return _carried_item(session, prev, news_idx, link, title, timings, timeout)
+        validators = {
+            'etag': article_response.headers.get('ETag'),
+            'last_modified': article_response.headers.get('Last-Modified'),
+        }
+
+        t0 = time.perf_counter()
+        parts = thread_backend(backend).parse_article(article_response.text)
+
+        # 提取時間
+        pub_time = parts.time or '無時間'
+        try:
+            pub_time = datetime.strptime(pub_time, '%Y-%m-%d %H:%M').strftime('%Y-%m-%d %H:%M')
+        except ValueError:
+            pub_time = '時間格式錯誤'
+
+        # 封面圖片網址（下載在解析完成後進行）
+        image_url = parts.image_url
+
+        content_text = '\n'.join(parts.paragraphs) if parts.paragraphs else '無內文'
+
+        # 分句並合併成適合 TTS 的長度
+        sentences = segment(content_text)
+        digest = content_hash(title, pub_time, content_text)
+        timings['parse'] = time.perf_counter() - t0
 
+    except requests.RequestException as e:
+        print(f"錯誤爬取內容：{e}")
+        return None
+
+    if prev and prev.get('hash') == digest:
+        return _carried_item(session, prev, news_idx, link, title, timings, timeout, **validators)
+
+    # 下載封面圖片（與上次相同且檔案仍在就不重抓）
+    image_path = None
+    reuse = False
+    if image_url:
+        if prev and prev.get('image_url') == image_url and prev.get('image') and os.path.exists(prev['image']):
+            image_path = prev['image']
+            reuse = prev.get('image_display') == display_image_path(news_idx)
+        else:
+            t0 = time.perf_counter()
+            image_path = _download_image(session, image_url, news_idx, title, timeout)
+            timings['image'] = time.perf_counter() - t0
+
+    # 縮圖在各文章的 worker 執行緒中產生，彼此同時進行
+    t0 = time.perf_counter()
+    image_display = _ensure_display_image(image_path, news_idx, reuse)
+    timings['thumb'] = time.perf_counter() - t0
+
+    return {
+        'news_idx': news_idx,
+        'url': link,
+        'title': title,
+        'time': pub_time,
+        'content': content_text,
+        'verbatim': sentences,
+        'image': image_path,
+        'image_display': image_display,
+        'image_url': image_url,
+        'hash': digest,
+        'carried': False,
+        'timings': timings,
+        **validators,
+    }
+
+
+def _relocate_previous(index: ArticleIndex, tasks) -> None:
+    """
+    列表順序變動時，把上一輪的音檔與圖片搬到新的 news_idx。
+    必須在抓取前執行，避免新文章先寫入而覆蓋舊檔。
+    """
+    moves = []
+    for news_idx, _, link in tasks:
+        prev = index.get(link)
+        if not prev or prev.get('news_idx') in (None, news_idx):
+            continue
+        old_idx = prev['news_idx']
+        for sent_idx in prev.get('content', {}):
+            moves.append((f"audio/news{old_idx}_{sent_idx}.wav", f"audio/news{news_idx}_{sent_idx}.wav"))
+        new_image = new_display = None
+        if prev.get('image'):
+            new_image = f"images/news{news_idx}_image.{prev['image'].rsplit('.', 1)[-1]}"
+            moves.append((prev['image'], new_image))
+        if prev.get('image_display'):
+            new_display = display_image_path(news_idx)
+            moves.append((prev['image_display'], new_display))
+        index.update(link, news_idx=news_idx, image=new_image, image_display=new_display)
+
+    if not moves:
+        return
+    # 兩階段搬移：先改成暫存名稱，再放到新位置，避免互換位置時互相覆蓋
+    staged = []
+    for n, (src, dst) in enumerate(moves):
+        if os.path.exists(src):
+            tmp = f"{src}.relocate{n}"
+            os.replace(src, tmp)
+            staged.append((tmp, dst))
+    for tmp, dst in staged:
+        os.replace(tmp, dst)
+    index.save()
+
+
+def print_timings(results) -> None:
+    """列出每篇新聞的抓取 / 解析 / 圖片下載耗時。"""
+    print("新聞抓取耗時 (秒)：")
+    print(f"  {'idx':>3}  {'fetch':>6}  {'parse':>6}  {'image':>6}  {'thumb':>6}  title")
+    for news in results:
+        t = news.get('timings', {})
+        mark = '=' if news.get('carried') else '+'
+        print(f"  {news['news_idx']:>3}  {t.get('fetch', 0):6.2f}  {t.get('parse', 0):6.2f}  "
+              f"{t.get('image', 0):6.2f}  {t.get('thumb', 0):6.2f}  {mark} {news['title'][:20]}")
+
+
+# 爬蟲函式
+def iter_udn_news(concurrent: bool = True, max_workers: int = MAX_WORKERS,
+                  timeout=REQUEST_TIMEOUT, session: requests.Session | None = None,
+                  index: ArticleIndex | None = None, backend: str | None = None,
+                  list_url: str = LIST_URL, base_url: str = BASE_URL) -> Iterator[Dict[str, Any]]:
+    """
+    依列表順序 (news_idx) 逐篇產出 UDN 新聞。
+
+    concurrent=True 時以最多 max_workers 條執行緒在背景預先抓取後面的文章與封面圖，
+    呼叫端處理第 N 篇的同時，第 N+1 篇已在下載。
+    傳入 index 時改為增量爬取：未變動的文章以 carried=True 產出。
+    backend 指定 extractors 的擷取後端（預設讀 NEWS_PARSER_BACKEND）。
+    list_url / base_url 可改指向本機的錄製頁面（bench_refresh.py）。
+    """
+    session = session or make_session(max_workers)
+    get_backend(backend)            # 名稱錯誤時在開始抓取前就報錯
+
+    try:
+        response = session.get(list_url, timeout=timeout)
+        response.raise_for_status()
     except requests.RequestException as e:
         print(f"主頁面無法連線：{e}")
-        return []
+        return
 
-# 主程式
-if __name__ == "__main__":
-    os.makedirs("audio", exist_ok=True)
+    news_items = thread_backend(backend).parse_listing(response.text)
+    if not news_items:
+        print("找不到新聞。")
+        return
+
+    os.makedirs("images", exist_ok=True)  # 創建 images 目錄
+
+    tasks = []
+    for news_idx, (title, link) in enumerate(news_items, 1):
+        if not link:
+            print(f"新聞 '{title}' 無有效連結，跳過內容爬取。")
+            continue
+        if not link.startswith('http'):
+            link = base_url + link
+        tasks.append((news_idx, title, link))
+
+    if index:
+        _relocate_previous(index, tasks)
+
+    def _run(task):
+        news_idx, title, link = task
+        try:
+            return _fetch_article(session, news_idx, title, link, timeout, index, backend)
+        except Exception as e:
+            # 版面改變造成解析錯誤、圖片檔寫入失敗等：只跳過這一篇，不中斷整輪
+            print(f"處理新聞 '{title}' 失敗，跳過（{link}）：{type(e).__name__}: {e}")
+            return None
+
+    if not concurrent:
+        for task in tasks:
+            news = _run(task)
+            if news:
+                yield news
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # 依提交順序取結果，確保 news_idx 順序不變
+        futures = [pool.submit(_run, task) for task in tasks]
+        for future in futures:
+            news = future.result()
+            if news:
+                yield news
 
-    tts_client = TTSClient(host="140.116.245.157", token="mi2stts")
-    news_list = crawl_udn_news()  # 取得新聞
 
-    for news_idx, news in enumerate(news_list, 1):
+def crawl_udn_news(**kwargs) -> List[Dict[str, Any]]:
+    """一次抓完前 20 篇新聞並列出耗時；參數同 iter_udn_news。"""
+    results = list(iter_udn_news(**kwargs))
+    print_timings(results)
+    return results
+
+
+def refresh(tts_client: TTSClient, index: ArticleIndex | None = None, store: NewsStore | None = None,
+            language: str = "taiwanese", model: str = "M12", max_per_port: int = TTS_MAX_PER_PORT,
+            **crawl_kwargs) -> Dict[str, Any]:
+    """
+    串流式更新：抓到一篇就合成一篇，完成後立即附加到 news.jsonl，
+    main.py 不必等整批做完就能播第一篇。最後仍輸出一份完整的 news.json。
+    第一篇可發佈時才清空 news.jsonl；爬取失敗或沒有文章時保留上一輪的內容。
+
+    回傳 {"articles": 發佈的文章, "fetched": 爬蟲結果（含 timings）,
+          "tts": 合併後的 TTS 統計, "stages": 各階段耗時 (秒)}。
+    """
+    t_start = time.perf_counter()
+    os.makedirs("audio", exist_ok=True)
+    store = store or NewsStore()
+
+    fetched = []
+    output = []
+    tts_stats = []
+    stages = {"crawl_wait": 0.0, "tts": 0.0, "publish": 0.0, "first_publish": None}
+    articles = iter_udn_news(index=index, **crawl_kwargs)
+    while True:
+        t0 = time.perf_counter()
+        news = next(articles, None)          # 等待爬蟲的時間（其餘時間爬蟲在背景進行）
+        stages["crawl_wait"] += time.perf_counter() - t0
+        if news is None:
+            break
+        fetched.append(news)
+        news_idx = news["news_idx"]          # 與圖片檔名共用列表順序
         print(f"[新聞 {news_idx}] {news['title']} ({news['time']})")
-        content1 = {}
-        for sent_idx, sentence in enumerate(news['verbatim'], 1):
-            print(f"  ({sent_idx}) {sentence}")
-            filename = f"audio/news{news_idx}_{sent_idx}.wav"
-            tts_client.askForService(
-                text=sentence,
-                language="taiwanese",
-                model="M12",
-                output_path=filename
-            )
-            content1[str(sent_idx)] = sentence
 
+        if news["carried"]:
+            content1 = news["content"]
+            pending = [(int(k), s) for k, s in content1.items()
+                       if not os.path.exists(f"audio/news{news_idx}_{k}.wav")]
+            print(f"  (未變動，沿用 {len(content1) - len(pending)}/{len(content1)} 句音檔)")
+        else:
+            content1 = {str(i): s for i, s in enumerate(news['verbatim'], 1)}
+            pending = list(enumerate(news['verbatim'], 1))
+
+        jobs = [TTSJob(sentence, language, model, f"audio/news{news_idx}_{sent_idx}.wav")
+                for sent_idx, sentence in pending]
+        stats = tts_client.synthesize_batch(jobs, max_per_port)
+        stages["tts"] += stats["wall"]
+        tts_stats.append(stats)
+        if jobs:
+            print(f"  TTS {stats['ok']}/{stats['count']} 句，{stats['wall']:.1f}s")
+        for job in stats["failed"]:
+            print(f"  ✗ {job.output_path}: {job.text}")
+        # 合成失敗的句子沒有音檔，標成純字幕，main.py 只顯示文字不播放
+        failed_paths = {job.output_path for job in stats["failed"]}
+        text_only = [str(sent_idx) for sent_idx, _ in pending
+                     if f"audio/news{news_idx}_{sent_idx}.wav" in failed_paths]
         print(f"  圖片: {news['image'] if news['image'] else '無圖片'}")
         print("-" * 40)
 
-        news["news_idx"] = news_idx
-        del news["content"]
-        del news["verbatim"]
-        news["content"] = content1
+        entry = {
+            "news_idx": news_idx,
+            "url": news["url"],
+            "title": news["title"],
+            "time": news["time"],
+            "image": news["image"],
+            "image_display": news["image_display"],
+            "content": content1,
+            "text_only": text_only,
+        }
+        t0 = time.perf_counter()
+        if not output:
+            store.begin_refresh()           # 有第一篇可發佈才換掉上一輪
+        store.append(entry)
+        output.append(entry)
+        if stages["first_publish"] is None:
+            stages["first_publish"] = time.perf_counter() - t_start
+
+        # 合成完成後才更新索引；有句子失敗就不記錄，下次重新處理
+        if index and not stats["failed"]:
+            index.update(
+                news["url"],
+                news_idx=news_idx, title=news["title"], time=news["time"],
+                image=news["image"], image_display=news["image_display"], image_url=news.get("image_url"),
+                etag=news.get("etag"), last_modified=news.get("last_modified"),
+                hash=news["hash"], content=content1,
+            )
+            index.save()
+        stages["publish"] += time.perf_counter() - t0
+
+    print_timings(fetched)
+    tts_total = merge_tts_stats(tts_stats) if tts_stats else None
+    if tts_total:
+        print_tts_stats(tts_total)
+    if not output:
+        print("這一輪沒有可發佈的新聞，保留上一輪的 news.jsonl / news.json")
+    else:
+        if index:
+            index.prune(news["url"] for news in fetched)
+            index.save()
+        with open("news.json", "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+    stages["total"] = time.perf_counter() - t_start
+    return {"articles": output, "fetched": fetched, "tts": tts_total, "stages": stages}
 
-    with open("news.json", "w", encoding="utf-8") as f:
-        json.dump(news_list, f, ensure_ascii=False, indent=2)
+# 主程式
+if __name__ == "__main__":
+    tts_client = TTSClient(host="140.116.245.157", token="mi2stts", cache=TTSCache())
+    try:
+        refresh(tts_client, index=ArticleIndex())
+    finally:
+        tts_client.close()
 
-    print("已將新聞資料輸出至 news.json")
\ No newline at end of file
+    print("已將新聞資料輸出至 news.jsonl / news.json")
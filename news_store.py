@@ -0,0 +1,102 @@
+# news_store.py
+import json
+import os
+from typing import Any, Dict, Iterable, List, Tuple
+
+STORE_PATH = "news.jsonl"
+
+
+class NewsStore:
+    """
+    逐篇發佈的新聞庫（JSONL，一行一篇）。
+
+    寫入端（news_parser）：
+      - begin_refresh()：以空檔原子替換舊檔，開始新一輪
+      - append(entry)：單次 os.write 寫入完整一行並 fsync，讀取端不會看到半行
+    讀取端（main.py）：
+      - poll()：只讀新增的完整行；檔案被替換時回傳 reset=True
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._ino = None
+        self._offset = 0
+        self._partial = b""
+
+    # ────────── 寫入端 ──────────
+    def begin_refresh(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb"):
+            pass
+        os.replace(tmp, self.path)
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # ────────── 讀取端 ──────────
+    def poll(self) -> Tuple[bool, List[Dict[str, Any]]]:
+        """回傳 (是否換了新一輪, 新增的文章)。"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False, []
+
+        reset = False
+        if st.st_ino != self._ino or st.st_size < self._offset:
+            reset = self._ino is not None
+            self._ino = st.st_ino
+            self._offset = 0
+            self._partial = b""
+        if st.st_size == self._offset:
+            return reset, []
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        self._offset += len(chunk)
+
+        data = self._partial + chunk
+        lines = data.split(b"\n")
+        self._partial = lines.pop()          # 最後一段若沒有換行就先留著
+        entries = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError as e:
+                print(f"news.jsonl 有無法解析的一行，略過：{e}")
+        return reset, entries
+
+    def load(self) -> List[Dict[str, Any]]:
+        """從頭讀取目前所有完整的文章。"""
+        self._ino = None
+        self._offset = 0
+        self._partial = b""
+        return self.poll()[1]
+
+
+class NewsPool:
+    """
+    可播放的新聞 (標題, script, idx)，給 GUI 執行緒更新、Twitch bot 執行緒讀取。
+    更新時整份換成新的 tuple（單一屬性指定是原子的），讀取端用 snapshot() 拿到的內容不會被改到。
+    只有一個執行緒會呼叫 replace()。
+    """
+
+    def __init__(self, items: Iterable[Tuple] = ()):
+        self._items: Tuple[Tuple, ...] = tuple(items)
+
+    def snapshot(self) -> Tuple[Tuple, ...]:
+        return self._items
+
+    def replace(self, items: Iterable[Tuple]) -> None:
+        self._items = tuple(items)
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,14 @@
+# percentiles.py
+"""各模組的延遲統計共用的百分位數（nearest-rank）。"""
+import math
+from typing import Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    nearest-rank 百分位數：至少 q% 的值 <= 回傳值的最小那個；sorted_values 需已排序，空的回傳 0.0。
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q * len(sorted_values) / 100) - 1, 0)      # 先乘再除，避免 0.07 * 100 = 7.000…1
+    return sorted_values[min(rank, len(sorted_values) - 1)]
@@ -0,0 +1,78 @@
+# record_udn.py
+"""
+錄下目前的 UDN 列表頁、文章與封面圖，供離線基準測試使用
+（bench_extract.py 解析速度、bench_refresh.py 端到端更新）。
+
+    python record_udn.py                 # 存到 bench_data/udn/
+    python record_udn.py --no-images
+
+目錄結構：
+    listing.html, article_01.html …, image_01.jpg …
+    manifest.json  {"list_url": ..., "files": {"/path?query": {"file", "content_type"}}}
+"""
+import argparse
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+from extractors import get_backend
+from news_parser import BASE_URL, LIST_URL, REQUEST_TIMEOUT, make_session
+
+RECORD_DIR = Path("bench_data/udn")
+
+
+def url_key(url: str) -> str:
+    """以 path + query 當 key，忽略主機（udn.com 與 uc.udn.com.tw 共用同一個本機 server）。"""
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def record(out_dir: Path = RECORD_DIR, images: bool = True) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    session = make_session()
+    backend = get_backend("bs4")
+    files = {}
+
+    def _save(url: str, name: str) -> requests.Response | None:
+        try:
+            resp = session.get(url, timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            print(f"略過 {url}：{e}")
+            return None
+        (out_dir / name).write_bytes(resp.content)
+        files[url_key(url)] = {"file": name, "content_type": resp.headers.get("Content-Type", "")}
+        return resp
+
+    listing = _save(LIST_URL, "listing.html")
+    if listing is None:
+        raise SystemExit("列表頁無法下載")
+
+    for n, (title, link) in enumerate(backend.parse_listing(listing.text), 1):
+        if not link:
+            continue
+        if not link.startswith("http"):
+            link = BASE_URL + link
+        article = _save(link, f"article_{n:02d}.html")
+        if article is None or not images:
+            continue
+        image_url = backend.parse_article(article.text).image_url
+        if image_url:
+            ext = image_url.split('.')[-1].split('&')[0].split('?')[0]
+            _save(image_url, f"image_{n:02d}.{ext}")
+        print(f"[{n:02d}] {title}")
+
+    manifest = {"list_url": LIST_URL, "files": files}
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"已錄製 {len(files)} 個檔案到 {out_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="錄製 UDN 頁面供離線測試")
+    parser.add_argument("--out", type=Path, default=RECORD_DIR)
+    parser.add_argument("--no-images", action="store_true")
+    args = parser.parse_args()
+    record(args.out, images=not args.no_images)
@@ -1,96 +1,418 @@
 # scheduler.py
 from __future__ import annotations
-from typing import List, Tuple, Callable
+
+import itertools
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
 import audio_vac
-from audio_vac import stop_playback
+from subtitle_timing import Cue, SubtitleTimer
+from wavinfo import read_wav_header
 
 Step   = Tuple[str, str | None]      # (字幕, wav 或 None)
 Script = List[Step]
 Item   = Tuple[str, Script,int]          # (標題, 整份腳本)
 
+Dispatch = Callable[[Callable[..., None], Any], None]   # 在 GUI 執行緒呼叫 fn(arg)
+
+
+
+class Priority(IntEnum):
+    """數字越小越優先；高優先的腳本會在句子之間插播。"""
+    BREAKING = 0        # 快訊
+    CHAT     = 1        # 聊天室互動的插話
+    NEWS     = 2        # 一般新聞
+
+
+PREFETCH_STEPS = 3                      # 播放時往後預載幾句
+PREFETCH_BYTES = 64 * 1024 * 1024       # 預載中（解碼後）的音訊總量上限
+
+try:
+    from PyQt6.QtCore import QCoreApplication, QObject, Qt, pyqtSignal
+
+    class _UiBridge(QObject):
+        """把其他執行緒的 UI 呼叫排進 Qt 事件迴圈（queued signal），在 GUI 執行緒執行。"""
+        call = pyqtSignal(object, object)
+
+        def __init__(self):
+            super().__init__()
+            self.call.connect(self._run, Qt.ConnectionType.QueuedConnection)
+
+        def _run(self, fn, arg):
+            fn(arg)
+
+        def dispatch(self, fn, arg) -> None:
+            self.call.emit(fn, arg)
+except ImportError:                     # 無頭環境
+    QCoreApplication = None
+    _UiBridge = None
+
+
+def _direct(fn, arg) -> None:
+    fn(arg)
+
+
+def default_dispatch() -> Dispatch:
+    """有 Qt 應用程式時用 queued signal（須在 GUI 執行緒建立）；否則直接呼叫。"""
+    if _UiBridge is not None and QCoreApplication.instance() is not None:
+        return _UiBridge().dispatch
+    return _direct
+
+
+class AudioVacPlayer:
+    """排程器用的音訊介面：預設接到 audio_vac 的 news 聲道。"""
+
+    def __init__(self, device_id, channel: str = "news"):
+        self.device_id = device_id
+        self.channel = channel
+
+    def load(self, wav: str) -> Optional[tuple]:
+        """讀檔 / 解碼（沒預載時可能要一段時間）；讀不到回傳 None。回傳值交給 play。"""
+        requested = time.perf_counter()
+        pcm = audio_vac.load_wav(wav)
+        return None if pcm is None else (wav, pcm, requested)
+
+    def play(self, clip: tuple, on_done: Callable[[], None],
+             marks: Iterable[Tuple[float, Callable[[], None]]] = ()) -> None:
+        """
+        clip 為 load 的回傳值；只排進佇列，不碰硬碟。
+        marks：[(秒, callback)]，依聲道實際播到的位置呼叫（duck 暫停時不前進）。
+        """
+        wav, pcm, requested = clip
+        audio_vac.play_pcm_to_device(pcm, self.device_id, on_done=on_done, channel=self.channel, marks=marks,
+                                     name=wav, requested=requested)
+
+    def preload(self, wav: str) -> None:
+        audio_vac.preload([wav])
+
+    def estimate_bytes(self, wav: str) -> int:
+        """只讀 WAV 標頭，估算轉成引擎格式後佔用的記憶體；讀不到就當 0。"""
+        try:
+            duration = read_wav_header(wav).duration
+        except (OSError, ValueError):
+            return 0
+        return int(duration * audio_vac.ENGINE_SAMPLERATE) * audio_vac.ENGINE_CHANNELS * 4
+
+    def stop(self) -> None:
+        audio_vac.stop_playback(self.channel)
+
+
+class _Playback:
+    __slots__ = ("title", "script", "idx", "step", "waiting", "enqueued", "priority", "deadline", "started")
+
+    def __init__(self, title: str, script: Script, idx: int, enqueued: float,
+                 priority: int = Priority.NEWS, deadline: Optional[float] = None):
+        self.title = title
+        self.script = script
+        self.idx = idx
+        self.step = 0               # 下一句要播的位置；被插播後從這裡接著播
+        self.waiting = False        # 正在等這一句的音檔播完
+        self.enqueued = enqueued
+        self.priority = priority
+        self.deadline = deadline    # clock() 超過就不播（已開始播的不受影響，除非被插播後才過期）
+        self.started = False
+
+
 class SubtitleScheduler:
     """
     佇列式播放 (字幕, 音檔)；每份腳本可附一個標題。
-    - 不再 import GUI，只透過 callback 與外界互動。
+    - 不再 import GUI，只透過 callback 與外界互動；UI callback 一律經 dispatch 送到 GUI 執行緒
+    - 狀態機：閒置 → 開始腳本 → 播一句（等音檔 on_done）→ 下一句 … → 下一份腳本 / 閒置
+      以迴圈推進，不遞迴；enqueue / clear_queue 可從任何執行緒呼叫
+    - audio / dispatch / clock 可注入，沒有音效卡與 Qt 時也能跑（基準測試用）
+    - 優先度（Priority）：每個優先度一個 FIFO；較高優先的腳本在目前這句播完時插播，
+      被插播的腳本放回它那一級的最前面，之後從下一句接著播
+    - deadline：輪到時已過期的腳本直接丟掉
+    - 長句依 SubtitleTimer 的時間軸分段顯示；每段掛在音檔的播放位置上（audio.play 的 marks），
+      音檔真正開始、被 duck 暫停時字幕也跟著等
     """
 
     def __init__(
         self,
-        device_id: int,
+        device_id: int | str,
         set_text : Callable[[str], None],
         set_title: Callable[[str], None],
-        set_image: Callable[[str], None]  # ✅ 新增
+        set_image: Callable[[str], None],  # ✅ 新增
+        resolve_image: Optional[Callable[[int], str]] = None,  # idx → 圖片路徑
+        dispatch: Optional[Dispatch] = None,
+        audio: Optional[AudioVacPlayer] = None,
+        clock: Callable[[], float] = time.monotonic,
+        prefetch_image: Optional[Callable[[str], None]] = None,   # 背景先載入下一份腳本的圖片
+        prefetch_steps: int = PREFETCH_STEPS,
+        prefetch_bytes: int = PREFETCH_BYTES,
+        timer: Optional[SubtitleTimer] = None,      # 字幕切段與時間軸
     ):
         self.device_id  = device_id
         self.set_text   = set_text
         self.set_title  = set_title      # <─ 修正變數名
         self.set_image = set_image      # Mys
-        self.queue: List[Item] = []
-        self.busy = False
-        self.stop_flag = False
+        self.resolve_image = resolve_image or (lambda idx: f"images/news{idx}_image.jpg")
+        self.dispatch = dispatch or default_dispatch()
+        self.audio = audio or AudioVacPlayer(device_id)
+        self.clock = clock
+        self.prefetch_image = prefetch_image
+        self.prefetch_steps = prefetch_steps
+        self.prefetch_bytes = prefetch_bytes
+        self._prefetched: frozenset = frozenset()     # 上一次預載的窗口；窗口每句只滑一格，不重送
+        self._prefetch_lock = threading.Lock()
+        self.timer = timer or SubtitleTimer(pcm_lookup=audio_vac.pcm_cache.peek)
+
+        self._queues: Dict[int, Deque[_Playback]] = {p: deque() for p in Priority}
+        self._current: Optional[_Playback] = None
+        self._lock = threading.Lock()
+        self._output_lock = threading.RLock()   # 確認 token 與送出音檔 / 字幕要和 clear_queue 的停止互斥
+        self._token = 0                 # 每次送出音檔或清空都換號，過期的 on_done 直接忽略
+        self._pumping = False
+        self._repump = False
+        self._shown = False             # 目前畫面上有標題 / 字幕（閒置時才需要清掉）
+        self.stats: Dict[str, Any] = {
+            "scripts": 0, "steps": 0, "cancelled": 0, "preempted": 0, "resumed": 0, "expired": 0,
+            "first_subtitle_latency": None,      # 最近一份腳本：enqueue → 第一句字幕送出 (秒)
+        }
 
     # ────────── Public API ──────────
-    def enqueue(self, title: str, script: Script,idx: int) -> None:
-        """把 (標題, 腳本) 丟進佇列；若空檔就立即播放。"""
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._current is not None or any(self._queues.values())
+
+    @property
+    def pending(self) -> int:
+        """排隊中（含被插播）的腳本數。"""
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    def enqueue(self, title: str, script: Script,idx: int, priority: int = Priority.NEWS,
+                deadline: Optional[float] = None, ttl: Optional[float] = None) -> None:
+        """
+        把 (標題, 腳本) 丟進該優先度的佇列；若空檔就立即播放。
+        deadline 為 clock() 的絕對時間，ttl 為從現在起算的秒數（擇一）。
+        """
         print(f"Enqueued new script: {title!r}")
-        self.queue.append((title, script,idx))
-        if not self.busy:
-            self._next_script()
+        now = self.clock()
+        if ttl is not None:
+            deadline = now + ttl
+        entry = _Playback(title, script, idx, now, Priority(priority), deadline)
+        with self._lock:
+            self._queues[entry.priority].append(entry)
+            is_next = self._peek() is entry
+            playing = self._current is not None
+        if is_next:
+            self._prefetch([step for step in script if step[1]][:self.prefetch_steps], extend=playing)
+            if playing:
+                self._prefetch_image(idx)
+        self._pump()
 
-    def clear_queue(self):
+    def clear_queue(self, priority: Optional[int] = None):
+        """
+        停止並清空；標題與字幕留在畫面上。
+        priority 指定時只清那一級的佇列（目前播放的腳本若屬於這一級也停掉）。
+        """
         print("⛔ 停止字幕播放")
-        stop_playback()
-        print("1")
-        self.stop_flag = True
-        print("2")
-        self.queue.clear()
-        print("3")
-        self.busy = False
-        print("4")
-        # self.set_text("")
-        print("5")
-        # self.set_title("")
-        print("6")
+        with self._lock:
+            targets = list(self._queues) if priority is None else [Priority(priority)]
+            for p in targets:
+                self._queues[p].clear()
+            cur = self._current
+            if cur is None or cur.priority not in targets:
+                return
+            self.stats["cancelled"] += 1
+            self._current = None
+            self._token += 1
+            self._shown = False
+        with self._output_lock:
+            self.audio.stop()
+        self._pump()                    # 只清一級時，其他優先度的腳本接著播
 
     # ────────── Internal ──────────
-    def _next_script(self) -> None:
-        """撥下一份腳本；若佇列空則收尾。"""
-        if not self.queue:
-            self.busy = False
-            self.set_text("")
-            self.set_title("")       # 清空標題
-            return
+    def _pump(self) -> None:
+        """推進狀態機直到需要等音檔或佇列空；同時只有一個執行緒在推進。"""
+        with self._lock:
+            if self._pumping:
+                self._repump = True
+                return
+            self._pumping = True
+        try:
+            while True:
+                with self._lock:
+                    actions = self._advance()
+                    if actions is None:
+                        if self._repump:
+                            self._repump = False
+                            continue
+                        self._pumping = False
+                        return
+                for action in actions:
+                    action()
+        except BaseException:
+            with self._lock:
+                self._pumping = False
+            raise
+
+    def _advance(self) -> Optional[List[Callable[[], None]]]:
+        """（持有 _lock）決定下一步；回傳要在鎖外執行的動作，None 表示沒事可做。"""
+        ui = self.dispatch
+        cur = self._current
+        if cur is None:
+            entry = self._pop()
+            if entry is None:
+                if self._shown:
+                    self._shown = False
+                    return [partial(ui, self.set_text, ""),
+                            partial(ui, self.set_title, "")]       # 清空標題
+                return None
+            self._current = entry
+            self._shown = True
+            if entry.started:
+                self.stats["resumed"] += 1
+                print(f"▶️ 接續播放 {entry.title!r}（第 {entry.step + 1} 句）")
+            else:
+                entry.started = True
+                self.stats["scripts"] += 1
+            image_path = self.resolve_image(entry.idx)
+            actions = [partial(ui, self.set_title, entry.title),   # 更新標題
+                       partial(ui, self.set_image, image_path)]    # ✅ 根據第幾篇切圖片
+            nxt = self._peek()
+            if nxt is not None:
+                actions.append(partial(self._prefetch_image, nxt.idx))
+            return actions
+
+        if cur.waiting:
+            return None
+        if cur.step >= len(cur.script):     # 本腳本播畢 → 換下一份
+            self._current = None
+            return []
+        nxt = self._peek()
+        if nxt is not None and nxt.priority < cur.priority:
+            # 句子之間被更高優先的腳本插播：放回同一級的最前面
+            print(f"⏸️ {nxt.title!r} 插播，暫停 {cur.title!r}")
+            self._queues[cur.priority].appendleft(cur)
+            self._current = None
+            self.stats["preempted"] += 1
+            return []
+
+        text, wav = cur.script[cur.step]
+        if cur.step == 0:
+            self.stats["first_subtitle_latency"] = self.clock() - cur.enqueued
+        self.stats["steps"] += 1
+        if not wav:
+            cur.step += 1
+            return [partial(self._show, text, self._token)]          # 更新字幕
+
+        cur.waiting = True
+        self._token += 1
+        actions = [partial(self._play, text, wav, self._token)]     # 播音檔，字幕跟著播放位置分段
+        # 這句播放的同時先解碼後面幾句（跨到下一份腳本）
+        actions.append(partial(self._prefetch, self._lookahead(cur)))
+        return actions
+
+    def _peek(self) -> Optional[_Playback]:
+        """（持有 _lock）下一個要播的腳本（不檢查 deadline）。"""
+        for p in sorted(self._queues):
+            if self._queues[p]:
+                return self._queues[p][0]
+        return None
+
+    def _pop(self) -> Optional[_Playback]:
+        """（持有 _lock）取出下一個要播的腳本，過期的直接丟掉。"""
+        now = self.clock()
+        for p in sorted(self._queues):
+            q = self._queues[p]
+            while q:
+                entry = q.popleft()
+                if entry.deadline is not None and now > entry.deadline:
+                    self.stats["expired"] += 1
+                    print(f"⌛ 過期不播：{entry.title!r}")
+                    continue
+                return entry
+        return None
+
+    def _lookahead(self, cur: _Playback) -> List[Step]:
+        """（持有 _lock）依播放順序，目前這句之後的 prefetch_steps 個有音檔的段落。"""
+        steps: List[Step] = []
+        for script, start in self._upcoming(cur):
+            for step in itertools.islice(script, start, None):
+                if len(steps) >= self.prefetch_steps:
+                    return steps
+                if step[1]:
+                    steps.append(step)
+        return steps
+
+    def _upcoming(self, cur: _Playback):
+        """（持有 _lock）依播放順序產生 (腳本, 起始句)；逐一產生，佇列很長時也只看到需要的部分。"""
+        for p in sorted(self._queues):
+            if p == cur.priority:
+                yield cur.script, cur.step + 1      # 同級以下排在目前腳本剩下的句子後面
+            for entry in self._queues[p]:
+                yield entry.script, entry.step
 
-        self.busy = True
-        title, script , idx= self.queue.pop(0)
-        self.set_title(title)        # 更新標題
+    def _on_audio_done(self, token: int) -> None:
+        with self._lock:
+            cur = self._current
+            if token != self._token or cur is None:
+                return                  # 已被 clear_queue 取消
+            cur.waiting = False
+            cur.step += 1
+        self._pump()
 
-        image_path = f"images/news{idx}_image.jpg"
-        print(f"第幾張圖片{image_path}")
-        self.set_image(image_path)  # ✅ 根據第幾篇切圖片
+    def _prefetch(self, steps: List[Step], extend: bool = False) -> None:
+        """
+        依序背景解碼並先算好字幕時間軸，總量超過 prefetch_bytes 就停；上一個窗口已送過的不重送。
+        extend=True 時併入目前的窗口（播放中新排進的腳本）。
+        """
+        budget = self.prefetch_bytes
+        window = []
+        for text, wav in steps:
+            budget -= self.audio.estimate_bytes(wav)
+            if budget < 0:
+                break
+            window.append((text, wav))
+        with self._prefetch_lock:
+            fresh = [step for step in window if step[1] not in self._prefetched]
+            wavs = [wav for _, wav in window]
+            self._prefetched = self._prefetched.union(wavs) if extend else frozenset(wavs)
+        for text, wav in fresh:
+            self.audio.preload(wav)
+            self.timer.cues(text, wav)
 
-        self._play_step(script, 0)   # 從第一句開始
+    def _current_token(self, token: int) -> bool:
+        with self._lock:
+            return token == self._token
 
-    def _play_step(self, script: Script, idx: int) -> None:
-        if self.stop_flag:
-            print("⛔ 中斷目前腳本播放")
-            self.stop_flag = False  # reset
-            self.busy = False
-            # self.set_text("")
-            # self.set_title("")
+    def _play(self, text: str, wav: str, token: int) -> None:
+        """
+        動作在鎖外執行，期間可能已被 clear_queue 取消；取消後就不再送出音檔。
+        每段字幕（含第一段）都是音檔播到 cue.start 時才顯示。
+        讀檔 / 解碼在 _output_lock 外進行，鎖只包住確認 token 與送出；
+        音檔讀不到時整句字幕直接顯示，接著播下一句。
+        """
+        if not self._current_token(token):
             return
-        """遞迴播放腳本中的每一段，結束後自動切下份腳本。"""
-        if idx >= len(script):       # 本腳本播畢 → 換下一份
-            self._next_script()
+        clip = self.audio.load(wav)
+        if clip is None:
+            self._show(text, token)
+            self._on_audio_done(token)
             return
+        cues: List[Cue] = self.timer.cues(text, wav)
+        marks = [(cue.start, partial(self._show_cue, token, cue.text)) for cue in cues]
+        with self._output_lock:
+            if self._current_token(token):
+                self.audio.play(clip, partial(self._on_audio_done, token), marks)
 
-        text, wav = script[idx]
-        self.set_text(text)          # 更新字幕
+    def _show(self, text: str, token: int) -> None:
+        """沒有音檔的句子：整句直接顯示。"""
+        self._show_cue(token, text)
 
-        def _after() -> None:
-            self._play_step(script, idx + 1)
+    def _show_cue(self, token: int, text: str) -> None:
+        """換句或取消後（token 變了）不再顯示。"""
+        with self._output_lock:
+            if self._current_token(token):
+                self.dispatch(self.set_text, text)
 
-        if wav:
-            audio_vac.play_wav_to_device(wav, self.device_id, on_done=_after)
-        else:
-            _after()
+    def _prefetch_image(self, idx: int) -> None:
+        if self.prefetch_image:
+            self.prefetch_image(self.resolve_image(idx))
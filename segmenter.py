@@ -0,0 +1,72 @@
+# segmenter.py
+"""
+新聞內文分句 + 依 TTS 長度合併。
+
+- split_fragments：單次 regex 掃描，切在 。！？ 與 ，,；; 之後，
+  緊接的收尾引號 / 括號（。」、！」、？』…）併入前一段；換行視為段落結尾。
+- merge_fragments：把過短的片段合併到 max_chars 以內，減少 TTS 呼叫與字幕換頁。
+"""
+import re
+from typing import List, Tuple
+
+HARD_ENDS = "。！？!?"          # 句子結尾
+SOFT_ENDS = "，,；;"            # 子句結尾
+CLOSERS = "」』”’）)》〉"        # 跟在標點後面的收尾符號
+
+MAX_CHARS = 40                  # 合併後每段最多字數（約字幕兩行）
+MIN_CHARS = 8                   # 句子短於此數時，繼續與下一句合併
+
+# 片段結尾的層級
+CLAUSE, SENTENCE, PARAGRAPH = 0, 1, 2
+
+_FRAGMENT_RE = re.compile(
+    rf"[^{HARD_ENDS}{SOFT_ENDS}\n]+(?:[{HARD_ENDS}{SOFT_ENDS}]+[{CLOSERS}]*)?"
+    rf"|[{HARD_ENDS}{SOFT_ENDS}]+[{CLOSERS}]*"
+)
+_PARAGRAPH_END_RE = re.compile(r"[ \t\u3000]*(?:\n|$)")
+
+
+def split_fragments(text: str) -> List[Tuple[str, int]]:
+    """回傳 [(片段, 結尾層級)]，層級為 CLAUSE / SENTENCE / PARAGRAPH；空白片段會被略過。"""
+    fragments = []
+    for m in _FRAGMENT_RE.finditer(text):
+        frag = m.group().strip()
+        if not frag:
+            continue
+        stripped = frag.rstrip(CLOSERS)
+        if _PARAGRAPH_END_RE.match(text, m.end()):
+            level = PARAGRAPH
+        elif stripped and stripped[-1] in SOFT_ENDS:
+            level = CLAUSE
+        else:
+            level = SENTENCE
+        fragments.append((frag, level))
+    return fragments
+
+
+def merge_fragments(fragments: List[Tuple[str, int]], max_chars: int = MAX_CHARS,
+                    min_chars: int = MIN_CHARS) -> List[str]:
+    """
+    依序合併片段：子句一律接到同一段，直到超過 max_chars；
+    句子結尾只有在目前這段還短於 min_chars 時才繼續合併；段落結尾一定斷開。
+    單一片段本身超過 max_chars 時保持原樣。
+    """
+    chunks = []
+    current = ""
+    current_level = CLAUSE
+    for frag, level in fragments:
+        if current and (len(current) + len(frag) > max_chars
+                        or current_level == PARAGRAPH
+                        or (current_level == SENTENCE and len(current) >= min_chars)):
+            chunks.append(current)
+            current = ""
+        current += frag
+        current_level = level
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def segment(text: str, max_chars: int = MAX_CHARS, min_chars: int = MIN_CHARS) -> List[str]:
+    """分句並合併成適合 TTS / 字幕的段落。"""
+    return merge_fragments(split_fragments(text), max_chars, min_chars)
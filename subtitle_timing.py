@@ -0,0 +1,143 @@
+# subtitle_timing.py
+"""
+字幕時間軸：把一句字幕切成放得進 SubtitleWindow 的小段，並對上音檔的時間。
+
+- 音檔長度只讀 WAV 標頭（wavinfo），不解碼
+- 預設依字數比例分配時間；PCM 已在 audio_vac.pcm_cache 時，改用能量包絡
+  （只把有聲音的部分分給字，句中停頓不佔字幕時間）
+- 結果依 (音檔, mtime, size, 字幕) 快取；排程器預載時先算好，播放時直接取用
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+from segmenter import CLOSERS, HARD_ENDS, SOFT_ENDS, merge_fragments, split_fragments
+from wavinfo import read_wav_header
+
+SUBTITLE_MAX_CHARS = 28         # SubtitleWindow 寬 1000px、32px 字，一行約 28~30 字
+PUNCT_WEIGHT = 0.5              # 標點唸起來多半是停頓，佔的時間比一般字少
+ENVELOPE_FRAME = 0.01           # 能量包絡每格 10 ms
+ENVELOPE_THRESHOLD = 0.1        # 低於最大 RMS 的這個比例視為靜音
+TIMELINE_CACHE_SIZE = 512
+
+_PUNCT = set(HARD_ENDS + SOFT_ENDS + CLOSERS + "、：:「『“‘（(《〈…—")
+
+
+class Cue(NamedTuple):
+    start: float        # 相對音檔開頭的秒數
+    end: float
+    text: str
+
+
+def chunk_text(text: str, max_chars: int = SUBTITLE_MAX_CHARS) -> List[str]:
+    """依標點切成每段不超過 max_chars 的字幕；沒有標點的長句平均切開。"""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    chunks = []
+    for chunk in merge_fragments(split_fragments(text), max_chars, min_chars=max_chars):
+        if len(chunk) <= max_chars:
+            chunks.append(chunk)
+            continue
+        parts = -(-len(chunk) // max_chars)
+        size = -(-len(chunk) // parts)
+        chunks.extend(chunk[i:i + size] for i in range(0, len(chunk), size))
+    return chunks
+
+
+def _weight(chunk: str) -> float:
+    return sum(PUNCT_WEIGHT if ch in _PUNCT else 1.0 for ch in chunk if not ch.isspace()) or 1.0
+
+
+def envelope(data, samplerate: int, frame: float = ENVELOPE_FRAME) -> np.ndarray:
+    """每 frame 秒一格的 RMS（多聲道先取平均）。"""
+    mono = data.mean(axis=1) if data.ndim == 2 else data
+    size = max(int(samplerate * frame), 1)
+    n = len(mono) // size
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    blocks = mono[:n * size].reshape(n, size)
+    return np.sqrt(np.mean(blocks * blocks, axis=1))
+
+
+def timeline(chunks: List[str], duration: float, env: Optional[np.ndarray] = None,
+             frame: float = ENVELOPE_FRAME) -> List[Cue]:
+    """
+    依字數權重把 duration 分給各段。有能量包絡時，權重對應的是「有聲音的時間」：
+    第 i 段從累積有聲比例達到前 i 段權重比例的那一格開始。
+    """
+    if not chunks:
+        return []
+    weights = np.array([_weight(c) for c in chunks], dtype=np.float64)
+    bounds = np.concatenate(([0.0], np.cumsum(weights) / weights.sum()))
+    starts = bounds[:-1] * duration
+    if env is not None and len(env):
+        voiced = env > env.max() * ENVELOPE_THRESHOLD
+        if voiced.any():
+            frames = np.flatnonzero(voiced)
+            before = np.arange(len(frames)) / len(frames)      # 每個有聲格之前已唸掉的比例
+            # 從「之前已唸掉的比例」達到前幾段權重的那個有聲格開始（停頓後的下一個音）
+            pick = np.minimum(np.searchsorted(before, bounds[:-1] - 1e-9, side="left"), len(frames) - 1)
+            starts = frames[pick] * frame
+            starts[0] = 0.0
+            starts = np.minimum(np.maximum.accumulate(starts), duration)
+    ends = np.append(starts[1:], duration)
+    return [Cue(float(s), float(e), c) for s, e, c in zip(starts, ends, chunks)]
+
+
+class SubtitleTimer:
+    """
+    算出 (字幕, 音檔) 的 Cue 列表並快取。
+    - pcm_lookup(path)：回傳已解碼的 (data, samplerate) 或 None，有的話用能量包絡
+    - 以字數比例算的結果在 PCM 之後可用時會重算一次
+    """
+
+    def __init__(self, pcm_lookup: Optional[Callable[[str], Optional[tuple]]] = None,
+                 max_chars: int = SUBTITLE_MAX_CHARS, cache_size: int = TIMELINE_CACHE_SIZE):
+        self.pcm_lookup = pcm_lookup
+        self.max_chars = max_chars
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()     # key → (用了包絡?, cues)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cues(self, text: str, wav: Optional[str]) -> List[Cue]:
+        """沒有音檔或讀不到標頭時，回傳整句一段、長度 0 的 Cue。"""
+        if not wav:
+            return [Cue(0.0, 0.0, text)]
+        chunks = chunk_text(text, self.max_chars) or [text]
+        try:
+            st = os.stat(wav)
+        except OSError:
+            return [Cue(0.0, 0.0, text)]
+        key = (os.path.abspath(wav), st.st_mtime_ns, st.st_size, text, self.max_chars)
+        pcm = self.pcm_lookup(wav) if self.pcm_lookup else None
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and (hit[0] or pcm is None):
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            self.misses += 1
+
+        try:
+            duration = read_wav_header(wav).duration
+        except (OSError, ValueError):
+            duration = 0.0
+        env = None
+        if pcm is not None:
+            data, samplerate = pcm
+            env = envelope(data, samplerate)
+            duration = duration or len(data) / samplerate
+        result = timeline(chunks, duration, env)
+
+        with self._lock:
+            self._cache[key] = (env is not None, result)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
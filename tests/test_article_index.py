@@ -0,0 +1,111 @@
+# tests/test_article_index.py
+"""ArticleIndex 的持久化，以及 _fetch_article 以 ETag / 內文指紋判斷文章是否變動。"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article_index import ArticleIndex, content_hash
+from news_parser import _fetch_article
+
+URL = "https://udn.com/news/story/1/1"
+
+
+def page(*paragraphs):
+    body = "".join(f"<p>{p}</p>" for p in paragraphs)
+    return ('<html><body><section class="article-content__subinfo"><time>2024-01-02 03:04</time></section>'
+            f'<div class="article-content__paragraph"><section class="article-content__editor">{body}'
+            '</section></div></body></html>')
+
+
+class Response:
+    def __init__(self, status_code=200, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class Session:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        return self.response
+
+
+def test_content_hash_changes_with_any_part():
+    base = content_hash("標題", "2024-01-02 03:04", "內文")
+    assert base == content_hash("標題", "2024-01-02 03:04", "內文")
+    assert base != content_hash("標題", "2024-01-02 03:05", "內文")
+    assert base != content_hash("標題", "2024-01-02 03:04", "內文。")
+    assert content_hash("ab", "", "c") != content_hash("a", "", "bc")      # 欄位之間有分隔
+
+
+def test_save_reload_and_prune(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = ArticleIndex(path)
+    index.update(URL, etag='"v1"', last_modified="Tue, 02 Jan 2024 03:04:00 GMT", hash="h1")
+    index.update("https://udn.com/gone", hash="h2")
+    index.prune([URL])
+    index.save()
+
+    reloaded = ArticleIndex(path)
+    assert reloaded.get("https://udn.com/gone") is None
+    assert reloaded.get(URL)["hash"] == "h1"
+    assert reloaded.conditional_headers(URL) == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Tue, 02 Jan 2024 03:04:00 GMT"}
+    assert reloaded.conditional_headers("https://udn.com/other") == {}
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_corrupt_index_starts_empty(tmp_path):
+    path = tmp_path / "index.json"
+    path.write_text("{ not json", encoding="utf-8")
+    assert ArticleIndex(str(path)).get(URL) is None
+
+
+def test_get_returns_a_copy(tmp_path):
+    index = ArticleIndex(str(tmp_path / "index.json"))
+    index.update(URL, hash="h1")
+    index.get(URL)["hash"] = "changed"
+    assert index.get(URL)["hash"] == "h1"
+
+
+def _index_with(tmp_path, text, **fields):
+    index = ArticleIndex(str(tmp_path / "index.json"))
+    index.update(URL, news_idx=1, title="標題", time="2024-01-02 03:04", content={"1": "舊的句子。"},
+                 hash=content_hash("標題", "2024-01-02 03:04", text), **fields)
+    return index
+
+
+def test_not_modified_is_carried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = _index_with(tmp_path, "第一段。", etag='"v1"')
+    session = Session(Response(304))
+    news = _fetch_article(session, 1, "標題", URL, index=index, backend="bs4")
+    assert session.requests == [{"If-None-Match": '"v1"'}]
+    assert news["carried"] and news["content"] == {"1": "舊的句子。"}
+
+
+def test_same_hash_is_carried_with_new_etag(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = _index_with(tmp_path, "第一段。", etag='"v1"')
+    session = Session(Response(200, page("第一段。"), {"ETag": '"v2"'}))
+    news = _fetch_article(session, 1, "標題", URL, index=index, backend="bs4")
+    assert news["carried"]
+    assert news["etag"] == '"v2"'
+
+
+def test_changed_content_is_reparsed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = _index_with(tmp_path, "第一段。")
+    session = Session(Response(200, page("第一段。", "新增的第二段。")))
+    news = _fetch_article(session, 1, "標題", URL, index=index, backend="bs4")
+    assert not news["carried"]
+    assert news["verbatim"] == ["第一段。", "新增的第二段。"]
+    assert news["hash"] == content_hash("標題", "2024-01-02 03:04", "第一段。\n新增的第二段。")
@@ -0,0 +1,88 @@
+# tests/test_audio_vac.py
+"""
+MixerChannel：marks 依實際送出的位置觸發，duck 暫停時跟著停。
+SoundDeviceSink：串流 start() 失敗不算開啟，之後退避、不每段都重新列舉裝置。
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_vac
+from audio_vac import MixerChannel, SoundDeviceSink, _Clip
+
+
+def render(ch, frames, pause=False, step=0.5):
+    finished, started, reached = [], [], []
+    ch.render(frames, 0.0 if pause else 1.0, step, pause, finished, started, reached)
+    return reached, finished
+
+
+def test_marks_wait_while_paused():
+    ch = MixerChannel("news")
+    fired = []
+    marks = [(0, lambda: fired.append("a")), (10, lambda: fired.append("b")), (25, lambda: fired.append("c"))]
+    ch.clips.append(_Clip(np.ones((30, 2), dtype=np.float32), None, "clip", marks=marks))
+
+    for fn in render(ch, 8)[0]:
+        fn()
+    assert fired == ["a"]
+
+    reached, _ = render(ch, 8, pause=True)      # 淡出時越過 frame 10，但暫停會退回原位置
+    assert reached == [] and ch.paused and ch.clips[0].pos == 8
+    assert render(ch, 8, pause=True)[0] == []
+
+    for fn in render(ch, 8)[0]:                 # 恢復：8 → 16
+        fn()
+    assert fired == ["a", "b"]
+    reached, finished = render(ch, 16)
+    for fn in reached:
+        fn()
+    assert fired == ["a", "b", "c"] and finished
+
+
+class _Stream:
+    def __init__(self, fail):
+        self.fail = fail
+        self.closed = False
+
+    def start(self):
+        if self.fail:
+            raise OSError("device unavailable")
+
+    def close(self):
+        self.closed = True
+
+
+def test_sound_device_sink_start_failure_backs_off(monkeypatch):
+    streams, refreshes = [], []
+    fail = [True]
+
+    def output_stream(**kwargs):
+        streams.append(_Stream(fail[0]))
+        return streams[-1]
+
+    now = [100.0]
+    monkeypatch.setattr(audio_vac, "sd", type("sd", (), {"OutputStream": staticmethod(output_stream)}))
+    monkeypatch.setattr(audio_vac.devices, "resolve", lambda device: 0)
+    monkeypatch.setattr(audio_vac.devices, "refresh", lambda rescan=False: refreshes.append(rescan))
+    monkeypatch.setattr(audio_vac.time, "monotonic", lambda: now[0])
+
+    sink = SoundDeviceSink("VAC")
+    with pytest.raises(OSError):
+        sink.open(48000, 2, None, idle=lambda: True)
+    assert not sink.is_open
+    assert len(streams) == 2 and all(s.closed for s in streams)
+    assert len(refreshes) == 1
+
+    with pytest.raises(RuntimeError):           # 退避中：不開串流、不重新列舉
+        sink.open(48000, 2, None, idle=lambda: True)
+    assert len(streams) == 2 and len(refreshes) == 1
+
+    now[0] += audio_vac.OPEN_RETRY_MIN
+    fail[0] = False
+    sink.open(48000, 2, None, idle=lambda: True)
+    assert sink.is_open and len(streams) == 3
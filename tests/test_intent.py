@@ -0,0 +1,60 @@
+# tests/test_intent.py
+"""intent：Aho-Corasick 比對、最左最長、英文字詞邊界與信心值。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent import FAST_PATH_CONFIDENCE, IntentClassifier, KeywordAutomaton, intents
+
+
+@pytest.mark.parametrize("message, label, confidence", [
+    ("你好", "greet", 1.0),
+    ("主播你好", "greet", 1.0),           # 關鍵字外兩個字以內仍算完全命中
+    ("停！", "stop", 1.0),
+    ("新聞", "news", 1.0),
+    ("不同意", "shake", 1.0),             # 最長的「不同意」，不是 nod 的「同意」
+    ("好耶", "happy", 1.0),               # 不是 nod 的「好」
+    ("HELLO", "greet", 1.0),              # 不分大小寫
+    ("what can you do", "introduce", 1.0),
+    ("I know", "none", 0.0),              # no 卡在 know 裡面
+    ("this", "none", 0.0),                # hi 卡在 this 裡面
+    ("", "none", 0.0),
+    ("   ", "none", 0.0),
+])
+def test_classify(message, label, confidence):
+    assert intents.classify(message) == (label, confidence)
+
+
+def test_partial_coverage_lowers_confidence():
+    label, confidence = intents.classify("age is 20")
+    assert label == "age"
+    assert 0 < confidence < 1
+
+
+@pytest.mark.parametrize("message", [
+    "不要停",                             # shake + stop：不能當成 stop 直接走快速路徑
+    "今天天氣很好我很開心想聽你唱歌",
+])
+def test_ambiguous_messages_go_to_llm(message):
+    label, confidence = intents.classify(message)
+    assert confidence < FAST_PATH_CONFIDENCE
+    assert label != "stop"
+
+
+def test_spans_leftmost_longest_without_overlap():
+    assert intents.spans("不同意你好") == [(0, 3, "shake"), (3, 5, "greet")]
+    assert intents.spans("不要停") == [(0, 2, "shake"), (2, 3, "stop")]
+
+
+def test_automaton_reports_overlapping_matches():
+    automaton = KeywordAutomaton({"a": ("he", "she", "hers"), "b": ("his",)})
+    assert sorted(automaton.matches("ushers")) == [(1, 4, "a"), (2, 4, "a"), (2, 6, "a")]
+
+
+def test_tie_breaks_by_keyword_order():
+    classifier = IntentClassifier({"first": ("甲",), "second": ("乙",)}, filler_chars=0)
+    assert classifier.classify("甲乙") == ("first", 0.5)
+    assert classifier.classify("乙甲") == ("first", 0.5)
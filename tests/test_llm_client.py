@@ -0,0 +1,73 @@
+# tests/test_llm_client.py
+"""MicroBatcher：批次分類失敗或結果數不符時，每個呼叫者仍然拿到結果。"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import MicroBatcher, parse_batch
+
+
+class Client:
+    def __init__(self, batch):
+        self.batch = batch
+        self.stats = {"errors": 0}
+
+    async def classify_batch(self, messages):
+        return self.batch(messages)
+
+
+def run_batch(batch, messages):
+    async def main():
+        batcher = MicroBatcher(Client(batch), window=0.01, max_batch=8)
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.classify(m) for m in messages)), 1.0)
+        await batcher.close()
+        return results, batcher
+    return asyncio.run(main())
+
+
+def fail(messages):
+    raise RuntimeError("boom")
+
+
+def test_batch_error_falls_back():
+    results, batcher = run_batch(fail, ["a", "b", "c"])
+    assert results == [("none", "")] * 3
+    assert batcher.client.stats["errors"] == 1
+
+
+@pytest.mark.parametrize("batch", [
+    lambda messages: [("greet", "hi")],                         # 少了
+    lambda messages: [("greet", "hi")] * (len(messages) + 2),   # 多了
+])
+def test_batch_size_mismatch_answers_everyone(batch):
+    results, _ = run_batch(batch, ["a", "b", "c"])
+    assert len(results) == 3
+    assert results[0] == ("greet", "hi")
+
+
+def test_cancelled_batch_releases_callers():
+    async def main():
+        started = asyncio.Event()
+
+        class Slow(Client):
+            async def classify_batch(self, messages):
+                started.set()
+                await asyncio.sleep(10)
+
+        batcher = MicroBatcher(Slow(None), window=0.01, max_batch=8)
+        pending = [asyncio.ensure_future(batcher.classify(m)) for m in ("a", "b")]
+        await started.wait()
+        for task in list(batcher._tasks):
+            task.cancel()
+        return await asyncio.wait_for(asyncio.gather(*pending), 1.0)
+
+    assert asyncio.run(main()) == [("none", "")] * 2
+
+
+def test_parse_batch_by_id_and_leftovers():
+    decisions = [{"id": 1, "label": "greet", "reply": "嗨"}, {"label": "song", "reply": "唱"}]
+    assert parse_batch(decisions, 3) == [("song", "唱"), ("greet", "嗨"), None]
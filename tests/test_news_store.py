@@ -0,0 +1,102 @@
+# tests/test_news_store.py
+"""NewsStore：逐行附加 / 增量讀取、半行、換新一輪與檔案被替換；NewsPool 快照。"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from news_store import NewsPool, NewsStore
+
+
+def entry(idx):
+    return {"news_idx": idx, "title": f"新聞 {idx}", "content": {"1": "句子。"}}
+
+
+def test_missing_file(tmp_path):
+    assert NewsStore(str(tmp_path / "news.jsonl")).poll() == (False, [])
+
+
+def test_append_and_poll_incrementally(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    writer, reader = NewsStore(path), NewsStore(path)
+    writer.begin_refresh()
+    writer.append(entry(1))
+    assert reader.poll() == (False, [entry(1)])
+    assert reader.poll() == (False, [])
+    writer.append(entry(2))
+    writer.append(entry(3))
+    assert reader.poll() == (False, [entry(2), entry(3)])
+
+
+def test_partial_line_waits_for_newline(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    reader = NewsStore(path)
+    line = json.dumps(entry(1), ensure_ascii=False).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(line[:10])
+    assert reader.poll() == (False, [])
+    with open(path, "ab") as f:
+        f.write(line[10:] + b"\n")
+    assert reader.poll() == (False, [entry(1)])
+
+
+def test_bad_line_is_skipped(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{broken\n" + json.dumps(entry(2)) + "\n")
+    assert NewsStore(path).poll() == (False, [entry(2)])
+
+
+def test_begin_refresh_resets_reader(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    writer, reader = NewsStore(path), NewsStore(path)
+    writer.append(entry(1))
+    writer.append(entry(2))
+    assert reader.poll() == (False, [entry(1), entry(2)])
+    writer.begin_refresh()
+    assert reader.poll() == (True, [])
+    writer.append(entry(3))
+    assert reader.poll() == (False, [entry(3)])
+
+
+def test_file_replaced_underneath_reader(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    writer, reader = NewsStore(path), NewsStore(path)
+    writer.append(entry(1))
+    assert reader.poll() == (False, [entry(1)])
+
+    tmp = str(tmp_path / "other.jsonl")             # 另一個程式整份換掉（比原本還長）
+    other = NewsStore(tmp)
+    for idx in (7, 8, 9):
+        other.append(entry(idx))
+    os.replace(tmp, path)
+    assert reader.poll() == (True, [entry(7), entry(8), entry(9)])
+
+
+def test_truncated_in_place_rereads_from_start(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    writer, reader = NewsStore(path), NewsStore(path)
+    writer.append(entry(1))
+    writer.append(entry(2))
+    reader.poll()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(entry(5)) + "\n")
+    assert reader.poll() == (True, [entry(5)])
+
+
+def test_load_reads_everything_again(tmp_path):
+    path = str(tmp_path / "news.jsonl")
+    store = NewsStore(path)
+    store.append(entry(1))
+    store.append(entry(2))
+    store.poll()
+    assert store.load() == [entry(1), entry(2)]
+
+
+def test_news_pool_snapshot_is_stable():
+    pool = NewsPool([("a", [], 1)])
+    snapshot = pool.snapshot()
+    pool.replace([("b", [], 2), ("c", [], 3)])
+    assert snapshot == (("a", [], 1),)
+    assert len(pool) == 2 and pool.snapshot()[0][0] == "b"
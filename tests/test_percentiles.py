@@ -0,0 +1,36 @@
+# tests/test_percentiles.py
+"""percentile：nearest-rank。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from percentiles import percentile
+
+
+@pytest.mark.parametrize("n, q, expected", [
+    (20, 95, 18),           # 19/20 = 95%，不是最大值
+    (6, 50, 2),
+    (10, 90, 8),
+    (100, 7, 6),            # 0.07 * 100 的浮點誤差不會多進一位
+    (100, 99, 98),
+    (1, 50, 0),
+    (5, 100, 4),
+    (5, 0, 0),
+])
+def test_nearest_rank(n, q, expected):
+    assert percentile(list(range(n)), q) == expected
+
+
+def test_matches_definition():
+    for n in range(1, 101):
+        values = list(range(n))
+        for q in (1, 25, 50, 90, 95, 99):
+            # 至少 q% 的值 <= 它的最小值
+            assert percentile(values, q) == next(i for i in values if (i + 1) * 100 >= q * n)
+
+
+def test_empty():
+    assert percentile([], 50) == 0.0
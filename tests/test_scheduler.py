@@ -0,0 +1,136 @@
+# tests/test_scheduler.py
+"""SubtitleScheduler：虛擬時鐘 + 假音訊，不需要音效卡與 Qt。"""
+import heapq
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Priority, SubtitleScheduler
+from subtitle_timing import Cue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __call__(self):
+        return self.now
+
+    def call_later(self, delay, fn):
+        heapq.heappush(self._heap, (self.now + delay, next(self._seq), fn))
+
+    def run(self, until=float("inf")):
+        while self._heap and self._heap[0][0] <= until:
+            when, _, fn = heapq.heappop(self._heap)
+            self.now = max(self.now, when)
+            fn()
+        if until != float("inf"):
+            self.now = max(self.now, until)
+
+
+class Audio:
+    """每個音檔播 1 秒，marks 依秒數呼叫；stop 立即移除、稍後回 on_done，還沒到的 marks 不再呼叫。"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.missing = set()
+        self.played = []
+        self.playing = {}
+        self._seq = itertools.count()
+
+    def load(self, wav):
+        return None if wav in self.missing else wav
+
+    def play(self, wav, on_done, marks=()):
+        handle = next(self._seq)
+        self.playing[handle] = on_done
+        self.played.append(wav)
+        for at, fn in marks:
+            self.clock.call_later(at, lambda fn=fn: handle in self.playing and fn())
+        self.clock.call_later(1.0, lambda: self.playing.pop(handle, None) and on_done())
+
+    def preload(self, wav):
+        pass
+
+    def estimate_bytes(self, wav):
+        return 0
+
+    def stop(self):
+        flushed, self.playing = list(self.playing.values()), {}
+        for on_done in flushed:
+            self.clock.call_later(0.0, on_done)
+
+
+class Timer:
+    def cues(self, text, wav):
+        return [Cue(0.0, 0.0, text)]
+
+
+def make_scheduler():
+    clock = Clock()
+    audio = Audio(clock)
+    sched = SubtitleScheduler(
+        device_id=None, set_text=lambda t: None, set_title=lambda t: None, set_image=lambda p: None,
+        dispatch=lambda fn, arg: fn(arg), audio=audio, clock=clock, timer=Timer(),
+    )
+    return sched, clock, audio
+
+
+def script(name, n=3):
+    return [(f"{name} {i}", f"{name}_{i}.wav") for i in range(n)]
+
+
+def test_clear_one_priority_keeps_others_playing():
+    sched, clock, audio = make_scheduler()
+    sched.enqueue("chat", script("chat"), 0, priority=Priority.CHAT)
+    sched.enqueue("news", script("news"), 1, priority=Priority.NEWS)
+    sched.enqueue("breaking", script("breaking"), 2, priority=Priority.BREAKING)
+    clock.run(until=0.5)                    # 正在播 chat 的第一句
+    assert audio.played == ["chat_0.wav"]
+
+    sched.clear_queue(priority=Priority.CHAT)
+    clock.run()
+
+    assert audio.played == ["chat_0.wav"] + [f"breaking_{i}.wav" for i in range(3)] \
+        + [f"news_{i}.wav" for i in range(3)]
+    assert not sched.busy
+
+
+def test_clear_all_stops_everything():
+    sched, clock, audio = make_scheduler()
+    sched.enqueue("news", script("news"), 0)
+    sched.enqueue("chat", script("chat"), 1, priority=Priority.CHAT)
+    clock.run(until=0.5)
+    sched.clear_queue()
+    clock.run()
+    assert audio.played == ["news_0.wav"]
+    assert not sched.busy
+
+
+def test_cues_follow_audio_position():
+    sched, clock, audio = make_scheduler()
+    shown = []
+    sched.set_text = lambda t: shown.append((clock.now, t))
+    sched.timer.cues = lambda text, wav: [Cue(0.0, 0.5, f"{text} a"), Cue(0.5, 1.0, f"{text} b")]
+    sched.enqueue("news", script("news", 2), 0)
+    clock.run(until=1.2)
+    sched.clear_queue()
+    clock.run()
+    # 第二句播到 0.2 秒就被清掉，它的第二段不會出現
+    assert shown == [(0.0, "news 0 a"), (0.5, "news 0 b"), (1.0, "news 1 a")]
+
+
+def test_missing_wav_still_shows_text():
+    sched, clock, audio = make_scheduler()
+    shown = []
+    sched.set_text = lambda t: shown.append(t)
+    audio.missing.add("news_1.wav")
+    sched.enqueue("news", script("news"), 0)
+    clock.run()
+    assert audio.played == ["news_0.wav", "news_2.wav"]
+    assert [t for t in shown if t] == ["news 0", "news 1", "news 2"]
+    assert not sched.busy
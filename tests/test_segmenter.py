@@ -0,0 +1,63 @@
+# tests/test_segmenter.py
+"""segmenter：切分片段的層級與合併的長度限制。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import CLAUSE, PARAGRAPH, SENTENCE, merge_fragments, segment, split_fragments
+
+
+@pytest.mark.parametrize("text", ["", "   ", " \n　\n "])
+def test_empty_input(text):
+    assert split_fragments(text) == []
+    assert segment(text) == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("一，二；三。", [("一，", CLAUSE), ("二；", CLAUSE), ("三。", PARAGRAPH)]),
+    ("好！真的？對。", [("好！", SENTENCE), ("真的？", SENTENCE), ("對。", PARAGRAPH)]),
+    ("Hi! OK? 好", [("Hi!", SENTENCE), ("OK?", SENTENCE), ("好", PARAGRAPH)]),      # ASCII 標點
+    ("a,b;c", [("a,", CLAUSE), ("b;", CLAUSE), ("c", PARAGRAPH)]),
+    ("他說：「好。」然後走了！", [("他說：「好。」", SENTENCE), ("然後走了！", PARAGRAPH)]),  # 收尾引號併入
+    ("真的嗎？！」對", [("真的嗎？！」", SENTENCE), ("對", PARAGRAPH)]),                  # 連續標點
+    ("第一段\n第二段。", [("第一段", PARAGRAPH), ("第二段。", PARAGRAPH)]),
+    ("第一段。  \n第二段", [("第一段。", PARAGRAPH), ("第二段", PARAGRAPH)]),          # 換行前的空白
+])
+def test_split_levels(text, expected):
+    assert split_fragments(text) == expected
+
+
+def test_short_sentences_merge_until_min_chars():
+    fragments = [("一二三。", SENTENCE), ("四五六七八九。", SENTENCE), ("十。", SENTENCE)]
+    assert merge_fragments(fragments, max_chars=40, min_chars=8) == ["一二三。四五六七八九。", "十。"]
+
+
+def test_sentence_at_min_chars_breaks():
+    fragments = [("一二三四五六七。", SENTENCE), ("八。", SENTENCE)]
+    assert merge_fragments(fragments, max_chars=40, min_chars=8) == ["一二三四五六七。", "八。"]
+
+
+def test_clauses_merge_up_to_max_chars():
+    fragments = [("一二三，", CLAUSE), ("四五六，", CLAUSE), ("七八九。", SENTENCE)]
+    assert merge_fragments(fragments, max_chars=8, min_chars=8) == ["一二三，四五六，", "七八九。"]
+    assert merge_fragments(fragments, max_chars=12, min_chars=8) == ["一二三，四五六，七八九。"]
+
+
+def test_paragraph_always_breaks():
+    fragments = [("短", PARAGRAPH), ("也短", PARAGRAPH)]
+    assert merge_fragments(fragments, max_chars=40, min_chars=8) == ["短", "也短"]
+
+
+def test_long_fragment_kept_whole():
+    long = "甲" * 50 + "。"
+    assert segment("開頭，" + long) == ["開頭，", long]
+
+
+def test_segment_keeps_all_text():
+    text = "記者今天報導，颱風將在明天登陸。民眾請注意安全！\n第二段：「出門請帶傘。」謝謝"
+    chunks = segment(text, max_chars=20, min_chars=8)
+    assert "".join(chunks) == text.replace("\n", "")
+    assert all(len(c) <= 20 for c in chunks)
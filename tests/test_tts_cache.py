@@ -0,0 +1,95 @@
+# tests/test_tts_cache.py
+"""TTSCache：命中 / 未命中、LRU 淘汰、重新載入後的順序、hardlink 失敗改用複製。"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_cache
+from tts_cache import TTSCache, cache_key
+
+
+def make_wav(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_cache_key_depends_on_all_parts():
+    base = cache_key("你好", "taiwanese", "M12")
+    assert base == cache_key("你好", "TAIWANESE", "M12")
+    assert len({base, cache_key("你好", "hakka", "M12"), cache_key("你好", "taiwanese", "M60"),
+                cache_key("你好！", "taiwanese", "M12")}) == 4
+
+
+def test_store_and_materialize(tmp_path):
+    cache = TTSCache(root=str(tmp_path / "cache"))
+    out = tmp_path / "out.wav"
+    assert not cache.materialize("k1", str(out))
+    cache.store("k1", make_wav(tmp_path / "src.wav", b"one"))
+    assert cache.materialize("k1", str(out))
+    assert read(out) == b"one"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 3}
+
+
+def test_overwriting_output_does_not_touch_other_entries(tmp_path):
+    cache = TTSCache(root=str(tmp_path / "cache"))
+    cache.store("a", make_wav(tmp_path / "a.wav", b"aaa"))
+    cache.store("b", make_wav(tmp_path / "b.wav", b"bbb"))
+    out = str(tmp_path / "out.wav")
+    assert cache.materialize("a", out)
+    assert cache.materialize("b", out)          # out 原本是 a 的 hardlink
+    assert read(out) == b"bbb"
+    assert read(cache.path_for("a")) == b"aaa"
+
+
+def test_lru_eviction_follows_use(tmp_path):
+    cache = TTSCache(root=str(tmp_path / "cache"), max_bytes=9)
+    for key in ("a", "b", "c"):
+        cache.store(key, make_wav(tmp_path / f"{key}.wav", key.encode() * 3))
+    assert cache.materialize("a", str(tmp_path / "out.wav"))     # a 變成最近使用
+    cache.store("d", make_wav(tmp_path / "d.wav", b"ddd"))
+    assert not os.path.exists(cache.path_for("b"))
+    assert all(os.path.exists(cache.path_for(k)) for k in ("a", "c", "d"))
+    assert cache.stats()["bytes"] == 9
+
+
+def test_reload_keeps_mtime_order(tmp_path):
+    root = str(tmp_path / "cache")
+    cache = TTSCache(root=root)
+    for key in ("a", "b", "c"):
+        cache.store(key, make_wav(tmp_path / f"{key}.wav", b"xxx"))
+    for n, key in enumerate(("b", "c", "a")):      # 上一輪的使用順序：b 最舊、a 最新
+        os.utime(cache.path_for(key), (1000 + n, 1000 + n))
+
+    reloaded = TTSCache(root=root, max_bytes=9)
+    assert reloaded.stats()["entries"] == 3 and reloaded.stats()["bytes"] == 9
+    reloaded.store("d", make_wav(tmp_path / "d.wav", b"ddd"))
+    assert not os.path.exists(reloaded.path_for("b"))
+    assert all(os.path.exists(reloaded.path_for(k)) for k in ("a", "c", "d"))
+
+
+def test_falls_back_to_copy_without_hardlinks(tmp_path, monkeypatch):
+    def no_link(src, dst):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(tts_cache.os, "link", no_link)
+    cache = TTSCache(root=str(tmp_path / "cache"))
+    cache.store("k", make_wav(tmp_path / "src.wav", b"data"))
+    out = tmp_path / "out.wav"
+    assert cache.materialize("k", str(out))
+    assert read(out) == b"data"
+    assert os.stat(out).st_ino != os.stat(cache.path_for("k")).st_ino
+
+
+def test_missing_cache_file_counts_as_miss(tmp_path):
+    cache = TTSCache(root=str(tmp_path / "cache"))
+    cache.store("k", make_wav(tmp_path / "src.wav", b"data"))
+    os.remove(cache.path_for("k"))
+    assert not cache.materialize("k", str(tmp_path / "out.wav"))
+    assert cache.stats() == {"hits": 0, "misses": 1, "entries": 0, "bytes": 0}
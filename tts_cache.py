@@ -0,0 +1,124 @@
+# tts_cache.py
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+CACHE_DIR = "tts_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024     # 512 MB
+
+
+def cache_key(text: str, language: str, model: str) -> str:
+    """(文字, 語言, 模型) 的內容位址。"""
+    h = hashlib.sha256()
+    for part in (text, language.lower(), model):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """優先用 hardlink（不佔額外空間），跨磁碟等失敗時改用複製。"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class TTSCache:
+    """
+    以內容位址存放 TTS 合成結果：tts_cache/ab/abcdef....wav
+    - 命中時以 hardlink / 複製產生輸出檔，不需連線
+    - 總大小超過 max_bytes 時依最近使用時間 (LRU) 淘汰
+    - 跨次執行的 LRU 順序以檔案 mtime 保存，命中時會更新 mtime
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()   # key → 檔案大小，舊 → 新
+        self._bytes = 0
+
+        os.makedirs(root, exist_ok=True)
+        found = []
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                if not name.endswith(".wav"):
+                    continue
+                st = os.stat(os.path.join(dirpath, name))
+                found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".wav")
+
+    def materialize(self, key: str, output_path: str) -> bool:
+        """命中時把快取檔放到 output_path 並回傳 True；未命中回傳 False。"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+        src = self.path_for(key)
+        try:
+            if os.path.exists(output_path):
+                os.remove(output_path)      # 不能直接覆寫：可能是另一個快取檔的 hardlink
+            _link_or_copy(src, output_path)
+            os.utime(src)
+            return True
+        except OSError as e:
+            print(f"TTS 快取讀取失敗 {key[:12]}：{e}")
+            with self._lock:
+                self._forget(key)
+                self.hits -= 1
+                self.misses += 1
+            return False
+
+    def store(self, key: str, source_path: str) -> None:
+        """把剛合成好的檔案收進快取，必要時淘汰最久未用的項目。"""
+        dst = self.path_for(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{threading.get_ident()}.tmp"
+        try:
+            _link_or_copy(source_path, tmp)
+            os.replace(tmp, dst)
+            size = os.path.getsize(dst)
+        except OSError as e:
+            print(f"TTS 快取寫入失敗 {key[:12]}：{e}")
+            return
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._bytes += size
+            self._evict()
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -1,13 +1,11 @@
 import asyncio
-import json
 import os
 import random
 import re
 import threading
 import openai
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
-import requests
 from PyQt6.QtCore import QTimer
 from dotenv import load_dotenv
 from twitchio.ext import commands
@@ -16,6 +14,9 @@ from playsound import playsound
 import audio_vac
 from audio_vac import play_wav_to_device, stop_playback
 from combine_audio import combine_audio_files, process_and_combine_audio
+from intent import FAST_PATH_CONFIDENCE, intents
+from llm_client import LLM_BATCH_MAX, LLM_BATCH_WINDOW, LLMClient, MicroBatcher, classify_sync
+from news_store import NewsPool
 from scheduler import SubtitleScheduler
 from voicevox_tts import generate_greeting_audio
 from vts_client import VTSClient
@@ -23,73 +24,12 @@ from vts_client import VTSClient
 openai.api_key = os.getenv("OPENROUTER_API_KEY")
 openai.api_base = "https://openrouter.ai/api/v1"
 
-def classify_message_sync(message: str) -> str:
-    prompt = f"""你是一位女性實況主播主要在成大台灣台直播，請根據觀眾說的話，做兩件事：
-
-1️⃣ 判斷一個最適合的「回應類型」標籤（只輸出一個標籤字串）  
-2️⃣ 用很生活化口語、像是老朋友打屁一般的口吻給出一句簡短回應（不要太長）
-
-標籤如下：
-- greet：打招呼
-- song：觀眾要聽你唱歌(注意你會的歌只有阿嘛的話一首)
-- age：問你幾歲(你24歲)
-- introduce：問你是誰 / 功能是什麼(你是日本來台灣留學的大學生，你叫阿芳)
-- stop：要你停止播報新聞
-- news：要求你播新聞
-- nod：肯定、同意、贊成、點頭
-- shake：否定、不同意、搖頭
-- happy：開心、讚嘆、喜歡、笑(如過那個人分享自己有趣的經驗和回憶或是他做到一件很棒的事情請開心)
-- confuse：好奇、沒聽過的(有人如果講任何學術的東西就請困惑)
-- despise：嘲諷、不屑、無語、鄙視、糗事(看到咖哩不拌的人請鄙視、不吃香菜也請鄙視)
-- none：當你覺得以上標籤都怎麼對到的時候
-
-觀眾說：「{message}」
-小心你的reply不要有特殊字元，不要用表情符號
-請用這個 JSON 格式回應（只需要這樣）：
-{{
-  "label": "<分類標籤>",
-  "reply": "<你想說的一句話>"
-}}"""
-
-    headers = {
-        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost",  # Optional for ranking
-        "X-Title": "VTuberBot",              # Optional for ranking
-    }
-
-    payload = {
-        "model": "mistralai/mistral-7b-instruct:free",
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
-    }
-
-    try:
-        res = requests.post("https://openrouter.ai/api/v1/chat/completions",
-                            headers=headers,
-                            data=json.dumps(payload))
-        res.raise_for_status()
-        result = res.json()
-        # label = result["choices"][0]["message"]["content"].strip().lower()
-        # print("🧠 分類結果:", label)
-        # return label
-        content = result["choices"][0]["message"]["content"]
-        print("🧠 原始回應：", content)
-
-        # 解析 AI 回傳的 JSON 字串
-        decision = json.loads(content)
-        label = decision.get("label", "none").strip().lower()
-        reply = decision.get("reply", "").strip()
-
-        return label, reply
-
-    except Exception as e:
-        print("❌ 分類失敗:", e)
-        return "none"
+def classify_message_sync(message: str) -> Tuple[str, str]:
+    """同步版本（會阻塞，只給非 async 的程式碼用）；失敗時回傳 ("none", "")。"""
+    return classify_sync(message)
 
 class Bot(commands.Bot):
-    def __init__(self,vts: VTSClient, sched: SubtitleScheduler,NewsPool: List[Tuple[str, List[Tuple[str, str | None] ],int ]],DEVICE_ID: int):
+    def __init__(self,vts: VTSClient, sched: SubtitleScheduler,NewsPool: NewsPool,DEVICE_ID: int | str):
 
         load_dotenv()
         twitch_token = os.environ.get('TWITCH_OAUTH_TOKEN')
@@ -113,13 +53,30 @@ class Bot(commands.Bot):
         self.news_timer = None  # 用於儲存 QTimer 實例
         self.is_playing_news = False  # 標誌新聞是否正在播放
         self.HOTKEY_POOL = [f"My Animation {i}" for i in range(1, 4)]
+        self.llm = LLMClient()
+        # 聊天室很熱鬧時把短時間內的訊息併成一個請求（LLM_BATCH_MAX=1 關閉）
+        self.classifier = MicroBatcher(
+            self.llm,
+            window=float(os.getenv("LLM_BATCH_WINDOW", LLM_BATCH_WINDOW)),
+            max_batch=int(os.getenv("LLM_BATCH_MAX", LLM_BATCH_MAX)),
+        )
+        # 本機關鍵字分類的信心達到這個值就不問 LLM（大於 1 = 全部問 LLM）
+        self.fast_path_confidence = float(os.getenv("LOCAL_INTENT_CONFIDENCE", FAST_PATH_CONFIDENCE))
+        self._user_turns: Dict[str, asyncio.Future] = {}     # 每位觀眾最後一則訊息處理完的 future
 
 
 
     async def event_ready(self):
         print(f'Logged in as | {self.nick}')
 
+    async def close(self):
+        await self.classifier.close()
+        await self.llm.close()
+        await super().close()
+
     async def event_message(self, message):
+        if message.echo:            # 自己送出的回覆
+            return
         print(f"{message.author.name}: {message.content}")
 
         # # 定義你想要偵測的問候語列表，不區分大小寫
@@ -262,8 +219,31 @@ class Bot(commands.Bot):
         # label = await llm_classify_message(message.content)
         # label = classify_message_sync(message.content)
 
-        label, reply = classify_message_sync(message.content)
-
+        # 分類立刻送出（不同訊息同時進行），回應則依同一位觀眾的訊息順序處理
+        user = message.author.name
+        label, confidence = intents.classify(message.content)
+        if confidence >= self.fast_path_confidence:
+            # 「你好」「停」「新聞」這類明確的訊息直接在本機判斷（沒有聊天室回覆）
+            print(f"⚡ 本機分類：{label}（信心 {confidence}）")
+            pending = asyncio.get_running_loop().create_future()
+            pending.set_result((label, ""))
+        else:
+            pending = asyncio.ensure_future(self.classifier.classify(message.content))
+        prev = self._user_turns.get(user)
+        turn = asyncio.get_running_loop().create_future()
+        self._user_turns[user] = turn
+        try:
+            if prev is not None:
+                await prev
+            label, reply = await pending
+            await self.react(message, label, reply)
+        finally:
+            turn.set_result(None)
+            if self._user_turns.get(user) is turn:
+                del self._user_turns[user]
+
+    async def react(self, message, label: str, reply: str):
+        """依分類結果回覆聊天室並觸發語音 / 動作。"""
         # 撥放語音（如果 AI 給了）
         if reply:
             # 在聊天室中以主播身分回覆訊息
@@ -272,25 +252,27 @@ class Bot(commands.Bot):
         if label == "greet":
             random_greet_id = random.randint(1, 6)
             random_name_id = random.randint(1, 3)
-            stop_playback()
+            # 互動走 reaction 聲道：新聞會淡出暫停，互動播完後從原位置接著播
+            stop_playback("reaction")
             await process_and_combine_audio(message.author.name, random_greet_id, random_name_id)
             play_wav_to_device(
                 f"combined_audio/combined_audio_{message.author.name}_{random_greet_id}_{random_name_id}.wav",
                 self.DEVICE_ID,
-                on_done=None
+                on_done=None,
+                channel="reaction"
             )
 
         elif label == "song":
-            stop_playback()
-            play_wav_to_device("interact_audio/song.wav", self.DEVICE_ID, on_done=None)
+            stop_playback("reaction")
+            play_wav_to_device("interact_audio/song.wav", self.DEVICE_ID, on_done=None, channel="reaction")
 
         elif label == "age":
-            stop_playback()
-            play_wav_to_device("interact_audio/age.wav", self.DEVICE_ID, on_done=None)
+            stop_playback("reaction")
+            play_wav_to_device("interact_audio/age.wav", self.DEVICE_ID, on_done=None, channel="reaction")
 
         elif label == "introduce":
-            stop_playback()
-            play_wav_to_device("interact_audio/introduce.wav", self.DEVICE_ID, on_done=None)
+            stop_playback("reaction")
+            play_wav_to_device("interact_audio/introduce.wav", self.DEVICE_ID, on_done=None, channel="reaction")
 
         elif label == "stop":
             if self.is_playing_news and self.news_timer:
@@ -303,7 +285,11 @@ class Bot(commands.Bot):
             self.is_playing_news = True
 
             def play_news():
-                title, script, idx = random.choice(self.NewsPool)
+                pool = self.NewsPool.snapshot()     # 更新中也不會在這之後被改掉
+                if not pool:     # 新聞還在更新中
+                    print("新聞池是空的，稍後再播")
+                    return
+                title, script, idx = random.choice(pool)
                 self.sched.enqueue(title, script, idx)
 
             self.news_timer.timeout.connect(play_news)
@@ -0,0 +1,62 @@
+# wavinfo.py
+"""只讀 RIFF/WAVE 標頭，不解碼音訊資料。"""
+import os
+import struct
+from typing import NamedTuple
+
+
+class WavHeader(NamedTuple):
+    channels: int
+    samplerate: int
+    bits: int               # 每個 sample 的位元數
+    data_offset: int        # data chunk 內容在檔案中的起始位置
+    data_size: int          # data chunk 宣告的大小 (bytes)
+
+    @property
+    def frames(self) -> int:
+        block = self.channels * max(self.bits // 8, 1)
+        return self.data_size // block if block else 0
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.samplerate if self.samplerate else 0.0
+
+
+def read_wav_header(path: str) -> WavHeader:
+    """解析 fmt 與 data chunk；格式不對時丟 ValueError。"""
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError("不是 RIFF/WAVE 檔")
+        fmt = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                raise ValueError("找不到 data chunk")
+            chunk_id, size = struct.unpack("<4sI", head)
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                if len(body) < 16:
+                    raise ValueError("fmt chunk 太短")
+                _, channels, samplerate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                fmt = (channels, samplerate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("data chunk 出現在 fmt 之前")
+                return WavHeader(*fmt, data_offset=f.tell(), data_size=size)
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)     # chunk 以偶數位元組對齊
+
+
+def validate_wav(path: str) -> WavHeader:
+    """確認標頭正確、有音訊資料，且檔案沒有被截斷；不合格丟 ValueError。"""
+    header = read_wav_header(path)
+    if header.channels == 0 or header.samplerate == 0:
+        raise ValueError("WAV 標頭的聲道數或取樣率為 0")
+    if header.data_size == 0:
+        raise ValueError("WAV 沒有音訊資料")
+    actual = os.path.getsize(path) - header.data_offset
+    # 串流式輸出的 WAV 可能把 data 大小填成 0xFFFFFFFF，這時只要求有資料
+    if header.data_size != 0xFFFFFFFF and actual < header.data_size:
+        raise ValueError(f"WAV 被截斷：{actual}/{header.data_size} bytes")
+    return header